@@ -1,4 +1,5 @@
 import streamlit as st
+from utils.startup import prewarm_in_background
 
 st.set_page_config(
     page_title="Início",
@@ -6,6 +7,10 @@ st.set_page_config(
     initial_sidebar_state="expanded" # Expande a barra lateral por padrão
 )
 
+# Pré-carrega pandas, numpy e Matplotlib (backend Agg) em segundo plano enquanto a página inicial é lida;
+# as demais páginas o disparam ao importar utils/data.py
+prewarm_in_background()
+
 # Título principal do aplicativo, conforme definido anteriormente
 st.write("# Desempenho SAEB 2023: Uma Análise Visual por Nível Socioeconômico no Ensino Médio Capixaba")
 
@@ -47,6 +52,8 @@ st.markdown(
     referentes ao ano de 2023. Por meio de gráficos e análises visuais, investiga-se a relação entre o nível socioeconômico
     dos estudantes do Ensino Médio da rede estadual do Espírito Santo e seu desempenho nas avaliações. Esta análise inclui
     recortes específicos de proficiência em Língua Portuguesa e Matemática, bem como uma exploração da distribuição por gênero.
+    Quando outras edições do SAEB (por exemplo, 2019 e 2021) são adicionadas aos dados, a página
+    "Comparação entre Edições" mostra a variação da proficiência entre os anos.
     Este aplicativo serve como a fase inicial de um projeto de análise de dados mais abrangente,
     focando primariamente na exploração descritiva dos dados.
     """
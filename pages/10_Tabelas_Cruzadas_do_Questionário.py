@@ -0,0 +1,87 @@
+import streamlit as st
+from utils.data import DATA_FILE_PATH, dataset_version, load_data_or_stop
+from utils.filters import global_filter_criteria
+from utils.questionnaire import INSE_VARIABLE, crosstab, crosstab_variables, variable_label
+from utils.render import table_download_link
+from utils.state import query_bound_widget
+
+st.set_page_config(page_title="Tabelas Cruzadas do Questionário", page_icon="🧮")
+
+st.markdown("# Tabelas Cruzadas do Questionário")
+st.markdown(
+    """
+    Cruza as respostas de um item do questionário do estudante com o Nível Socioeconômico (INSE)
+    ou com outro item, mostrando a contagem de estudantes, os percentuais ou a proficiência média
+    em cada combinação de respostas.
+    """
+)
+
+# --- Leitura dos Dados ---
+# As respostas dos itens TX_RESP_Q* são convertidas em códigos inteiros na ingestão (utils/data.py)
+load_data_or_stop()
+
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+
+variables = crosstab_variables(DATA_FILE_PATH)
+questions = [variable for variable in variables if variable != INSE_VARIABLE]
+if not questions:
+    st.warning("Nenhum item do questionário (colunas TX_RESP_Q*) foi encontrado nos dados.")
+    st.stop()
+
+# Códigos curtos usados na URL: Q01, Q02, ... e 'inse'
+variable_codes = {variable: 'inse' if variable == INSE_VARIABLE else variable.replace('TX_RESP_', '')
+                  for variable in variables}
+
+# --- Seleção das variáveis e da medida na barra lateral ---
+st.sidebar.header("Opções da Tabela")
+row_variable = query_bound_widget(
+    st.sidebar.selectbox,
+    "Item do questionário (linhas):",
+    'linha', {q: variable_codes[q] for q in questions}, questions[0],
+    key='opcao_tabela_linha',
+    options=questions,
+    format_func=variable_label
+)
+
+col_options = [variable for variable in variables if variable != row_variable]
+col_variable = query_bound_widget(
+    st.sidebar.selectbox,
+    "Variável das colunas:",
+    'coluna', {v: variable_codes[v] for v in col_options}, INSE_VARIABLE,
+    key='opcao_tabela_coluna',
+    options=col_options,
+    format_func=variable_label
+)
+
+measure_labels = {
+    'contagem': "Contagem de estudantes",
+    'percentual_linha': "Percentual na linha",
+    'percentual_coluna': "Percentual na coluna",
+    'media_lp': "Média de Língua Portuguesa",
+    'media_mt': "Média de Matemática",
+}
+measure = query_bound_widget(
+    st.sidebar.radio,
+    "Medida:",
+    'medida', {m: m for m in measure_labels}, 'contagem',
+    key='opcao_tabela_medida',
+    options=list(measure_labels),
+    format_func=lambda x: measure_labels[x]
+)
+
+# --- Tabela ---
+# Calculada por contagem sobre os códigos combinados e mantida em cache para cada par de variáveis
+table = crosstab(DATA_FILE_PATH, dataset_version(DATA_FILE_PATH), criteria, row_variable, col_variable, measure)
+
+st.write(f"### {measure_labels[measure]}: {variable_label(row_variable)} × {variable_label(col_variable)}")
+if measure == 'contagem':
+    st.dataframe(table)
+else:
+    st.dataframe(table.round(2))
+table_download_link(table, __file__, f'{row_variable}_{col_variable}_{measure}')
+
+# --- Informações Adicionais para o Streamlit ---
+st.write("---")
+st.write("Respostas em branco ('.') ou com dupla marcação ('*') não entram na tabela.")
+st.write("Os percentuais na linha somam 100% em cada alternativa do item; os percentuais na coluna somam 100% em cada categoria da variável das colunas. As médias de proficiência ficam vazias quando não há estudantes na combinação.")
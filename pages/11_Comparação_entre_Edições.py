@@ -0,0 +1,121 @@
+import streamlit as st
+import numpy as np
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, load_data_or_stop
+from utils.editions import EDITIONS_DIR, all_edition_aggregates, edition_deltas, edition_files, editions_version, summarize
+from utils.filters import global_filter_criteria
+from utils.render import show_figure, table_download_link
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
+
+st.set_page_config(page_title="Comparação entre Edições", page_icon="📅")
+
+st.write("# Comparação entre Edições do SAEB")
+st.markdown(
+    """
+    Compara a proficiência média entre duas edições do SAEB, por Nível Socioeconômico (INSE) e por gênero.
+    As comparações são calculadas a partir de agregados de cada edição (número de estudantes, soma e soma
+    dos quadrados das notas), guardados em cache, sem cruzar as linhas dos estudantes a cada interação.
+    """
+)
+
+# --- Leitura dos Dados ---
+# Cada edição é validada na ingestão com as mesmas regras (utils/data.py)
+load_data_or_stop()
+
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+
+editions = list(edition_files())
+aggregates = all_edition_aggregates(criteria)
+# Gráficos e tabelas em cache dependem de todas as edições, não só do arquivo principal
+data_version = editions_version()
+
+# --- Seleção das edições e da proficiência na barra lateral ---
+st.sidebar.header("Opções de Comparação")
+edition_codes = {year: str(year) for year in editions}
+base_year = query_bound_widget(
+    st.sidebar.selectbox,
+    "Edição de referência:",
+    'ano_base', edition_codes, editions[0],
+    key='opcao_edicao_base',
+    options=editions
+)
+compare_year = query_bound_widget(
+    st.sidebar.selectbox,
+    "Edição comparada:",
+    'ano', edition_codes, editions[-1],
+    key='opcao_edicao_comparada',
+    options=editions
+)
+
+subject_labels = {'lp': 'Língua Portuguesa', 'mt': 'Matemática'}
+subject = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione a Proficiência:",
+    'proficiencia', {code: code for code in subject_labels}, 'lp',
+    key='opcao_proficiencia_edicoes',
+    options=list(subject_labels),
+    format_func=lambda x: subject_labels[x]
+)
+
+if len(editions) == 1:
+    st.info(
+        f"Apenas a edição de {editions[0]} está disponível. Para comparar edições, adicione os arquivos de outros anos "
+        f"com o mesmo esquema em `{EDITIONS_DIR}/ano=AAAA/` (por exemplo, `{EDITIONS_DIR}/ano=2021/df_es_filtrado.csv`)."
+    )
+    # Sem outra edição, exibe apenas o resumo da edição disponível
+    summary = summarize(aggregates, ['NU_TIPO_NIVEL_INSE'], subject).xs(editions[0], level='ANO')
+    summary.index = summary.index.map(lambda x: INSE_DISPLAY_LABELS.get(x, str(x)))
+    st.write(f"### Proficiência em {subject_labels[subject]} por Nível Socioeconômico ({editions[0]})")
+    st.dataframe(summary.rename(columns={'n': 'Estudantes', 'media': 'Média', 'desvio': 'Desvio padrão'}).round(2))
+    st.stop()
+
+if base_year == compare_year:
+    st.warning("Selecione duas edições diferentes para calcular a variação.")
+    st.stop()
+
+# --- Variação por Nível Socioeconômico e por gênero ---
+deltas_inse = edition_deltas(aggregates, ['NU_TIPO_NIVEL_INSE'], subject, base_year, compare_year)
+deltas_inse.index = deltas_inse.index.map(lambda x: INSE_DISPLAY_LABELS.get(x, str(x)))
+deltas_gender = edition_deltas(aggregates, ['TX_RESP_Q01'], subject, base_year, compare_year)
+deltas_inse_gender = edition_deltas(aggregates, ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01'], subject, base_year, compare_year)
+
+# --- Gráfico da variação por INSE e gênero ---
+by_gender = deltas_inse_gender['Variação'].unstack('TX_RESP_Q01')
+by_gender = by_gender[[col for col in ['Masculino', 'Feminino'] if col in by_gender.columns]]
+
+
+def draw_deltas():
+    fig = mpl_figure.Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    by_gender.plot(kind='bar', ax=ax, width=0.8, edgecolor='black', color=['#1f77b4', '#ff7f0e'])
+    ax.axhline(0, color='black', linewidth=0.8)
+    tick_positions = np.arange(len(by_gender.index))
+    ax.set_xticks(tick_positions)
+    ax.set_xticklabels([INSE_DISPLAY_LABELS.get(level, str(level)) for level in by_gender.index], rotation=45, ha='right')
+    ax.set_title(f'Variação da Proficiência Média em {subject_labels[subject]}: {base_year} → {compare_year}')
+    ax.set_xlabel('Nível Socioeconômico (INSE)')
+    ax.set_ylabel('Variação da média (pontos)')
+    ax.legend(title='Gênero')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+# --- Exibir o gráfico no Streamlit ---
+show_figure(draw_deltas, __file__, simple_chart=True, data_version=data_version)
+
+st.write("### Variação por Nível Socioeconômico")
+st.dataframe(deltas_inse.round(2))
+table_download_link(deltas_inse, __file__, 'variacao_inse', data_version=data_version)
+
+st.write("### Variação por Gênero")
+st.dataframe(deltas_gender.round(2))
+table_download_link(deltas_gender, __file__, 'variacao_genero', data_version=data_version)
+
+# --- Informações Adicionais para o Streamlit ---
+st.write("---")
+st.write("A variação é a média da edição comparada menos a média da edição de referência. O erro padrão considera as duas edições como amostras independentes; variações menores que cerca de duas vezes o erro padrão devem ser lidas com cautela.")
@@ -0,0 +1,132 @@
+import io
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+from utils.data import DATA_FILE_PATH, GENDER_DOMAIN, INSE_DISPLAY_LABELS, INSE_LEVELS, PROFICIENCY_BOUNDS, dataset_version, load_data_or_stop
+from utils.filters import global_filter_criteria
+from utils.percentiles import get_percentile_index
+from utils.state import query_bound_widget
+
+st.set_page_config(page_title="Posição Percentil", page_icon="🎯")
+
+st.write("# Posição Percentil de uma Nota")
+st.markdown(
+    """
+    Informe uma nota de proficiência e veja em que percentil ela fica entre os estudantes de um
+    Nível Socioeconômico (INSE) e gênero. Também é possível enviar um arquivo CSV com muitas notas
+    (por exemplo, a lista de estudantes de uma escola) e obter o percentil de cada uma.
+    """
+)
+
+# --- Leitura dos Dados ---
+load_data_or_stop()
+
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+
+# Notas ordenadas por estrato, calculadas uma vez por versão dos dados e filtros
+index = get_percentile_index(DATA_FILE_PATH, dataset_version(DATA_FILE_PATH), criteria)
+
+# --- Seleção do estrato na barra lateral ---
+st.sidebar.header("Estrato de Comparação")
+subject_labels = {'lp': 'Língua Portuguesa', 'mt': 'Matemática'}
+subject = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione a Proficiência:",
+    'proficiencia', {code: code for code in subject_labels}, 'lp',
+    key='opcao_proficiencia_percentil',
+    options=list(subject_labels),
+    format_func=lambda x: subject_labels[x]
+)
+
+# None representa "todos" (sem restrição)
+inse_options = [None] + INSE_LEVELS
+selected_inse = query_bound_widget(
+    st.sidebar.selectbox,
+    "Nível Socioeconômico (INSE):",
+    'inse', {level: 'todos' if level is None else str(level) for level in inse_options}, None,
+    key='opcao_inse_percentil',
+    options=inse_options,
+    format_func=lambda x: "Todos os níveis" if x is None else INSE_DISPLAY_LABELS.get(x, f'INSE {x}')
+)
+
+gender_options = [None] + GENDER_DOMAIN
+selected_gender = query_bound_widget(
+    st.sidebar.selectbox,
+    "Gênero:",
+    'genero', {gender: 'todos' if gender is None else gender for gender in gender_options}, None,
+    key='opcao_genero_percentil',
+    options=gender_options,
+    format_func=lambda x: "Todos" if x is None else x
+)
+
+selection = {'NU_TIPO_NIVEL_INSE': selected_inse, 'TX_RESP_Q01': selected_gender}
+stratum = index.stratum(subject, **selection)
+stratum_label = (
+    ("todos os níveis INSE" if selected_inse is None else INSE_DISPLAY_LABELS.get(selected_inse))
+    + (", todos os gêneros" if selected_gender is None else f", gênero {selected_gender}")
+)
+
+if len(stratum) == 0:
+    st.warning("Não há estudantes no estrato selecionado. Ajuste os filtros.")
+    st.stop()
+
+st.caption(f"Estrato: {subject_labels[subject]}, {stratum_label} ({len(stratum)} estudantes).")
+
+# --- Consulta de uma nota ---
+st.write("### Consultar uma nota")
+low, high = PROFICIENCY_BOUNDS
+score = st.number_input(
+    "Nota de proficiência:", min_value=low, max_value=high,
+    value=float(np.round(np.median(stratum), 1)), step=1.0,
+    key='opcao_nota_percentil'
+)
+percentile = index.percentile_rank([score], subject, **selection)[0]
+st.metric(label=f"Percentil em {subject_labels[subject]}", value=f"{percentile:.1f}")
+st.write(
+    f"Uma nota de **{score:.1f}** supera cerca de **{percentile:.1f}%** dos estudantes do estrato ({stratum_label})."
+)
+
+# --- Consulta em lote (arquivo CSV) ---
+st.write("### Consultar várias notas (arquivo CSV)")
+uploaded_file = st.file_uploader("Arquivo CSV com uma coluna de notas:", type=['csv'], key='arquivo_notas_percentil')
+if uploaded_file is not None:
+    try:
+        content = uploaded_file.getvalue().decode('utf-8-sig')
+        # Separador pelo cabeçalho; arquivos com ';' (padrão do Excel em português) usam vírgula decimal
+        header = content.splitlines()[0] if content else ''
+        separator = max([',', ';', '\t'], key=header.count)
+        roster = pd.read_csv(io.StringIO(content), sep=separator, decimal=',' if separator == ';' else '.')
+    except Exception as e:
+        st.error(f"Não foi possível ler o arquivo CSV: {e}")
+        st.stop()
+
+    def to_scores(column):
+        # Colunas com algum valor não numérico chegam como texto: aceita vírgula decimal também nelas
+        if roster[column].dtype == object:
+            return pd.to_numeric(roster[column].str.replace(',', '.', regex=False), errors='coerce')
+        return pd.to_numeric(roster[column], errors='coerce')
+
+    numeric_columns = [col for col in roster.columns if to_scores(col).notna().any()]
+    if not numeric_columns:
+        st.error("O arquivo não tem nenhuma coluna numérica com notas.")
+        st.stop()
+    score_column = st.selectbox("Coluna com as notas:", numeric_columns, key='opcao_coluna_notas_percentil')
+
+    scores = to_scores(score_column)
+    # Uma única busca binária vetorizada para todas as notas do arquivo
+    roster[f'PERCENTIL_{subject.upper()}'] = np.round(index.percentile_rank(scores.to_numpy(), subject, **selection), 1)
+    roster.loc[scores.isna(), f'PERCENTIL_{subject.upper()}'] = np.nan
+
+    st.dataframe(roster)
+    st.download_button(
+        "Baixar resultado (CSV)",
+        data=roster.to_csv(index=False).encode('utf-8'),
+        file_name='percentis.csv',
+        mime='text/csv'
+    )
+
+# --- Informações Adicionais para o Streamlit ---
+st.write("---")
+st.write("O percentil é a porcentagem de estudantes do estrato com nota menor que a informada, somada à metade da porcentagem com nota igual. Os filtros globais da barra lateral também delimitam o estrato.")
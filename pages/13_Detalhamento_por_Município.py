@@ -0,0 +1,177 @@
+import streamlit as st
+import numpy as np
+from utils.data import DATA_FILE_PATH, GENDER_DOMAIN, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop
+from utils.filters import global_filter_criteria
+from utils.render import show_figures, table_download_link
+from utils.rollup import HISTOGRAM_EDGES, LEVEL_LABELS, get_rollup
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
+
+st.set_page_config(page_title="Detalhamento por Município", page_icon="🏫")
+
+st.write("# Detalhamento por Município")
+st.markdown(
+    """
+    Selecione um município (e, quando o arquivo traz o código da escola, uma escola) para ver a
+    distribuição de INSE e gênero e a proficiência dos seus estudantes, comparadas às do nível acima.
+    Os agregados de todos os níveis (estado → município → escola) são calculados uma única vez, e
+    detalhar um recorte é apenas uma consulta a eles.
+    """
+)
+
+# --- Leitura dos Dados ---
+load_data_or_stop()
+
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+
+# Agregados da hierarquia, por versão dos dados e filtros (utils/rollup.py)
+rollup = get_rollup(DATA_FILE_PATH, dataset_version(DATA_FILE_PATH), criteria)
+if not rollup.nodes:
+    st.warning("Não há estudantes com os filtros globais selecionados. Ajuste os filtros.")
+    st.stop()
+
+# --- Seleção do recorte na barra lateral ---
+st.sidebar.header("Recorte")
+level_params = {'ID_UF': 'uf', 'ID_MUNICIPIO': 'municipio', 'ID_ESCOLA': 'escola'}
+all_labels = {'ID_UF': 'Todos os estados', 'ID_MUNICIPIO': 'Todos os municípios', 'ID_ESCOLA': 'Todas as escolas'}
+path = ()
+for level in rollup.levels:
+    options = rollup.children.get(path, [])
+    # Com um único estado no arquivo, ele é selecionado diretamente
+    if level == 'ID_UF' and len(options) == 1:
+        path += (options[0],)
+        continue
+    options = [None] + options
+    widget_key = f'opcao_{level_params[level]}_detalhamento'
+    # Ao trocar o nível acima, uma seleção que não pertence mais às opções volta para "todos"
+    if widget_key in st.session_state and st.session_state[widget_key] not in options:
+        st.session_state[widget_key] = None
+    selected = query_bound_widget(
+        st.sidebar.selectbox,
+        f"{LEVEL_LABELS[level]} (código INEP):",
+        level_params[level], {option: 'todos' if option is None else str(option) for option in options}, None,
+        key=widget_key,
+        options=options,
+        format_func=lambda x, level=level: all_labels[level] if x is None else str(x)
+    )
+    if selected is None:
+        break
+    path += (selected,)
+
+subject_labels = {'lp': 'Língua Portuguesa', 'mt': 'Matemática'}
+subject = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione a Proficiência:",
+    'proficiencia', {code: code for code in subject_labels}, 'lp',
+    key='opcao_proficiencia_detalhamento',
+    options=list(subject_labels),
+    format_func=lambda x: subject_labels[x]
+)
+
+# Nó selecionado e o nó acima dele (referência de comparação); no estado, a referência é ele mesmo
+depth = len(path)
+parent = path[:-1] if depth > 1 else path
+node_label = " › ".join(f"{LEVEL_LABELS[level]} {code}" for level, code in zip(rollup.levels, path))
+parent_label = " › ".join(f"{LEVEL_LABELS[level]} {code}" for level, code in zip(rollup.levels, parent))
+st.write(f"### {node_label}")
+
+# --- Indicadores do recorte ---
+totals = rollup.summary(path, [], subject).iloc[0]
+parent_totals = rollup.summary(parent, [], subject).iloc[0]
+columns = st.columns(3)
+columns[0].metric("Estudantes", f"{int(totals['n']):,}".replace(',', '.'))
+columns[1].metric(
+    f"Média em {subject_labels[subject]}", f"{totals['media']:.1f}",
+    delta=f"{totals['media'] - parent_totals['media']:+.1f} vs. {parent_label}" if parent != path else None
+)
+columns[2].metric("Desvio padrão", f"{totals['desvio']:.1f}")
+
+# Tabelas do recorte por INSE e gênero (os gêneros nas colunas, na ordem de GENDER_DOMAIN)
+counts = rollup.node(path)['n'].unstack('TX_RESP_Q01', fill_value=0)
+counts = counts[[gender for gender in GENDER_DOMAIN if gender in counts.columns]]
+means = rollup.summary(path, ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01'], subject)['media'].unstack('TX_RESP_Q01')
+means = means[[gender for gender in GENDER_DOMAIN if gender in means.columns]]
+parent_means = rollup.summary(parent, ['NU_TIPO_NIVEL_INSE'], subject)['media']
+histogram = rollup.histogram(path, subject)
+parent_histogram = rollup.histogram(parent, subject)
+
+
+# --- Gráficos (um painel por figura, desenhados pelo agendador) ---
+def inse_ticks(ax, levels):
+    ax.set_xticks(np.arange(len(levels)))
+    ax.set_xticklabels([INSE_DISPLAY_LABELS.get(level, str(level)) for level in levels], rotation=45, ha='right')
+
+
+def draw_counts():
+    fig = mpl_figure.Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    counts.plot(kind='bar', ax=ax, width=0.8, edgecolor='black', color=['#1f77b4', '#ff7f0e'])
+    inse_ticks(ax, counts.index)
+    ax.set_title(f'Estudantes por Nível Socioeconômico e Gênero — {node_label}')
+    ax.set_xlabel('Nível Socioeconômico (INSE)')
+    ax.set_ylabel('Número de Alunos')
+    ax.legend(title='Gênero')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def draw_means():
+    fig = mpl_figure.Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    means.plot(kind='bar', ax=ax, width=0.8, edgecolor='black', color=['#1f77b4', '#ff7f0e'])
+    if parent != path:
+        # Média do nível acima em cada INSE, como referência
+        reference = parent_means.reindex(means.index)
+        ax.plot(np.arange(len(means.index)), reference.to_numpy(), color='black', marker='D', linestyle='--',
+                label=f'Média — {parent_label}')
+    inse_ticks(ax, means.index)
+    ax.set_ylim(bottom=150)
+    ax.set_title(f'Proficiência Média em {subject_labels[subject]} por INSE e Gênero — {node_label}')
+    ax.set_xlabel('Nível Socioeconômico (INSE)')
+    ax.set_ylabel(f'Média de Proficiência em {subject_labels[subject]}')
+    ax.legend(title='Gênero')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def draw_histogram():
+    fig = mpl_figure.Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    # Percentuais por faixa, para comparar recortes de tamanhos diferentes
+    ax.stairs(100 * histogram / max(histogram.sum(), 1), HISTOGRAM_EDGES, fill=True, alpha=0.6,
+              color='#1f77b4', label=node_label)
+    if parent != path:
+        ax.stairs(100 * parent_histogram / max(parent_histogram.sum(), 1), HISTOGRAM_EDGES, color='black',
+                  linewidth=1.5, label=parent_label)
+    occupied = np.flatnonzero(parent_histogram)
+    ax.set_xlim(HISTOGRAM_EDGES[occupied[0]], HISTOGRAM_EDGES[occupied[-1] + 1])
+    ax.set_title(f'Distribuição de Proficiência em {subject_labels[subject]} — {node_label}')
+    ax.set_xlabel(f'Proficiência em {subject.upper()}')
+    ax.set_ylabel('Estudantes (%)')
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+show_figures([draw_counts, draw_means, draw_histogram], __file__)
+
+# --- Tabela dos níveis abaixo do recorte ---
+if depth < len(rollup.levels):
+    child_level = rollup.levels[depth]
+    children = rollup.child_summary(path, subject).sort_values('media', ascending=False)
+    st.write(f"### {LEVEL_LABELS[child_level]}s — {node_label}")
+    st.dataframe(children.rename(columns={'n': 'Estudantes', 'media': 'Média', 'desvio': 'Desvio padrão'}).round(2))
+    table_download_link(children, __file__, f'resumo_{child_level.lower()}')
+elif 'ID_ESCOLA' not in rollup.levels:
+    st.caption("O arquivo de dados não traz o código da escola (ID_ESCOLA): o detalhamento vai até o município.")
+
+# --- Informações Adicionais para o Streamlit ---
+st.write("---")
+st.write("Os códigos são os do INEP. Médias e desvios são calculados a partir de contagens, somas e somas dos quadrados guardadas para cada nível; os histogramas usam faixas fixas de 10 pontos. Recortes com poucos estudantes devem ser lidos com cautela.")
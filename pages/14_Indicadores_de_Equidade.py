@@ -0,0 +1,164 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop
+from utils.equity import HIGH_INSE_LEVELS, LOW_INSE_LEVELS, MIN_GAP_GROUP, concentration_curve, equity_indicators
+from utils.filters import global_filter_criteria
+from utils.render import show_figures, table_download_link
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
+
+st.set_page_config(page_title="Indicadores de Equidade", page_icon="⚖️")
+
+st.write("# Indicadores de Equidade")
+st.markdown(
+    """
+    Resume a desigualdade de proficiência segundo o Nível Socioeconômico (INSE): o índice e a curva de
+    concentração, a parcela da variância das notas explicada pelas diferenças entre níveis de INSE e a
+    diferença de média entre estudantes de INSE alto e baixo, no estado e em cada município.
+    """
+)
+
+# --- Leitura dos Dados ---
+load_data_or_stop()
+
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+version = dataset_version(DATA_FILE_PATH)
+
+# Indicadores de todas as unidades, por versão dos dados e filtros (utils/equity.py)
+indicators = equity_indicators(DATA_FILE_PATH, version, criteria)
+
+# --- Seleção da proficiência e do município na barra lateral ---
+st.sidebar.header("Opções de Equidade")
+subject_labels = {'lp': 'Língua Portuguesa', 'mt': 'Matemática'}
+subject = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione a Proficiência:",
+    'proficiencia', {code: code for code in subject_labels}, 'lp',
+    key='opcao_proficiencia_equidade',
+    options=list(subject_labels),
+    format_func=lambda x: subject_labels[x]
+)
+
+# Sem estudantes nos filtros (ou sem o nível do estado nos agregados) não há indicadores a mostrar
+state = indicators.get(('ID_UF', subject))
+if state is None or state.empty:
+    st.warning("Não há estudantes com os filtros globais selecionados. Ajuste os filtros.")
+    st.stop()
+state_code = state.index[0]
+municipalities = indicators.get(('ID_MUNICIPIO', subject))
+municipality_options = [None] + ([] if municipalities is None else list(municipalities.index))
+selected_municipality = query_bound_widget(
+    st.sidebar.selectbox,
+    "Município da curva de concentração (código INEP):",
+    'municipio', {code: 'todos' if code is None else str(code) for code in municipality_options}, None,
+    key='opcao_municipio_equidade',
+    options=municipality_options,
+    format_func=lambda x: "Estado" if x is None else str(x)
+)
+
+low_label = f"{INSE_DISPLAY_LABELS[LOW_INSE_LEVELS[0]]} a {INSE_DISPLAY_LABELS[LOW_INSE_LEVELS[-1]]}"
+high_label = f"{INSE_DISPLAY_LABELS[HIGH_INSE_LEVELS[0]]} a {INSE_DISPLAY_LABELS[HIGH_INSE_LEVELS[-1]]}"
+
+# --- Indicadores do estado ---
+st.write(f"### Estado {state_code} — {subject_labels[subject]}")
+headline = state.iloc[0]
+columns = st.columns(3)
+columns[0].metric("Índice de concentração", f"{headline['concentracao']:.4f}")
+columns[1].metric("Variância entre níveis de INSE", f"{100 * headline['entre_inse']:.1f}%")
+columns[2].metric("Diferença INSE alto − baixo", f"{headline['diferenca']:+.1f} pontos")
+
+column_names = {
+    'n': 'Estudantes', 'media': 'Média', 'concentracao': 'Índice de concentração',
+    'entre_inse': 'Variância entre INSE (%)', 'media_baixo': f'Média ({low_label})',
+    'media_alto': f'Média ({high_label})', 'diferenca': 'Diferença alto − baixo',
+}
+
+
+def display_table(table):
+    return table.assign(entre_inse=100 * table['entre_inse']).rename(columns=column_names)
+
+
+# Curvas da unidade selecionada (e do estado, como referência, quando um município é selecionado)
+unit_column, unit = ('ID_UF', state_code) if selected_municipality is None else ('ID_MUNICIPIO', selected_municipality)
+unit_label = f"Estado {state_code}" if selected_municipality is None else f"Município {selected_municipality}"
+curves = {code: concentration_curve(DATA_FILE_PATH, version, criteria, unit_column, unit, code) for code in subject_labels}
+state_curve = concentration_curve(DATA_FILE_PATH, version, criteria, 'ID_UF', state_code, subject)
+
+
+# --- Gráficos (um painel por figura, desenhados pelo agendador) ---
+def draw_concentration():
+    fig = mpl_figure.Figure(figsize=(12, 6))
+    ax_curve, ax_gap = fig.subplots(1, 2)
+    ax_curve.plot([0, 1], [0, 1], color='gray', linestyle=':', label='Igualdade')
+    for code, color in zip(subject_labels, ['#1f77b4', '#ff7f0e']):
+        curve = curves[code]
+        ax_curve.plot(curve['estudantes'], curve['pontos'], marker='o', color=color, label=subject_labels[code])
+        # A curva fica muito próxima da diagonal: a distância até ela, em pontos percentuais, mostra o desvio
+        ax_gap.plot(curve['estudantes'], 100 * (curve['estudantes'] - curve['pontos']), marker='o', color=color,
+                    label=subject_labels[code])
+    if selected_municipality is not None:
+        ax_gap.plot(state_curve['estudantes'], 100 * (state_curve['estudantes'] - state_curve['pontos']),
+                    color='black', linestyle='--', label=f'Estado {state_code} ({subject.upper()})')
+    ax_gap.axhline(0, color='gray', linestyle=':')
+    ax_curve.set_title(f'Curva de Concentração — {unit_label}')
+    ax_curve.set_xlabel('Parcela acumulada de estudantes (em ordem de INSE)')
+    ax_curve.set_ylabel('Parcela acumulada dos pontos de proficiência')
+    ax_gap.set_title('Distância até a diagonal')
+    ax_gap.set_xlabel('Parcela acumulada de estudantes (em ordem de INSE)')
+    ax_gap.set_ylabel('Diagonal − curva (p.p.)')
+    for ax in (ax_curve, ax_gap):
+        ax.legend()
+        ax.grid(linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+panels = [draw_concentration]
+if municipalities is not None:
+    gaps = municipalities['diferenca'].dropna().sort_values()
+
+    def draw_gaps():
+        fig = mpl_figure.Figure(figsize=(10, 2 + 0.2 * len(gaps)))
+        ax = fig.subplots()
+        positions = np.arange(len(gaps))
+        ax.barh(positions, gaps.to_numpy(), color=np.where(gaps.to_numpy() >= 0, '#1f77b4', '#d62728'), edgecolor='black')
+        ax.axvline(headline['diferenca'], color='black', linestyle='--', label=f'Estado {state_code}')
+        ax.axvline(0, color='gray', linewidth=0.8)
+        ax.set_yticks(positions)
+        ax.set_yticklabels([str(code) for code in gaps.index], fontsize=7)
+        ax.set_title(f'Diferença de Média em {subject_labels[subject]}: INSE {high_label} − {low_label}')
+        ax.set_xlabel('Diferença (pontos)')
+        ax.set_ylabel('Município (código INEP)')
+        ax.legend()
+        ax.grid(axis='x', linestyle='--', alpha=0.7)
+        fig.tight_layout()
+        return fig
+
+    panels.append(draw_gaps)
+
+show_figures(panels, __file__)
+
+# --- Tabelas ---
+st.write("### Indicadores do estado")
+state_table = pd.DataFrame({subject_labels[code]: indicators[('ID_UF', code)].iloc[0] for code in subject_labels
+                            if ('ID_UF', code) in indicators}).T
+st.dataframe(display_table(state_table).round(4))
+table_download_link(state_table, __file__, 'equidade_estado')
+
+if municipalities is not None:
+    st.write(f"### Indicadores por município — {subject_labels[subject]}")
+    st.dataframe(display_table(municipalities.sort_values('diferenca', ascending=False)).round(4))
+    table_download_link(municipalities, __file__, f'equidade_municipios_{subject}')
+    excluded = municipalities['diferenca'].isna().sum()
+    if excluded:
+        st.caption(f"{excluded} município(s) sem a diferença calculada: menos de {MIN_GAP_GROUP} estudantes em uma das faixas de INSE.")
+
+# --- Informações Adicionais para o Streamlit ---
+st.write("---")
+st.write("A curva de concentração acumula a proficiência dos estudantes ordenados do menor para o maior INSE. O índice de concentração é o dobro da área entre a diagonal e a curva: vale 0 quando a proficiência não depende do INSE e é positivo quando se concentra nos estudantes de INSE mais alto. Estudantes de um mesmo nível de INSE ocupam a posição média do nível.")
+st.write("A variância entre níveis de INSE é a parcela da variância total das notas explicada pelas diferenças entre as médias dos níveis; o restante é a variação dentro de cada nível.")
@@ -0,0 +1,166 @@
+import streamlit as st
+import numpy as np
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop
+from utils.filters import global_filter_criteria
+from utils.outliers import IQR_WHIS, MIN_MUNICIPALITY_SIZE, MUNICIPALITY_SHARE_RATIO, ROBUST_Z_LIMIT, municipality_flags, student_outliers
+from utils.render import show_figures, table_download_link
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
+
+st.set_page_config(page_title="Valores Atípicos", page_icon="🔎")
+
+st.write("# Valores Atípicos por Estrato")
+st.markdown(
+    """
+    Lista e conta as notas de proficiência atípicas dentro de cada estrato (por exemplo, estudantes do
+    mesmo INSE e gênero), pelo z robusto (mediana e MAD) ou pelos limites do intervalo interquartil
+    (os mesmos dos box plots), e sinaliza os municípios cuja distribuição de notas destoa dos demais.
+    Use o menu lateral para escolher a proficiência, o estrato e o critério.
+    """
+)
+
+# --- Leitura dos Dados ---
+load_data_or_stop()
+
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+version = dataset_version(DATA_FILE_PATH)
+
+# --- Opções na barra lateral ---
+st.sidebar.header("Opções de Detecção")
+subject_labels = {'lp': 'Língua Portuguesa', 'mt': 'Matemática'}
+subject = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione a Proficiência:",
+    'proficiencia', {code: code for code in subject_labels}, 'lp',
+    key='opcao_proficiencia_atipicos',
+    options=list(subject_labels),
+    format_func=lambda x: subject_labels[x]
+)
+strata_labels = {'inse_genero': 'INSE e gênero', 'inse': 'INSE', 'municipio': 'Município'}
+strata = query_bound_widget(
+    st.sidebar.radio,
+    "Comparar cada estudante com os do mesmo:",
+    'estrato', {code: code for code in strata_labels}, 'inse_genero',
+    key='opcao_estrato_atipicos',
+    options=list(strata_labels),
+    format_func=lambda x: strata_labels[x]
+)
+method_labels = {
+    'z': f'Z robusto (|z| > {ROBUST_Z_LIMIT})',
+    'iqr': f'Intervalo interquartil ({IQR_WHIS} × IQR)',
+}
+method = query_bound_widget(
+    st.sidebar.radio,
+    "Critério:",
+    'criterio', {code: code for code in method_labels}, 'z',
+    key='opcao_criterio_atipicos',
+    options=list(method_labels),
+    format_func=lambda x: method_labels[x]
+)
+
+# Estatísticas por estrato e por estudante, calculadas uma vez por versão dos dados, filtros e estrato
+group_stats, rows = student_outliers(DATA_FILE_PATH, version, criteria, strata)
+if rows.empty:
+    st.warning("Não há estudantes com os filtros globais selecionados. Ajuste os filtros.")
+    st.stop()
+municipalities = municipality_flags(DATA_FILE_PATH, version, criteria, strata)
+
+z = rows[f'z_robusto_{subject}']
+flagged = (z.abs() > ROBUST_Z_LIMIT) if method == 'z' else rows[f'fora_iqr_{subject}']
+strata_stats = group_stats.xs(subject, level='proficiencia')
+
+# --- Indicadores ---
+columns = st.columns(3)
+columns[0].metric("Notas atípicas", f"{int(flagged.sum())}", help=f"{100 * flagged.mean():.2f}% dos estudantes")
+columns[1].metric("Estratos", f"{len(strata_stats)}")
+columns[2].metric("Municípios sinalizados", f"{int(municipalities['sinalizado'].sum())} de {len(municipalities)}")
+
+
+# --- Gráficos (um painel por figura, desenhados pelo agendador) ---
+def draw_scores():
+    fig = mpl_figure.Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    scores = z.dropna().to_numpy()
+    limit = max(np.abs(scores).max(), ROBUST_Z_LIMIT) if len(scores) else ROBUST_Z_LIMIT
+    ax.hist(scores, bins=np.linspace(-limit, limit, 61), color='#1f77b4', edgecolor='black', alpha=0.7)
+    for bound in (-ROBUST_Z_LIMIT, ROBUST_Z_LIMIT):
+        ax.axvline(bound, color='red', linestyle='--')
+    # Escala logarítmica: as caudas (onde estão as notas atípicas) ficam visíveis
+    ax.set_yscale('log')
+    ax.set_title(f'Z Robusto da Proficiência em {subject_labels[subject]} no Estrato ({strata_labels[strata]})')
+    ax.set_xlabel('Z robusto = 0,6745 × (nota − mediana do estrato) / MAD do estrato')
+    ax.set_ylabel('Número de Alunos (escala log)')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def draw_municipalities():
+    fig = mpl_figure.Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    large = municipalities[municipalities['n'] >= MIN_MUNICIPALITY_SIZE]
+    normal = large[~large['sinalizado']]
+    marked = large[large['sinalizado']]
+    ax.scatter(normal[f'mediana_{subject}'], normal[f'mad_{subject}'], s=np.sqrt(normal['n']) * 3,
+               color='#1f77b4', alpha=0.6, edgecolor='black', label='Municípios')
+    if not marked.empty:
+        ax.scatter(marked[f'mediana_{subject}'], marked[f'mad_{subject}'], s=np.sqrt(marked['n']) * 3,
+                   color='#d62728', alpha=0.8, edgecolor='black', label='Sinalizados')
+    for code, row in marked.iterrows():
+        ax.annotate(str(code), (row[f'mediana_{subject}'], row[f'mad_{subject}']), fontsize=8,
+                    xytext=(4, 4), textcoords='offset points')
+    ax.set_title(f'Mediana e Dispersão (MAD) da Proficiência em {subject_labels[subject]} por Município')
+    ax.set_xlabel(f'Mediana em {subject.upper()}')
+    ax.set_ylabel('MAD (desvio absoluto mediano)')
+    ax.legend()
+    ax.grid(linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+show_figures([draw_scores, draw_municipalities], __file__)
+
+# --- Tabelas ---
+def strata_label(key):
+    keys = key if isinstance(key, tuple) else (key,)
+    return ' · '.join(INSE_DISPLAY_LABELS.get(value, str(value)) if name == 'NU_TIPO_NIVEL_INSE' else str(value)
+                      for name, value in zip(strata_stats.index.names, keys))
+
+
+st.write(f"### Estatísticas por estrato ({strata_labels[strata]})")
+strata_table = strata_stats.set_axis(strata_stats.index.map(strata_label))
+st.dataframe(strata_table.rename(columns={
+    'n': 'Estudantes', 'mediana': 'Mediana', 'mad': 'MAD', 'q1': 'Q1', 'q3': 'Q3',
+    'limite_inferior': 'Limite inferior (IQR)', 'limite_superior': 'Limite superior (IQR)',
+    'atipicos_z': 'Atípicas (z)', 'atipicos_iqr': 'Atípicas (IQR)',
+}).round(2))
+table_download_link(strata_stats, __file__, f'estratos_{subject}')
+
+st.write("### Estudantes com notas atípicas")
+students = rows[flagged].assign(z=z[flagged]).sort_values('z', key=np.abs, ascending=False)
+students = students[['ID_MUNICIPIO', 'NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01',
+                     'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'z']]
+if students.empty:
+    st.info("Nenhuma nota atípica com o critério selecionado.")
+else:
+    st.dataframe(students.rename(columns={'z': f'Z robusto ({subject.upper()})'}).round(2))
+    st.download_button(
+        "Baixar lista (CSV)",
+        data=students.to_csv().encode('utf-8'),
+        file_name=f'atipicos_{subject}.csv',
+        mime='text/csv'
+    )
+
+st.write("### Municípios")
+st.dataframe(municipalities.sort_values(['sinalizado', 'n'], ascending=False).rename(
+    columns={'n': 'Estudantes', 'sinalizado': 'Sinalizado', 'motivos': 'Motivos'}).round(3))
+table_download_link(municipalities, __file__, 'municipios_atipicos')
+
+# --- Informações Adicionais para o Streamlit ---
+st.write("---")
+st.write(f"O z robusto compara a nota com a mediana do estrato, em unidades do desvio absoluto mediano (MAD); ao contrário do desvio padrão, essas medidas não são distorcidas pelas próprias notas atípicas. Pelo critério do intervalo interquartil, são atípicas as notas abaixo de Q1 − {IQR_WHIS} × IQR ou acima de Q3 + {IQR_WHIS} × IQR, como nos box plots.")
+st.write(f"Um município (com pelo menos {MIN_MUNICIPALITY_SIZE} estudantes) é sinalizado quando a sua mediana ou o seu MAD têm z robusto acima de {ROBUST_Z_LIMIT} entre os municípios, ou quando a parcela de notas atípicas é mais de {MUNICIPALITY_SHARE_RATIO:g} vezes a do estado. A sinalização indica recortes a conferir, não erros confirmados.")
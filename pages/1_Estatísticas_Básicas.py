@@ -1,106 +1,141 @@
 import streamlit as st
 import pandas as pd
-import numpy as np # Importar numpy para a função .mode() e outras operações
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, WEIGHT_COLUMNS, dataset_version, load_data_or_stop, load_validated_data, load_validation_report
+from utils.filters import filter_by_criteria, global_filter_criteria, render_weight_option
+from utils.render import table_download_link
+from utils.stats import grouped_counting_stats, weighted_stats
+from utils.state import query_bound_widget
+from utils.store import stored
 
 st.set_page_config(page_title="Estatísticas Básicas", page_icon="📈")
 
 st.markdown("# Estatísticas Básicas de Proficiência")
 st.sidebar.header("Opções de Estatística")
 
-# --- Leitura e Pré-processamento dos Dados ---
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es_filtrado = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
-
-# Verificar se as colunas essenciais existem
-required_cols = ['NU_TIPO_NIVEL_INSE', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB']
-missing_columns = [col for col in required_cols if col not in df_es_filtrado.columns]
-
-if missing_columns:
-    st.error(f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
-
-# Forçar colunas de proficiência e INSE a serem numéricas, tratando erros para NaN
-df_es_filtrado['PROFICIENCIA_LP_SAEB'] = pd.to_numeric(df_es_filtrado['PROFICIENCIA_LP_SAEB'], errors='coerce')
-df_es_filtrado['PROFICIENCIA_MT_SAEB'] = pd.to_numeric(df_es_filtrado['PROFICIENCIA_MT_SAEB'], errors='coerce')
-df_es_filtrado['NU_TIPO_NIVEL_INSE'] = pd.to_numeric(df_es_filtrado['NU_TIPO_NIVEL_INSE'], errors='coerce')
+# --- Leitura dos Dados ---
+# Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+# na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino
+df_es_filtrado = load_data_or_stop()
 
-# Remover linhas com valores nulos nas colunas essenciais para as estatísticas
-df_es_filtrado.dropna(subset=['NU_TIPO_NIVEL_INSE', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB'], inplace=True)
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+df_es_filtrado = filter_by_criteria(df_es_filtrado, DATA_FILE_PATH, criteria)
 
 if df_es_filtrado.empty:
     st.warning("Após o pré-processamento, não há dados válidos para calcular as estatísticas. Verifique as colunas de INSE e proficiências.")
     st.stop()
 
 # Mapeamento para exibir os níveis do INSE como strings (para rótulos da tabela)
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
+inse_display_labels = INSE_DISPLAY_LABELS
 
-# --- Cálculo da Tabela de Mínimos e Máximos ---
-socioeconomic_min_max_stats = df_es_filtrado.groupby('NU_TIPO_NIVEL_INSE').agg(
-    min_lp=('PROFICIENCIA_LP_SAEB', 'min'),
-    max_lp=('PROFICIENCIA_LP_SAEB', 'max'),
-    min_mt=('PROFICIENCIA_MT_SAEB', 'min'),
-    max_mt=('PROFICIENCIA_MT_SAEB', 'max')
+# --- Seleção do Tipo de Estatística na Barra Lateral ---
+# Códigos curtos usados no parâmetro "estatistica" da URL
+stat_type_codes = {"Mínimo e Máximo": 'minmax', "Média, Mediana e Moda": 'central'}
+selected_stat_type = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione o tipo de estatística a exibir:",
+    'estatistica', stat_type_codes, "Mínimo e Máximo",
+    key='opcao_estatistica',
+    options=tuple(stat_type_codes)
 )
-socioeconomic_min_max_stats = socioeconomic_min_max_stats.sort_index()
-# Mapear o índice numérico do INSE para rótulos de string para exibição
-socioeconomic_min_max_stats.index = socioeconomic_min_max_stats.index.map(lambda x: inse_display_labels.get(x, str(x)))
-
-# Renomear colunas para a tabela de Mínimos e Máximos
-socioeconomic_min_max_stats = socioeconomic_min_max_stats.rename(columns={
-    'min_lp': 'Mínimo LP',
-    'max_lp': 'Máximo LP',
-    'min_mt': 'Mínimo MT',
-    'max_mt': 'Máximo MT'
-})
-
-# --- Definir o nome do índice para exibição na tabela ---
-socioeconomic_min_max_stats.index.name = "Nível Socioeconômico"
+use_weights = render_weight_option(DATA_FILE_PATH)
 
+# --- Cálculo da Tabela de Mínimos e Máximos ---
+def min_max_table(df_es_filtrado):
+    # Só é calculada quando selecionada na barra lateral
+    socioeconomic_min_max_stats = df_es_filtrado.groupby('NU_TIPO_NIVEL_INSE').agg(
+        min_lp=('PROFICIENCIA_LP_SAEB', 'min'),
+        max_lp=('PROFICIENCIA_LP_SAEB', 'max'),
+        min_mt=('PROFICIENCIA_MT_SAEB', 'min'),
+        max_mt=('PROFICIENCIA_MT_SAEB', 'max')
+    )
+    socioeconomic_min_max_stats = socioeconomic_min_max_stats.sort_index()
+    # Mapear o índice numérico do INSE para rótulos de string para exibição
+    socioeconomic_min_max_stats.index = socioeconomic_min_max_stats.index.map(lambda x: inse_display_labels.get(x, str(x)))
 
-# --- Cálculo da Tabela de Média, Mediana e Moda ---
-socioeconomic_mean_median_mode_stats = df_es_filtrado.groupby('NU_TIPO_NIVEL_INSE').agg(
-    mean_lp=('PROFICIENCIA_LP_SAEB', 'mean'),
-    median_lp=('PROFICIENCIA_LP_SAEB', 'median'),
-    # A moda pode retornar múltiplos valores, pegamos o primeiro se existir
-    mode_lp=('PROFICIENCIA_LP_SAEB', lambda x: x.mode()[0] if not x.mode().empty else np.nan),
-    mean_mt=('PROFICIENCIA_MT_SAEB', 'mean'),
-    median_mt=('PROFICIENCIA_MT_SAEB', 'median'),
-    mode_mt=('PROFICIENCIA_MT_SAEB', lambda x: x.mode()[0] if not x.mode().empty else np.nan)
-)
-socioeconomic_mean_median_mode_stats = socioeconomic_mean_median_mode_stats.sort_index()
-socioeconomic_mean_median_mode_stats = socioeconomic_mean_median_mode_stats.round(2)
-# Mapear o índice numérico do INSE para rótulos de string para exibição
-socioeconomic_mean_median_mode_stats.index = socioeconomic_mean_median_mode_stats.index.map(lambda x: inse_display_labels.get(x, str(x)))
+    # Renomear colunas para a tabela de Mínimos e Máximos
+    socioeconomic_min_max_stats = socioeconomic_min_max_stats.rename(columns={
+        'min_lp': 'Mínimo LP',
+        'max_lp': 'Máximo LP',
+        'min_mt': 'Mínimo MT',
+        'max_mt': 'Máximo MT'
+    })
 
-# Renomear colunas para a tabela de Média, Mediana e Moda
-socioeconomic_mean_median_mode_stats = socioeconomic_mean_median_mode_stats.rename(columns={
-    'mean_lp': 'Média LP',
-    'median_lp': 'Mediana LP',
-    'mode_lp': 'Moda LP',
-    'mean_mt': 'Média MT',
-    'median_mt': 'Mediana MT',
-    'mode_mt': 'Moda MT'
-})
+    # --- Definir o nome do índice para exibição na tabela ---
+    socioeconomic_min_max_stats.index.name = "Nível Socioeconômico"
+    return socioeconomic_min_max_stats
 
-# --- Definir o nome do índice para exibição na tabela ---
-socioeconomic_mean_median_mode_stats.index.name = "Nível Socioeconômico"
 
+# --- Cálculo da Tabela de Média, Mediana e Moda ---
+def central_tendency_table(df_es_filtrado):
+    # Só é calculada quando selecionada na barra lateral
+    # A média vem do groupby; mediana e moda são exatas, obtidas por contagem das proficiências
+    # codificadas em ponto fixo (centésimos de ponto), sem ordenar nem comparar floats por grupo
+    proficiency_means = df_es_filtrado.groupby('NU_TIPO_NIVEL_INSE')[['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB']].mean()
+    lp_counting_stats = grouped_counting_stats(df_es_filtrado['NU_TIPO_NIVEL_INSE'], df_es_filtrado['PROFICIENCIA_LP_CENTI'])
+    mt_counting_stats = grouped_counting_stats(df_es_filtrado['NU_TIPO_NIVEL_INSE'], df_es_filtrado['PROFICIENCIA_MT_CENTI'])
+
+    socioeconomic_mean_median_mode_stats = pd.DataFrame({
+        'mean_lp': proficiency_means['PROFICIENCIA_LP_SAEB'],
+        'median_lp': lp_counting_stats[0.5],
+        # Se houver mais de uma moda, fica a de menor valor
+        'mode_lp': lp_counting_stats['moda'],
+        'mean_mt': proficiency_means['PROFICIENCIA_MT_SAEB'],
+        'median_mt': mt_counting_stats[0.5],
+        'mode_mt': mt_counting_stats['moda']
+    })
+    socioeconomic_mean_median_mode_stats = socioeconomic_mean_median_mode_stats.sort_index()
+    socioeconomic_mean_median_mode_stats = socioeconomic_mean_median_mode_stats.round(2)
+    # Mapear o índice numérico do INSE para rótulos de string para exibição
+    socioeconomic_mean_median_mode_stats.index = socioeconomic_mean_median_mode_stats.index.map(lambda x: inse_display_labels.get(x, str(x)))
+
+    # Renomear colunas para a tabela de Média, Mediana e Moda
+    socioeconomic_mean_median_mode_stats = socioeconomic_mean_median_mode_stats.rename(columns={
+        'mean_lp': 'Média LP',
+        'median_lp': 'Mediana LP',
+        'mode_lp': 'Moda LP',
+        'mean_mt': 'Média MT',
+        'median_mt': 'Mediana MT',
+        'mode_mt': 'Moda MT'
+    })
+
+    # --- Definir o nome do índice para exibição na tabela ---
+    socioeconomic_mean_median_mode_stats.index.name = "Nível Socioeconômico"
+    return socioeconomic_mean_median_mode_stats
+
+
+# --- Cálculo da Tabela Ponderada (pesos amostrais) ---
+def weighted_central_tendency_table(df_es_filtrado):
+    # Média e mediana ponderadas de todos os níveis de uma vez; a moda não tem estimador ponderado
+    # usual e não é exibida
+    columns = {}
+    for col, suffix in (('PROFICIENCIA_LP_SAEB', 'LP'), ('PROFICIENCIA_MT_SAEB', 'MT')):
+        stats = weighted_stats(df_es_filtrado, ['NU_TIPO_NIVEL_INSE'], col, WEIGHT_COLUMNS[col])
+        columns[f'Média {suffix}'] = stats['media']
+        columns[f'Mediana {suffix}'] = stats[0.5]
+    columns['Estudantes'] = stats['n']
+    columns['Soma dos pesos'] = stats['peso']
+    weighted_table = pd.DataFrame(columns).round(2)
+    weighted_table.index = weighted_table.index.map(lambda x: inse_display_labels.get(x, str(x)))
+    weighted_table.index.name = "Nível Socioeconômico"
+    return weighted_table
+
+
+# As tabelas são guardadas na memória do processo e no banco de agregados (utils/store.py) por versão
+# dos dados e filtros: depois de um reinício, ou em outro processo, a mesma tabela é lida em vez de recalculada
+@st.cache_data(max_entries=32, show_spinner=False)
+@stored('estatisticas_basicas')
+def stored_table(file_path, version, criteria, table):
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    if table == 'minmax':
+        return min_max_table(df)
+    if table == 'central_ponderada':
+        return weighted_central_tendency_table(df)
+    return central_tendency_table(df)
+
+
+data_version = dataset_version(DATA_FILE_PATH)
 
-# --- Seleção do Tipo de Estatística na Barra Lateral ---
-selected_stat_type = st.sidebar.radio(
-    "Selecione o tipo de estatística a exibir:",
-    ("Mínimo e Máximo", "Média, Mediana e Moda")
-)
 
 # --- Exibição Condicional da Tabela ---
 if selected_stat_type == "Mínimo e Máximo":
@@ -111,7 +146,9 @@ if selected_stat_type == "Mínimo e Máximo":
         para cada nível socioeconômico (INSE) dos estudantes.
         """
     )
+    socioeconomic_min_max_stats = stored_table(DATA_FILE_PATH, data_version, criteria, 'minmax')
     st.dataframe(socioeconomic_min_max_stats)
+    table_download_link(socioeconomic_min_max_stats, __file__, 'minimo_maximo')
 else: # selected_stat_type == "Média, Mediana e Moda"
     st.write("### Proficiência: Média, Mediana e Moda por Nível Socioeconômico")
     st.markdown(
@@ -120,7 +157,25 @@ else: # selected_stat_type == "Média, Mediana e Moda"
         separadas por nível socioeconômico (INSE) dos estudantes. Todos os valores são arredondados para duas casas decimais.
         """
     )
-    st.dataframe(socioeconomic_mean_median_mode_stats)
+    if use_weights:
+        st.caption("Estimativas ponderadas pelos pesos amostrais dos estudantes (a moda não é estimada com pesos).")
+        weighted_table = stored_table(DATA_FILE_PATH, data_version, criteria, 'central_ponderada')
+        st.dataframe(weighted_table)
+        table_download_link(weighted_table, __file__, 'media_mediana_ponderadas')
+    else:
+        socioeconomic_mean_median_mode_stats = stored_table(DATA_FILE_PATH, data_version, criteria, 'central')
+        st.dataframe(socioeconomic_mean_median_mode_stats)
+        table_download_link(socioeconomic_mean_median_mode_stats, __file__, 'media_mediana_moda')
+
+# --- Relatório de validação dos dados ---
+with st.expander("Relatório de validação dos dados"):
+    st.markdown(
+        """
+        Os dados passam por uma única etapa de validação na carga: proficiências numéricas dentro da escala SAEB,
+        Nível Socioeconômico (INSE) entre 1 e 8 e gênero Masculino ou Feminino. Todas as páginas usam o mesmo conjunto de linhas aceitas.
+        """
+    )
+    st.dataframe(load_validation_report().set_index('Regra'))
 
 # --- Informações Adicionais para o Streamlit ---
 st.write("---")
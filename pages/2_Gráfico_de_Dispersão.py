@@ -1,7 +1,14 @@
-import pandas as pd
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt  # Importa a biblioteca matplotlib
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop, stratified_sample
+from utils.filters import filter_by_criteria, global_filter_criteria
+from utils.regression import fits_by, stratum_sums
+from utils.render import PREVIEW_ROWS, show_progressive_figures, table_download_link
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
 
 # --- Títulos e descrições para o Streamlit ---
 st.write("# Proficiência em Língua Portuguesa vs Matemática")
@@ -10,46 +17,22 @@ st.markdown(
     A figura apresenta um gráfico de dispersão com as proficiências de Língua Portuguesa e Matemática para os valores de INSE.
 
     Por favor, selecione um valor para o Nível Socioeconômico (INSE) no menu lateral à esquerda.
+    As retas de regressão de Matemática em Língua Portuguesa podem ser comparadas entre níveis INSE,
+    gêneros ou municípios.
     """
 )
 
-# --- Leitura e Pré-processamento dos Dados ---
-# Importar os dados
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es_filtrado = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
-
-# Verificar se as colunas essenciais existem
-required_cols = ['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE']
-missing_columns = [col for col in required_cols if col not in df_es_filtrado.columns]
-
-if missing_columns:
-    st.error(
-        f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
-
-# Garantir que as colunas de proficiência são numéricas e remover NaNs
-df_es_filtrado['PROFICIENCIA_LP_SAEB'] = pd.to_numeric(df_es_filtrado['PROFICIENCIA_LP_SAEB'], errors='coerce')
-df_es_filtrado['PROFICIENCIA_MT_SAEB'] = pd.to_numeric(df_es_filtrado['PROFICIENCIA_MT_SAEB'], errors='coerce')
-df_es_filtrado['NU_TIPO_NIVEL_INSE'] = pd.to_numeric(df_es_filtrado['NU_TIPO_NIVEL_INSE'],
-                                                     errors='coerce')  # Garantir que INSE também é numérico
+# --- Leitura dos Dados ---
+# Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+# na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino
+df_es_filtrado = load_data_or_stop()
 
-df_es_filtrado.dropna(subset=['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE'], inplace=True)
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+df_es_filtrado = filter_by_criteria(df_es_filtrado, DATA_FILE_PATH, criteria)
 
 # Mapear os níveis INSE numéricos para rótulos de exibição
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
-
-# Filtrar para incluir apenas os INSEs que estão no nosso dicionário de labels
-df_es_filtrado = df_es_filtrado[df_es_filtrado['NU_TIPO_NIVEL_INSE'].isin(inse_display_labels.keys())]
+inse_display_labels = INSE_DISPLAY_LABELS
 
 if df_es_filtrado.empty:
     st.warning("Após o pré-processamento, não há dados válidos para plotar. Verifique os dados de INSE e proficiência.")
@@ -57,13 +40,33 @@ if df_es_filtrado.empty:
 
 # --- Seleção do Nível INSE na barra lateral ---
 st.sidebar.header("Opções de Visualização")
-selected_inse_level = st.sidebar.radio(
-    label="Selecione o Nível Socioeconômico (INSE):",
-    options=sorted(df_es_filtrado['NU_TIPO_NIVEL_INSE'].unique()),  # Usa os níveis INSE presentes nos dados
+available_inse_levels = sorted(df_es_filtrado['NU_TIPO_NIVEL_INSE'].unique())  # Usa os níveis INSE presentes nos dados
+selected_inse_level = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione o Nível Socioeconômico (INSE):",
+    'inse', {level: str(level) for level in available_inse_levels},
+    available_inse_levels[0] if available_inse_levels else None,
+    key='opcao_inse_dispersao',
+    options=available_inse_levels,
     format_func=lambda x: inse_display_labels.get(x, f'INSE {x}'),  # Formata os rótulos
     horizontal=False  # Pode ser True se preferir na horizontal
 )
 
+# Estratos cujas retas de regressão são comparadas
+strata_labels = {
+    'inse': "Níveis INSE",
+    'genero': "Gênero (no nível selecionado)",
+    'municipio': "Municípios (no nível selecionado)",
+}
+selected_strata = query_bound_widget(
+    st.sidebar.radio,
+    "Comparar retas de regressão entre:",
+    'estratos', {code: code for code in strata_labels}, 'inse',
+    key='opcao_estratos_regressao',
+    options=list(strata_labels),
+    format_func=lambda x: strata_labels[x]
+)
+
 # Preparar o DataFrame para o gráfico de dispersão com base na seleção
 df_filtered_by_inse = df_es_filtrado[df_es_filtrado['NU_TIPO_NIVEL_INSE'] == selected_inse_level]
 
@@ -72,42 +75,99 @@ if df_filtered_by_inse.empty:
         f"Não há dados disponíveis para o Nível Socioeconômico {inse_display_labels.get(selected_inse_level, str(selected_inse_level))}. Por favor, selecione outro nível.")
     st.stop()
 
-# --- Criação do Gráfico de Dispersão com Matplotlib ---
-fig, ax = plt.subplots(figsize=(10, 8))  # Cria a figura e os eixos
-
-# Plota os pontos de dispersão
-ax.scatter(x=df_filtered_by_inse['PROFICIENCIA_LP_SAEB'],
-           y=df_filtered_by_inse['PROFICIENCIA_MT_SAEB'],
-           alpha=0.6,
-           s=50,  # Tamanho dos pontos
-           c='skyblue')  # Cor dos pontos
+# --- Regressão de MT em LP por estrato ---
+# As somas suficientes (n, Σx, Σy, Σxy, Σx², Σy²) por INSE × gênero × município são calculadas uma vez
+# (em cache) e cada recorte é apenas uma soma desses estratos, resolvida para todos os grupos de uma vez
+sums = stratum_sums(DATA_FILE_PATH, dataset_version(DATA_FILE_PATH), criteria)
+level_fit = fits_by(sums, ['NU_TIPO_NIVEL_INSE']).loc[selected_inse_level]
+if selected_strata == 'inse':
+    fits = fits_by(sums, ['NU_TIPO_NIVEL_INSE'])
+    fits.index = fits.index.map(lambda x: inse_display_labels.get(x, f'INSE {x}'))
+else:
+    stratum_column = 'TX_RESP_Q01' if selected_strata == 'genero' else 'ID_MUNICIPIO'
+    fits = fits_by(sums, ['NU_TIPO_NIVEL_INSE', stratum_column]).loc[selected_inse_level]
+fits = fits[fits['n'] > 2]
+
+# Retas sobrepostas ao gráfico (para muitos municípios, apenas a reta do nível selecionado)
+MAX_OVERLAID_LINES = 10
 
 # --- Ajustar os limites dos eixos dinamicamente ---
-# Encontrar o mínimo e máximo geral das proficiências no DataFrame filtrado
+# Encontrar o mínimo e máximo geral das proficiências no DataFrame filtrado (os mesmos na prévia e no gráfico completo)
 min_prof = min(df_filtered_by_inse['PROFICIENCIA_LP_SAEB'].min(), df_filtered_by_inse['PROFICIENCIA_MT_SAEB'].min())
 max_prof = max(df_filtered_by_inse['PROFICIENCIA_LP_SAEB'].max(), df_filtered_by_inse['PROFICIENCIA_MT_SAEB'].max())
 
 # Definir os limites dos eixos com uma margem
 # Ajuste 'padding' conforme a necessidade de visualização
 padding = 20
-ax.set_xlim(min_prof - padding, max_prof + padding)
-ax.set_ylim(min_prof - padding, max_prof + padding)
 
-# Adicionar títulos e rótulos
-ax.set_title(
-    f"Proficiência em LP vs. Matemática para {inse_display_labels.get(selected_inse_level, f'INSE {selected_inse_level}')}")
-ax.set_xlabel('Proficiência em Língua Portuguesa')
-ax.set_ylabel('Proficiência em Matemática')
-ax.grid(True, linestyle='--', alpha=0.7)  # Adiciona grade
+# Retas de regressão no intervalo de LP exibido
+x_line = np.array([min_prof - padding, max_prof + padding])
+selected_label = inse_display_labels.get(selected_inse_level, f'INSE {selected_inse_level}')
+
+
+# --- Criação do Gráfico de Dispersão com Matplotlib ---
+# O desenho recebe os pontos a exibir: primeiro os de uma amostra estratificada (prévia) e depois todos.
+# As retas de regressão vêm sempre dos dados completos.
+def draw_scatter(points):
+    fig = mpl_figure.Figure(figsize=(10, 8))  # Cria a figura e os eixos
+    ax = fig.subplots()
+
+    # Plota os pontos de dispersão
+    ax.scatter(x=points['PROFICIENCIA_LP_SAEB'],
+               y=points['PROFICIENCIA_MT_SAEB'],
+               alpha=0.6,
+               s=50,  # Tamanho dos pontos
+               c='skyblue')  # Cor dos pontos
+
+    ax.set_xlim(min_prof - padding, max_prof + padding)
+    ax.set_ylim(min_prof - padding, max_prof + padding)
+
+    if selected_strata == 'inse' or len(fits) > MAX_OVERLAID_LINES:
+        if selected_strata == 'inse':
+            for label, fit in fits.iterrows():
+                if label != selected_label:
+                    ax.plot(x_line, fit['intercepto'] + fit['inclinacao'] * x_line, color='gray', linewidth=1, alpha=0.6)
+        ax.plot(x_line, level_fit['intercepto'] + level_fit['inclinacao'] * x_line, color='red', linewidth=2,
+                label=f"{selected_label} (r = {level_fit['r']:.2f})")
+    else:
+        for label, fit in fits.iterrows():
+            ax.plot(x_line, fit['intercepto'] + fit['inclinacao'] * x_line, linewidth=2,
+                    label=f"{label} (r = {fit['r']:.2f})")
+    ax.legend(title='Reta de regressão (MT ~ LP)', loc='upper left')
+
+    # Adicionar títulos e rótulos
+    ax.set_title(f"Proficiência em LP vs. Matemática para {selected_label}")
+    ax.set_xlabel('Proficiência em Língua Portuguesa')
+    ax.set_ylabel('Proficiência em Matemática')
+    ax.grid(True, linestyle='--', alpha=0.7)  # Adiciona grade
+
+    # Manter proporção de aspecto igual para eixos de proficiência
+    ax.set_aspect('equal', adjustable='box')
+    return fig
 
-# Manter proporção de aspecto igual para eixos de proficiência
-ax.set_aspect('equal', adjustable='box')
 
 # --- Exibir o gráfico no Streamlit ---
-st.pyplot(fig)
+show_progressive_figures(
+    [draw_scatter], df_filtered_by_inse,
+    lambda: stratified_sample(df_filtered_by_inse, PREVIEW_ROWS), len(df_filtered_by_inse), __file__
+)
+
+# --- Tabela comparativa dos ajustes ---
+st.write(f"### Regressão de Matemática em Língua Portuguesa: {strata_labels[selected_strata]}")
+fits_table = fits.rename(columns={
+    'n': 'Estudantes',
+    'inclinacao': 'Inclinação',
+    'intercepto': 'Intercepto',
+    'r': 'Correlação (r)',
+    'desvio_residuos': 'Desvio dos resíduos',
+})
+st.dataframe(fits_table.round(3))
+table_download_link(fits_table, __file__, 'regressao')
 
 st.write("---")
 st.write(
     f"Este gráfico de dispersão mostra a relação entre a proficiência em Língua Portuguesa e Matemática para os estudantes do **{inse_display_labels.get(selected_inse_level, f'INSE {selected_inse_level}')}**.")
 st.write(
     "Cada ponto representa um estudante, e sua posição nos eixos indica suas respectivas proficiências nas duas áreas. Os eixos foram ajustados para focar na área de dados relevante, melhorando a visualização das tendências.")
+st.write(
+    "A inclinação indica quantos pontos de Matemática, em média, acompanham cada ponto a mais em Língua Portuguesa; o desvio dos resíduos mede a dispersão dos estudantes em torno da reta. Estratos com até dois estudantes não são ajustados.")
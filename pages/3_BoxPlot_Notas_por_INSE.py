@@ -1,6 +1,14 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt # Importa a biblioteca matplotlib
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop, load_validated_data
+from utils.distributions import box_summary
+from utils.filters import filter_by_criteria, global_filter_criteria, render_weight_option
+from utils.pipeline import get_pipeline
+from utils.render import show_figure
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
 
 # --- Títulos e descrições para o Streamlit ---
 st.write("# Proficiência em Língua Portuguesa vs Matemática")
@@ -11,58 +19,66 @@ st.markdown(
     """
 )
 
-# --- Leitura e Pré-processamento dos Dados ---
-# Certifique-se de que o arquivo 'data/raw_data/df_es_filtrado.csv' está acessível.
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
+# --- Pipeline de cálculo da página ---
+# Cada passo declara suas entradas e é memorizado: ao trocar a proficiência no menu lateral,
+# apenas o resumo das caixas (e o desenho) são refeitos; leitura e filtros vêm da memória.
+pipeline = get_pipeline(__file__)
 
-# Verificar se as colunas essenciais existem
-required_cols = ['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE']
-missing_columns = [col for col in required_cols if col not in df_es.columns]
+# Mapeamento para garantir a ordem correta dos níveis do INSE (I, II, ..., VIII)
+# As chaves são os NÚMEROS que aparecem na coluna 'NU_TIPO_NIVEL_INSE'
+inse_display_labels = INSE_DISPLAY_LABELS
 
-if missing_columns:
-    st.error(f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
 
-# Cálculo da proficiência total
-# Forçar as colunas de proficiência a serem numéricas, tratando erros para NaN
-df_es['PROFICIENCIA_LP_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_LP_SAEB'], errors='coerce')
-df_es['PROFICIENCIA_MT_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_MT_SAEB'], errors='coerce')
-df_es['PROFICIENCIA_TOTAL'] = df_es['PROFICIENCIA_LP_SAEB'] + df_es['PROFICIENCIA_MT_SAEB']
+@pipeline.step('dados', params=['versao_dados'])
+def load_step(versao_dados):
+    # Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+    # na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino. O passo é compartilhado entre
+    # sessões e não exibe nada: uma falha na leitura é propagada e tratada pela página
+    return load_validated_data(DATA_FILE_PATH)[0]
 
 
-# --- Preparação dos Dados para o Box Plot do Matplotlib ---
-# Mapeamento para garantir a ordem correta dos níveis do INSE (I, II, ..., VIII)
-# AGORA, as chaves são os NÚMEROS que aparecem na coluna 'NU_TIPO_NIVEL_INSE'
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
+@pipeline.step('filtrados', inputs=['dados'], params=['filtros'])
+def filter_step(df, filtros):
+    return filter_by_criteria(df, DATA_FILE_PATH, filtros)
+
+
+@pipeline.step('caixas', params=['versao_dados', 'filtros', 'y_column_name', 'pesos'])
+def box_step(versao_dados, filtros, y_column_name, pesos):
+    # Quartis, hastes e outliers por nível de INSE (ponderados pelos pesos amostrais, se escolhido),
+    # guardados no banco de agregados (utils/distributions.py): o Matplotlib só desenha as caixas
+    box_stats = box_summary(DATA_FILE_PATH, versao_dados, filtros, y_column_name, pesos)
+    return [{**stats, 'label': inse_display_labels.get(stats['label'], f"INSE {stats['label']}")} for stats in box_stats]
 
-# Remover linhas onde a proficiência total é NaN OU onde o NU_TIPO_NIVEL_INSE é NaN
-df_es.dropna(subset=['PROFICIENCIA_TOTAL', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE'], inplace=True)
 
+# --- Leitura dos Dados ---
+# Erros de leitura ou validação são exibidos aqui, antes de o pipeline usar a tabela
+load_data_or_stop()
 
-# Filtrar para incluir apenas os INSEs que estão no nosso dicionário de labels
-df_es = df_es[df_es['NU_TIPO_NIVEL_INSE'].isin(inse_display_labels.keys())]
+pipeline_params = {
+    'versao_dados': dataset_version(DATA_FILE_PATH),
+    # --- Filtros globais (barra lateral) ---
+    'filtros': global_filter_criteria(DATA_FILE_PATH),
+}
+df_es = pipeline.run('filtrados', **pipeline_params)
 
-# Se após a remoção de NaNs e filtragem o DataFrame ficar vazio, avisar o usuário
+# Se após a filtragem o DataFrame ficar vazio, avisar o usuário
 if df_es.empty:
     st.warning("Após o pré-processamento, não há dados válidos para plotar. Verifique se os dados de INSE estão nos níveis esperados (1-8) e se há proficiência.")
     st.stop()
 
 # --- Opção de seleção de proficiência no Streamlit ---
 st.sidebar.header("Opções de Visualização")
-proficiency_option = st.sidebar.radio(
+proficiency_codes = {
+    'Proficiência Total': 'total',
+    'Proficiência em Língua Portuguesa': 'lp',
+    'Proficiência em Matemática': 'mt',
+}
+proficiency_option = query_bound_widget(
+    st.sidebar.radio,
     "Selecione o tipo de proficiência:",
-    ('Proficiência Total', 'Proficiência em Língua Portuguesa', 'Proficiência em Matemática')
+    'proficiencia', proficiency_codes, 'Proficiência Total',
+    key='opcao_proficiencia_boxplot',
+    options=tuple(proficiency_codes)
 )
 
 # Mapear a opção selecionada para o nome da coluna no DataFrame
@@ -77,37 +93,30 @@ else: # Proficiência em Matemática
     y_axis_label = 'Proficiência em Matemática'
 
 
-# Obter a lista de níveis de INSE numéricos únicos presentes no DataFrame após o tratamento, e ordená-los
-# Eles já são numéricos, então a ordenação natural funciona
-present_and_sorted_inse_values = sorted(df_es['NU_TIPO_NIVEL_INSE'].unique())
+use_weights = render_weight_option(DATA_FILE_PATH)
+
+# Resumo das caixas por nível de INSE da coluna selecionada
+boxes = pipeline.run('caixas', y_column_name=y_column_name, pesos=use_weights, **pipeline_params)
 
-# Criar uma lista de séries de dados e uma lista de rótulos para o box plot,
-# garantindo que apenas os níveis com dados válidos sejam incluídos.
-data_for_boxplot = []
-labels_for_boxplot = []
 
-for level_num in present_and_sorted_inse_values:
-    # Usar a coluna selecionada dinamicamente
-    subset_data = df_es[df_es['NU_TIPO_NIVEL_INSE'] == level_num][y_column_name]
-    if not subset_data.empty: # Garante que só adiciona se houver dados para o nível
-        data_for_boxplot.append(subset_data)
-        # Usa o dicionário 'inse_display_labels' para obter o rótulo de string correto
-        labels_for_boxplot.append(inse_display_labels.get(level_num, f'INSE {level_num}')) # Fallback se o número não estiver no dicionário
+# --- Criação do Box Plot com Matplotlib (desenhado pelo agendador) ---
+def draw_boxes():
+    fig = mpl_figure.Figure(figsize=(12, 6)) # Cria a figura e os eixos
+    ax = fig.subplots()
 
-# --- Criação do Box Plot com Matplotlib ---
-fig, ax = plt.subplots(figsize=(12, 6)) # Cria a figura e os eixos
+    # As mesmas caixas do Axes.boxplot, a partir das estatísticas já calculadas
+    ax.bxp(boxes, patch_artist=True, medianprops={'color': 'red'})
 
-# Passar os dados e os rótulos filtrados para o boxplot
-ax.boxplot(data_for_boxplot, labels=labels_for_boxplot, patch_artist=True, medianprops={'color': 'red'})
+    # Adicionar títulos e rótulos
+    ax.set_title(f'Distribuição de {proficiency_option} por Nível Socioeconômico' + (' (ponderada)' if use_weights else ''))
+    ax.set_xlabel('Nível Socioeconômico (INSE)') # Rótulo mais claro
+    ax.set_ylabel(y_axis_label) # Rótulo do eixo Y dinâmico
+    ax.grid(True) # Adiciona a grade
+    return fig
 
-# Adicionar títulos e rótulos
-ax.set_title(f'Distribuição de {proficiency_option} por Nível Socioeconômico')
-ax.set_xlabel('Nível Socioeconômico (INSE)') # Rótulo mais claro
-ax.set_ylabel(y_axis_label) # Rótulo do eixo Y dinâmico
-ax.grid(True) # Adiciona a grade
 
 # --- Exibir o gráfico no Streamlit ---
-st.pyplot(fig)
+show_figure(draw_boxes, __file__)
 
 # --- Informações Adicionais para o Streamlit ---
 st.write("---")
@@ -1,7 +1,15 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt # Importa a biblioteca matplotlib
 import numpy as np
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop, load_validated_data, stratified_sample
+from utils.distributions import violin_stats, violin_summary
+from utils.filters import filter_by_criteria, global_filter_criteria
+from utils.pipeline import get_pipeline
+from utils.render import PREVIEW_ROWS, show_progressive_figures
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
 
 # --- Títulos e descrições para o Streamlit ---
 st.write("# Distribuição de Proficiência por Nível Socioeconômico (Gráfico de Violino)")
@@ -13,57 +21,76 @@ st.markdown(
     """
 )
 
-# --- Leitura e Pré-processamento dos Dados ---
-# Certifique-se de que o arquivo 'data/raw_data/df_es_filtrado.csv' está acessível.
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
+# --- Pipeline de cálculo da página ---
+# Cada passo declara suas entradas e é memorizado: ao trocar a proficiência no menu lateral,
+# apenas os violinos (e o desenho) são refeitos; leitura e filtros vêm da memória.
+pipeline = get_pipeline(__file__)
 
-# Verificar se as colunas essenciais existem
-required_cols = ['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE']
-missing_columns = [col for col in required_cols if col not in df_es.columns]
+# Mapeamento para garantir a ordem correta dos níveis do INSE (I, II, ..., VIII)
+# As chaves são os NÚMEROS que aparecem na coluna 'NU_TIPO_NIVEL_INSE'
+inse_display_labels = INSE_DISPLAY_LABELS
 
-if missing_columns:
-    st.error(f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
 
-# Cálculo da proficiência total
-# Forçar as colunas de proficiência a serem numéricas, tratando erros para NaN
-df_es['PROFICIENCIA_LP_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_LP_SAEB'], errors='coerce')
-df_es['PROFICIENCIA_MT_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_MT_SAEB'], errors='coerce')
-df_es['PROFICIENCIA_TOTAL'] = df_es['PROFICIENCIA_LP_SAEB'] + df_es['PROFICIENCIA_MT_SAEB']
+@pipeline.step('dados', params=['versao_dados'])
+def load_step(versao_dados):
+    # Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+    # na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino. O passo é compartilhado entre
+    # sessões e não exibe nada: uma falha na leitura é propagada e tratada pela página
+    return load_validated_data(DATA_FILE_PATH)[0]
 
 
-# --- Preparação dos Dados para o Gráfico de Violino do Matplotlib ---
-# Mapeamento para garantir a ordem correta dos níveis do INSE (I, II, ..., VIII)
-# As chaves são os NÚMEROS que aparecem na coluna 'NU_TIPO_NIVEL_INSE'
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
+@pipeline.step('filtrados', inputs=['dados'], params=['filtros'])
+def filter_step(df, filtros):
+    return filter_by_criteria(df, DATA_FILE_PATH, filtros)
+
+
+@pipeline.step('violinos', params=['versao_dados', 'filtros', 'y_column_name'])
+def violin_step(versao_dados, filtros, y_column_name):
+    # Densidade, média, mediana e extremos por nível de INSE de todos os estudantes, guardados no
+    # banco de agregados (utils/distributions.py): o Matplotlib só desenha os violinos
+    return violin_summary(DATA_FILE_PATH, versao_dados, filtros, y_column_name)
 
-# Remover linhas onde a proficiência total é NaN OU onde o NU_TIPO_NIVEL_INSE é NaN
-df_es.dropna(subset=['PROFICIENCIA_TOTAL', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE'], inplace=True)
 
-# Filtrar para incluir apenas os INSEs que estão no nosso dicionário de labels
-df_es = df_es[df_es['NU_TIPO_NIVEL_INSE'].isin(inse_display_labels.keys())]
+@pipeline.step('amostra', inputs=['filtrados'])
+def sample_step(df):
+    # Amostra estratificada por INSE e gênero (chaves calculadas na carga) para a prévia do gráfico
+    return stratified_sample(df, PREVIEW_ROWS)
 
-# Se após a remoção de NaNs e filtragem o DataFrame ficar vazio, avisar o usuário
+
+@pipeline.step('violinos_amostra', inputs=['amostra'], params=['y_column_name'])
+def sample_violin_step(df, y_column_name):
+    return violin_stats(df, y_column_name)
+
+
+# --- Leitura dos Dados ---
+# Erros de leitura ou validação são exibidos aqui, antes de o pipeline usar a tabela
+load_data_or_stop()
+
+pipeline_params = {
+    'versao_dados': dataset_version(DATA_FILE_PATH),
+    # --- Filtros globais (barra lateral) ---
+    'filtros': global_filter_criteria(DATA_FILE_PATH),
+}
+df_es = pipeline.run('filtrados', **pipeline_params)
+
+# Se após a filtragem o DataFrame ficar vazio, avisar o usuário
 if df_es.empty:
     st.warning("Após o pré-processamento, não há dados válidos para plotar. Verifique se os dados de INSE estão nos níveis esperados (1-8) e se há proficiência.")
     st.stop()
 
 # --- Opção de seleção de proficiência no Streamlit (Sidebar) ---
 st.sidebar.header("Opções de Visualização")
-proficiency_option = st.sidebar.radio(
+proficiency_codes = {
+    'Proficiência Total': 'total',
+    'Proficiência em Língua Portuguesa': 'lp',
+    'Proficiência em Matemática': 'mt',
+}
+proficiency_option = query_bound_widget(
+    st.sidebar.radio,
     "Selecione o tipo de proficiência:",
-    ('Proficiência Total', 'Proficiência em Língua Portuguesa', 'Proficiência em Matemática')
+    'proficiencia', proficiency_codes, 'Proficiência Total',
+    key='opcao_proficiencia_violino',
+    options=tuple(proficiency_codes)
 )
 
 # Mapear a opção selecionada para o nome da coluna no DataFrame
@@ -78,44 +105,40 @@ else: # Proficiência em Matemática
     y_axis_label = 'Proficiência em Matemática'
 
 
-# Obter a lista de níveis de INSE numéricos únicos presentes no DataFrame após o tratamento, e ordená-los
-present_and_sorted_inse_values = sorted(df_es['NU_TIPO_NIVEL_INSE'].unique())
-
-# Criar uma lista de séries de dados e uma lista de rótulos para o gráfico de violino,
-# garantindo que apenas os níveis com dados válidos sejam incluídos.
-data_for_violinplot = []
-labels_for_violinplot = []
+# Violinos por nível de INSE da coluna selecionada
+violins = pipeline.run('violinos', y_column_name=y_column_name, **pipeline_params)
 
-for level_num in present_and_sorted_inse_values:
-    # Usar a coluna selecionada dinamicamente
-    subset_data = df_es[df_es['NU_TIPO_NIVEL_INSE'] == level_num][y_column_name]
-    if not subset_data.empty: # Garante que só adiciona se houver dados para o nível
-        data_for_violinplot.append(subset_data)
-        # Usa o dicionário 'inse_display_labels' para obter o rótulo de string correto
-        labels_for_violinplot.append(inse_display_labels.get(level_num, f'INSE {level_num}')) # Fallback se o número não estiver no dicionário
 
 # --- Criação do Gráfico de Violino com Matplotlib ---
-fig, ax = plt.subplots(figsize=(12, 6)) # Cria a figura e os eixos
+# O gráfico completo usa os violinos de todos os estudantes; se o desenho demorar, a página exibe antes
+# uma prévia com os violinos da amostra estratificada, trocada pelo gráfico completo quando ele termina
+def draw_violins(level_violins):
+    fig = mpl_figure.Figure(figsize=(12, 6)) # Cria a figura e os eixos
+    ax = fig.subplots()
 
-# Passar os dados e os rótulos filtrados para o violinplot
-# 'showmeans=True' adiciona uma marca para a média
-# 'showmedians=True' adiciona uma marca para a mediana
-# 'showextrema=False' remove as linhas que mostram os valores mínimo e máximo
-ax.violinplot(data_for_violinplot, showmeans=True, showmedians=True)
+    # Os mesmos violinos do Axes.violinplot, a partir das estatísticas já calculadas
+    # 'showmeans=True' adiciona uma marca para a média
+    # 'showmedians=True' adiciona uma marca para a mediana
+    ax.violin(level_violins, showmeans=True, showmedians=True)
 
-# Define os rótulos do eixo X manualmente, pois violinplot não tem um parâmetro 'labels' direto como boxplot
-ax.set_xticks(np.arange(1, len(labels_for_violinplot) + 1))
-ax.set_xticklabels(labels_for_violinplot)
+    # Define os rótulos do eixo X manualmente, pois o violino não tem um parâmetro 'labels' direto como o boxplot
+    ax.set_xticks(np.arange(1, len(level_violins) + 1))
+    ax.set_xticklabels([inse_display_labels.get(stats['label'], f"INSE {stats['label']}") for stats in level_violins])
 
 
-# Adicionar títulos e rótulos
-ax.set_title(f'Distribuição de {proficiency_option} por Nível Socioeconômico')
-ax.set_xlabel('Nível Socioeconômico (INSE)') # Rótulo mais claro
-ax.set_ylabel(y_axis_label) # Rótulo do eixo Y dinâmico
-ax.grid(True, axis='y', linestyle='--', alpha=0.7) # Adiciona grade no eixo Y
+    # Adicionar títulos e rótulos
+    ax.set_title(f'Distribuição de {proficiency_option} por Nível Socioeconômico')
+    ax.set_xlabel('Nível Socioeconômico (INSE)') # Rótulo mais claro
+    ax.set_ylabel(y_axis_label) # Rótulo do eixo Y dinâmico
+    ax.grid(True, axis='y', linestyle='--', alpha=0.7) # Adiciona grade no eixo Y
+    return fig
+
 
 # --- Exibir o gráfico no Streamlit ---
-st.pyplot(fig)
+show_progressive_figures(
+    [draw_violins], violins,
+    lambda: pipeline.run('violinos_amostra', y_column_name=y_column_name, **pipeline_params), len(df_es), __file__
+)
 
 # --- Informações Adicionais para o Streamlit ---
 st.write("---")
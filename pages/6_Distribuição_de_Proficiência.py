@@ -1,7 +1,14 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np # Necessário para np.arange
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, dataset_version, load_data_or_stop, stratified_sample
+from utils.distributions import histogram_counts, histogram_summary
+from utils.filters import filter_by_criteria, global_filter_criteria
+from utils.render import PREVIEW_ROWS, show_progressive_figures
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
 # Removido: from scipy.stats import gaussian_kde # Importa para cálculo do KDE
 
 # --- Títulos e descrições para o Streamlit ---
@@ -13,52 +20,35 @@ st.markdown(
     """
 )
 
-# --- Leitura e Pré-processamento dos Dados ---
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
-
-# Verificar se as colunas essenciais existem
-required_cols = ['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE']
-missing_columns = [col for col in required_cols if col not in df_es.columns]
-
-if missing_columns:
-    st.error(f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
+# --- Leitura dos Dados ---
+# Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+# na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino
+df_es = load_data_or_stop()
 
-# Forçar as colunas de proficiência e INSE a serem numéricas, tratando erros para NaN
-df_es['PROFICIENCIA_LP_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_LP_SAEB'], errors='coerce')
-df_es['PROFICIENCIA_MT_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_MT_SAEB'], errors='coerce')
-df_es['NU_TIPO_NIVEL_INSE'] = pd.to_numeric(df_es['NU_TIPO_NIVEL_INSE'], errors='coerce')
-
-# Remover linhas com valores nulos nas colunas essenciais
-df_es.dropna(subset=['PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB', 'NU_TIPO_NIVEL_INSE'], inplace=True)
+# --- Filtros globais (barra lateral) ---
+criteria = global_filter_criteria(DATA_FILE_PATH)
+df_es = filter_by_criteria(df_es, DATA_FILE_PATH, criteria)
 
 if df_es.empty:
     st.warning("Após o pré-processamento, não há dados válidos para plotar os histogramas.")
     st.stop()
 
 # Mapeamento para exibir os níveis do INSE como strings
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
+inse_display_labels = INSE_DISPLAY_LABELS
 
 # --- Seleção de Nível INSE na barra lateral ---
 st.sidebar.header("Filtro por Nível Socioeconômico (INSE)")
 # Obter os níveis INSE únicos e ordenados presentes nos dados
 available_inse_levels = sorted(df_es['NU_TIPO_NIVEL_INSE'].unique())
 
-selected_inse_levels_nums = st.sidebar.multiselect(
-    label="Selecione um ou mais Níveis Socioeconômicos (INSE):",
+selected_inse_levels_nums = query_bound_widget(
+    st.sidebar.multiselect,
+    "Selecione um ou mais Níveis Socioeconômicos (INSE):",
+    'inse', {level: str(level) for level in available_inse_levels},
+    available_inse_levels, # Seleciona todos por padrão
+    key='opcao_inse_distribuicao',
+    multiple=True,
     options=available_inse_levels,
-    default=available_inse_levels, # Seleciona todos por padrão
     format_func=lambda x: inse_display_labels.get(x, f'INSE {x}')
 )
 
@@ -68,66 +58,65 @@ if not selected_inse_levels_nums:
     selected_inse_levels_nums = available_inse_levels
 
 # Filtrar o DataFrame com base nos níveis INSE selecionados
-df_filtered = df_es[df_es['NU_TIPO_NIVEL_INSE'].isin(selected_inse_levels_nums)].copy()
+df_filtered = df_es[df_es['NU_TIPO_NIVEL_INSE'].isin(selected_inse_levels_nums)]
 
 if df_filtered.empty:
     st.warning("Não há dados para os Níveis Socioeconômicos selecionados. Por favor, ajuste sua seleção.")
     st.stop()
 
 # --- Criação dos Histogramas com Matplotlib ---
-# Configura o layout para dois subplots na vertical, compartilhando o eixo X
-fig, axes = plt.subplots(2, 1, figsize=(12, 14), sharex=True) # 2 linhas, 1 coluna
-
-# --- Plot para Língua Portuguesa ---
-ax_lp = axes[0]
-data_lp_hist = [] # Dados para o histograma empilhado
-labels_lp = []    # Rótulos para a legenda
-
-# Coleta os dados e rótulos para o histograma empilhado
-for level_num in sorted(selected_inse_levels_nums):
-    subset_data = df_filtered[df_filtered['NU_TIPO_NIVEL_INSE'] == level_num]['PROFICIENCIA_LP_SAEB']
-    if not subset_data.empty:
-        data_lp_hist.append(subset_data)
-        labels_lp.append(inse_display_labels.get(level_num, f'INSE {level_num}'))
-
-if data_lp_hist:
-    # Plota o histograma empilhado
-    ax_lp.hist(data_lp_hist, bins=20, stacked=True, label=labels_lp, edgecolor='black', alpha=0.7)
-    ax_lp.legend(title='Nível INSE') # Coloca a legenda após adicionar a KDE
-
-ax_lp.set_title('Distribuição de Proficiência em Língua Portuguesa')
-ax_lp.set_xlabel('Proficiência em LP')
-ax_lp.set_ylabel('Frequência')
-ax_lp.grid(axis='y', linestyle='--', alpha=0.7)
-
-
-# --- Plot para Matemática ---
-ax_mt = axes[1]
-data_mt_hist = [] # Dados para o histograma empilhado
-labels_mt = []    # Rótulos para a legenda
-
-# Coleta os dados e rótulos para o histograma empilhado
-for level_num in sorted(selected_inse_levels_nums):
-    subset_data = df_filtered[df_filtered['NU_TIPO_NIVEL_INSE'] == level_num]['PROFICIENCIA_MT_SAEB']
-    if not subset_data.empty:
-        data_mt_hist.append(subset_data)
-        labels_mt.append(inse_display_labels.get(level_num, f'INSE {level_num}'))
-
-if data_mt_hist:
-    # Plota o histograma empilhado
-    ax_mt.hist(data_mt_hist, bins=20, stacked=True, label=labels_mt, edgecolor='black', alpha=0.7)
-    ax_mt.legend(title='Nível INSE') # Coloca a legenda após adicionar a KDE
-
-ax_mt.set_title('Distribuição de Proficiência em Matemática')
-ax_mt.set_xlabel('Proficiência em MT')
-ax_mt.set_ylabel('Frequência')
-ax_mt.grid(axis='y', linestyle='--', alpha=0.7)
-
-# Ajustar layout para evitar sobreposição
-plt.tight_layout()
+# Cada proficiência é um painel independente (uma figura própria, criada pela API orientada a objetos
+# do Matplotlib), para que os dois possam ser desenhados em paralelo. Cada painel recebe as contagens
+# por faixa e nível de INSE (utils/distributions.py): primeiro as de uma amostra estratificada (prévia)
+# e depois as de todos os estudantes selecionados, guardadas no banco de agregados
+subject_titles = {
+    'PROFICIENCIA_LP_SAEB': ('Língua Portuguesa', 'LP'),
+    'PROFICIENCIA_MT_SAEB': ('Matemática', 'MT'),
+}
+histograms = histogram_summary(
+    DATA_FILE_PATH, dataset_version(DATA_FILE_PATH), criteria, tuple(subject_titles),
+    tuple(int(level) for level in selected_inse_levels_nums)
+)
+# Os dois painéis usam a mesma escala no eixo X (como num único gráfico com eixo compartilhado)
+x_min, x_max = histograms['limites']
+x_margin = 0.05 * (x_max - x_min)
+
+
+def histogram_panel(column):
+    subject_name, subject_code = subject_titles[column]
+
+    def draw(summary):
+        fig = mpl_figure.Figure(figsize=(12, 7))
+        ax = fig.subplots()
+        edges = summary['colunas'][column]['bordas']
+        # Rótulos para a legenda (níveis em ordem crescente)
+        labels = [inse_display_labels.get(level, f'INSE {level}') for level in summary['niveis']]
+
+        if labels:
+            # Plota o histograma empilhado: cada faixa recebe como peso a contagem do nível
+            ax.hist([edges[:-1]] * len(labels), bins=edges, weights=summary['colunas'][column]['contagens'],
+                    stacked=True, label=labels, edgecolor='black', alpha=0.7)
+            ax.legend(title='Nível INSE')
+
+        ax.set_xlim(x_min - x_margin, x_max + x_margin)
+        ax.set_title(f'Distribuição de Proficiência em {subject_name}')
+        ax.set_xlabel(f'Proficiência em {subject_code}')
+        ax.set_ylabel('Frequência')
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+        # Ajustar layout para evitar sobreposição
+        fig.tight_layout()
+        return fig
+
+    return draw
+
 
 # --- Exibir os gráficos no Streamlit ---
-st.pyplot(fig)
+show_progressive_figures(
+    [histogram_panel(column) for column in subject_titles], histograms,
+    lambda: histogram_counts(stratified_sample(df_filtered, PREVIEW_ROWS), tuple(subject_titles)),
+    len(df_filtered), __file__
+)
 
 # --- Informações Adicionais para o Streamlit ---
 st.write("---")
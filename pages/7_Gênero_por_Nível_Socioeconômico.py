@@ -1,7 +1,12 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, load_data_or_stop
+from utils.filters import apply_global_filters
+from utils.render import show_figure, table_download_link
+from utils.startup import lazy_import
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
 
 # --- Títulos e descrições para o Streamlit ---
 st.write("# Distribuição de Gênero por Nível Socioeconômico")
@@ -12,49 +17,20 @@ st.markdown(
     """
 )
 
-# --- Leitura e Pré-processamento dos Dados ---
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
-
-# Verificar se as colunas essenciais existem
-required_cols = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01']
-missing_columns = [col for col in required_cols if col not in df_es.columns]
-
-if missing_columns:
-    st.error(f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
+# --- Leitura dos Dados ---
+# Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+# na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino
+df_es = load_data_or_stop()
 
-# Forçar a coluna INSE a ser numérica e remover NaNs
-df_es['NU_TIPO_NIVEL_INSE'] = pd.to_numeric(df_es['NU_TIPO_NIVEL_INSE'], errors='coerce')
-df_es.dropna(subset=['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01'], inplace=True)
+# --- Filtros globais (barra lateral) ---
+df_es = apply_global_filters(df_es, DATA_FILE_PATH)
 
 if df_es.empty:
     st.warning("Após o pré-processamento, não há dados válidos para plotar a distribuição de gênero.")
     st.stop()
 
 # Mapeamento para exibir os níveis do INSE como strings
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
-
-# Mapear os valores de gênero diretamente (se já estiverem como 'Masculino'/'Feminino')
-# Se houver outros valores como '.', 'C', '*', eles se tornarão NaN e serão removidos.
-gender_mapping = {
-    'Masculino': 'Masculino',
-    'Feminino': 'Feminino'
-}
-df_es['TX_RESP_Q01_LABEL'] = df_es['TX_RESP_Q01'].map(gender_mapping)
-
-# Remover NaNs que podem surgir do mapeamento de gênero, se houver outros valores
-df_es.dropna(subset=['TX_RESP_Q01_LABEL'], inplace=True)
+inse_display_labels = INSE_DISPLAY_LABELS
 
 
 # Contar a distribuição de gênero por nível socioeconômico
@@ -80,33 +56,38 @@ for col in present_gender_cols:
 
 
 # --- Criação do Gráfico de Barras Agrupadas com Matplotlib ---
-fig, ax = plt.subplots(figsize=(12, 7)) # Cria a figura e os eixos
-
-# Plota o gráfico de barras agrupadas diretamente do DataFrame processado
-gender_socioeconomic_counts.plot(
-    kind='bar',
-    ax=ax,
-    width=0.8, # Largura das barras
-    edgecolor='black'
-)
-
-# Definir os rótulos do eixo X usando o mapeamento INSE
-tick_positions = np.arange(len(gender_socioeconomic_counts.index))
-tick_labels = [inse_display_labels.get(level, str(level)) for level in gender_socioeconomic_counts.index]
-ax.set_xticks(tick_positions)
-ax.set_xticklabels(tick_labels, rotation=45, ha='right') # Rotação para melhor leitura
-
-# Adicionar títulos e rótulos
-ax.set_title('Distribuição de Gênero por Nível Socioeconômico')
-ax.set_xlabel('Nível Socioeconômico (INSE)')
-ax.set_ylabel('Número de Alunos')
-ax.legend(title='Gênero')
-ax.grid(axis='y', linestyle='--', alpha=0.7) # Adiciona grade no eixo Y
+def draw_counts():
+    fig = mpl_figure.Figure(figsize=(12, 7)) # Cria a figura e os eixos
+    ax = fig.subplots()
+
+    # Plota o gráfico de barras agrupadas diretamente do DataFrame processado
+    gender_socioeconomic_counts.plot(
+        kind='bar',
+        ax=ax,
+        width=0.8, # Largura das barras
+        edgecolor='black'
+    )
+
+    # Definir os rótulos do eixo X usando o mapeamento INSE
+    tick_positions = np.arange(len(gender_socioeconomic_counts.index))
+    tick_labels = [inse_display_labels.get(level, str(level)) for level in gender_socioeconomic_counts.index]
+    ax.set_xticks(tick_positions)
+    ax.set_xticklabels(tick_labels, rotation=45, ha='right') # Rotação para melhor leitura
+
+    # Adicionar títulos e rótulos
+    ax.set_title('Distribuição de Gênero por Nível Socioeconômico')
+    ax.set_xlabel('Nível Socioeconômico (INSE)')
+    ax.set_ylabel('Número de Alunos')
+    ax.legend(title='Gênero')
+    ax.grid(axis='y', linestyle='--', alpha=0.7) # Adiciona grade no eixo Y
+
+    fig.tight_layout() # Ajusta o layout para evitar sobreposição
+    return fig
 
-plt.tight_layout() # Ajusta o layout para evitar sobreposição
 
 # --- Exibir o gráfico no Streamlit ---
-st.pyplot(fig)
+show_figure(draw_counts, __file__, simple_chart=True)
+table_download_link(gender_socioeconomic_counts, __file__, 'contagem_genero_inse')
 
 # --- Informações Adicionais para o Streamlit ---
 st.write("---")
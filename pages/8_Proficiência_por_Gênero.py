@@ -1,7 +1,15 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
+from utils.data import DATA_FILE_PATH, INSE_DISPLAY_LABELS, WEIGHT_COLUMNS, load_data_or_stop
+from utils.filters import apply_global_filters, render_weight_option
+from utils.render import show_figure
+from utils.stats import weighted_box_stats
+from utils.startup import lazy_import
+from utils.state import query_bound_widget
+
+# O Matplotlib (e o backend Agg) só é carregado quando o gráfico é criado
+mpl_figure = lazy_import('matplotlib.figure', __file__)
+mpl_patches = lazy_import('matplotlib.patches', __file__)
 
 # --- Títulos e descrições para o Streamlit ---
 st.write("# Proficiência por Nível Socioeconômico e Gênero")
@@ -13,56 +21,31 @@ st.markdown(
     """
 )
 
-# --- Leitura e Pré-processamento dos Dados ---
-file_path = 'data/raw_data/df_es_filtrado.csv'
-try:
-    df_es = pd.read_csv(file_path, sep=",")
-except FileNotFoundError:
-    st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
-    st.stop()
-
-# Verificar se as colunas essenciais existem
-required_cols = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB']
-missing_columns = [col for col in required_cols if col not in df_es.columns]
+# --- Leitura dos Dados ---
+# Os dados são validados uma única vez na ingestão (utils/data.py): proficiências numéricas
+# na escala SAEB, INSE de 1 a 8 e gênero Masculino/Feminino
+df_es = load_data_or_stop()
 
-if missing_columns:
-    st.error(f"Erro: As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. Verifique o dicionário de dados e o arquivo.")
-    st.stop()
-
-# Forçar colunas a serem numéricas e remover NaNs
-df_es['NU_TIPO_NIVEL_INSE'] = pd.to_numeric(df_es['NU_TIPO_NIVEL_INSE'], errors='coerce')
-df_es['PROFICIENCIA_LP_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_LP_SAEB'], errors='coerce')
-df_es['PROFICIENCIA_MT_SAEB'] = pd.to_numeric(df_es['PROFICIENCIA_MT_SAEB'], errors='coerce')
+# --- Filtros globais (barra lateral) ---
+df_es = apply_global_filters(df_es, DATA_FILE_PATH)
 
-# Mapear os valores de gênero diretamente (se já estiverem como 'Masculino'/'Feminino')
-gender_mapping = {
-    'Masculino': 'Masculino',
-    'Feminino': 'Feminino'
-}
-df_es['TX_RESP_Q01_LABEL'] = df_es['TX_RESP_Q01'].map(gender_mapping)
-
-# Remover linhas com valores nulos nas colunas essenciais para o plot
-df_es.dropna(subset=['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01_LABEL', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB'], inplace=True)
 
 if df_es.empty:
     st.warning("Após o pré-processamento, não há dados válidos para plotar a distribuição de gênero e proficiência. Verifique as colunas de INSE, Gênero e Proficiências.")
     st.stop()
 
 # Mapeamento para exibir os níveis do INSE como strings (para rótulos)
-inse_display_labels = {
-    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
-    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
-}
+inse_display_labels = INSE_DISPLAY_LABELS
 
 # --- Seleção de Proficiência na barra lateral ---
 st.sidebar.header("Opções de Proficiência")
-selected_proficiency = st.sidebar.radio(
-    label="Selecione a Proficiência:",
-    options=['Língua Portuguesa', 'Matemática'],
-    index=0 # Padrão para Língua Portuguesa
+proficiency_codes = {'Língua Portuguesa': 'lp', 'Matemática': 'mt'}
+selected_proficiency = query_bound_widget(
+    st.sidebar.radio,
+    "Selecione a Proficiência:",
+    'proficiencia', proficiency_codes, 'Língua Portuguesa', # Padrão para Língua Portuguesa
+    key='opcao_proficiencia_genero',
+    options=list(proficiency_codes)
 )
 
 # Definir a coluna de proficiência e o rótulo do eixo Y com base na seleção
@@ -74,6 +57,14 @@ else:
     y_axis_label = 'Proficiência em Matemática'
 
 
+use_weights = render_weight_option(DATA_FILE_PATH)
+if use_weights:
+    # Quartis, hastes e outliers ponderados por INSE × gênero, calculados de uma vez
+    weighted_boxes = {
+        stats['label']: stats
+        for stats in weighted_box_stats(df_es, ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01_LABEL'], proficiency_col, WEIGHT_COLUMNS[proficiency_col])
+    }
+
 # --- Preparação dos Dados para o Box Plot Agrupado ---
 sorted_inse_levels = sorted(df_es['NU_TIPO_NIVEL_INSE'].unique())
 data_for_boxplot = []
@@ -112,45 +103,58 @@ for i, level_num in enumerate(sorted_inse_levels):
 
 
 # --- Criação do Gráfico de Box Plot Agrupado com Matplotlib ---
-fig, ax = plt.subplots(figsize=(14, 8)) # Cria a figura e os eixos
-
-# Cores para Masculino e Feminino
-colors = ['#1f77b4', '#ff7f0e'] # Azul para Masculino, Laranja para Feminino
-box_colors = []
-for _ in sorted_inse_levels:
-    box_colors.extend(colors) # Alterna as cores para cada par (Masculino, Feminino)
-
-# Crie os boxplots
-bp = ax.boxplot(data_for_boxplot, positions=box_positions, widths=0.4, patch_artist=True,
-                medianprops={'color': 'red'},
-                boxprops=dict(edgecolor='black'))
-
-# Atribuir cores aos boxes
-for patch, color in zip(bp['boxes'], box_colors):
-    patch.set_facecolor(color)
-
-# Definir os rótulos do eixo X e suas posições
-ax.set_xticks(xtick_positions)
-ax.set_xticklabels(xtick_labels, rotation=45, ha='right') # Rotação para melhor leitura
-
-
-# Criar legendas customizadas para Masculino e Feminino
-handles = [plt.Rectangle((0,0),1,1, fc=colors[0], edgecolor='black'),
-           plt.Rectangle((0,0),1,1, fc=colors[1], edgecolor='black')]
-labels = ['Masculino', 'Feminino']
-ax.legend(handles, labels, title='Gênero')
-
-
-# Adicionar títulos e rótulos
-ax.set_title(f'Distribuição de {selected_proficiency} por Nível Socioeconômico e Gênero')
-ax.set_xlabel('Nível Socioeconômico (INSE)')
-ax.set_ylabel(y_axis_label)
-ax.grid(axis='y', linestyle='--', alpha=0.7) # Adiciona grade no eixo Y
+def draw_boxes():
+    fig = mpl_figure.Figure(figsize=(14, 8)) # Cria a figura e os eixos
+    ax = fig.subplots()
+
+    # Cores para Masculino e Feminino
+    colors = ['#1f77b4', '#ff7f0e'] # Azul para Masculino, Laranja para Feminino
+    box_colors = []
+    for _ in sorted_inse_levels:
+        box_colors.extend(colors) # Alterna as cores para cada par (Masculino, Feminino)
+
+    # Crie os boxplots
+    if use_weights:
+        # Mesmo desenho, com as estatísticas ponderadas (pares sem estudantes ficam com uma caixa vazia)
+        box_stats = [
+            weighted_boxes.get((level_num, gender), {'med': np.nan, 'q1': np.nan, 'q3': np.nan,
+                                                     'whislo': np.nan, 'whishi': np.nan, 'fliers': []})
+            for level_num in sorted_inse_levels for gender in ('Masculino', 'Feminino')
+        ]
+        bp = ax.bxp(box_stats, positions=box_positions, widths=0.4, patch_artist=True,
+                    medianprops={'color': 'red'},
+                    boxprops=dict(edgecolor='black'))
+    else:
+        bp = ax.boxplot(data_for_boxplot, positions=box_positions, widths=0.4, patch_artist=True,
+                        medianprops={'color': 'red'},
+                        boxprops=dict(edgecolor='black'))
+
+    # Atribuir cores aos boxes
+    for patch, color in zip(bp['boxes'], box_colors):
+        patch.set_facecolor(color)
+
+    # Definir os rótulos do eixo X e suas posições
+    ax.set_xticks(xtick_positions)
+    ax.set_xticklabels(xtick_labels, rotation=45, ha='right') # Rotação para melhor leitura
+
+    # Criar legendas customizadas para Masculino e Feminino
+    handles = [mpl_patches.Rectangle((0,0),1,1, fc=colors[0], edgecolor='black'),
+               mpl_patches.Rectangle((0,0),1,1, fc=colors[1], edgecolor='black')]
+    labels = ['Masculino', 'Feminino']
+    ax.legend(handles, labels, title='Gênero')
+
+    # Adicionar títulos e rótulos
+    ax.set_title(f'Distribuição de {selected_proficiency} por Nível Socioeconômico e Gênero' + (' (ponderada)' if use_weights else ''))
+    ax.set_xlabel('Nível Socioeconômico (INSE)')
+    ax.set_ylabel(y_axis_label)
+    ax.grid(axis='y', linestyle='--', alpha=0.7) # Adiciona grade no eixo Y
+
+    fig.tight_layout() # Ajusta o layout para evitar sobreposição
+    return fig
 
-plt.tight_layout() # Ajusta o layout para evitar sobreposição
 
 # --- Exibir o gráfico no Streamlit ---
-st.pyplot(fig)
+show_figure(draw_boxes, __file__)
 
 # --- Informações Adicionais para o Streamlit ---
 st.write("---")
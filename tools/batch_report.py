@@ -0,0 +1,100 @@
+"""Gerador de relatórios em lote: produz, sem navegador, todos os gráficos e tabelas das páginas 1 a 9.
+
+As páginas são executadas sem servidor, reaproveitando exatamente o código do aplicativo (ver
+utils/report.py). Cada unidade (o estado inteiro e cada município) é processada num processo do pool.
+O resultado é uma pasta por unidade, com um PNG por gráfico, um CSV por tabela e um PDF com todos os gráficos.
+
+Uso:
+    python tools/batch_report.py --out relatorios
+    python tools/batch_report.py --units estado --formats pdf
+    python tools/batch_report.py --municipios 6325267 6325268 --workers 2
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from utils.report import STATE_UNIT, init_worker, render_unit  # noqa: E402
+
+# Núcleos disponíveis para o processo (os.sched_getaffinity só existe em alguns sistemas, como o Linux)
+DEFAULT_WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def list_units(scope):
+    """Unidades do relatório: o estado inteiro e/ou cada município presente nos dados validados."""
+    import pandas as pd
+
+    from utils.data import DATA_FILE_PATH, validate_data
+
+    units = []
+    if scope in ('estado', 'todos'):
+        units.append(STATE_UNIT)
+    if scope in ('municipios', 'todos'):
+        df, _ = validate_data(pd.read_csv(DATA_FILE_PATH, sep=','))
+        units.extend(str(code) for code in sorted(df['ID_MUNICIPIO'].unique()))
+    return units
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Gera os gráficos e tabelas de todas as páginas para o estado e os municípios.")
+    parser.add_argument('--out', default='relatorios', help="Pasta de saída (uma subpasta por unidade).")
+    parser.add_argument('--units', choices=['estado', 'municipios', 'todos'], default='todos',
+                        help="Unidades a gerar.")
+    parser.add_argument('--municipios', nargs='+', metavar='CODIGO',
+                        help="Gera apenas estes municípios (códigos de ID_MUNICIPIO).")
+    parser.add_argument('--formats', nargs='+', choices=['png', 'pdf'], default=['png', 'pdf'])
+    parser.add_argument('--dpi', type=int, default=150, help="Resolução dos PNGs.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Número de processos.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out_dir = Path(args.out).resolve()
+    init_worker()
+    units = args.municipios or list_units(args.units)
+    if args.municipios:
+        # Um código desconhecido geraria apenas uma pasta vazia
+        known = set(list_units('municipios'))
+        unknown = [code for code in args.municipios if code not in known]
+        if unknown:
+            print(f"Município(s) não encontrado(s) nos dados: {', '.join(unknown)}", file=sys.stderr)
+            return 2
+
+    started = time.perf_counter()
+    print(f"Gerando {len(units)} relatório(s) com {args.workers} processo(s) em {out_dir}")
+    failures = 0
+    # "spawn": os processos começam limpos, sem herdar as threads e os caches do processo principal
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=init_worker) as pool:
+        futures = {pool.submit(render_unit, unit, out_dir, args.formats, args.dpi): unit for unit in units}
+        for future in as_completed(futures):
+            try:
+                unit, n_figures, n_tables, skipped, errors, elapsed = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"  {futures[future]}: falhou ({e})")
+                continue
+            note = f", {len(skipped)} visualização(ões) sem dados" if skipped else ""
+            if errors:
+                note += f", {len(errors)} com erro"
+                failures += 1
+            elif not n_figures and not n_tables:
+                note += ", nenhuma visualização gerada"
+                failures += 1
+            print(f"  {unit}: {n_figures} gráficos, {n_tables} tabelas em {elapsed:.1f} s{note}")
+            for view, message in errors:
+                print(f"    {view}: {message}")
+    status = f", {failures} unidade(s) com falha" if failures else ""
+    print(f"Concluído em {time.perf_counter() - started:.1f} s{status}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""Gerador de carga local: simula N sessões concorrentes do aplicativo Streamlit.
+
+Cada sessão abre o websocket do Streamlit (o mesmo protocolo usado pelo navegador), navega até as
+páginas e altera os widgets de acordo com os roteiros abaixo. Ao final são informados os
+percentis p50/p95/p99 da latência de cada reexecução, a vazão e a memória (RSS) do servidor.
+
+Uso:
+    python tools/loadtest.py --sessions 20 --duration 60
+    python tools/loadtest.py --url http://localhost:8501 --sessions 5   # servidor já em execução
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+
+import numpy as np
+import tornado.httpclient
+import tornado.websocket
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MAIN_SCRIPT = 'Introdução.py'
+
+PROFICIENCY_OPTIONS = ['Proficiência Total', 'Proficiência em Língua Portuguesa', 'Proficiência em Matemática']
+SUBJECT_OPTIONS = ['Língua Portuguesa', 'Matemática']
+# Imagens em Markdown (``![Gráfico](/app/static/...)``): os gráficos publicados no cache estático
+MARKDOWN_IMAGE = re.compile(r'!\[[^\]]*\]\(([^)\s]+)\)')
+
+INSE_LABELS = ['Nível I', 'Nível II', 'Nível III', 'Nível IV', 'Nível V', 'Nível VI', 'Nível VII', 'Nível VIII']
+
+# Roteiros de interação: (nome da página como exibido no menu, rótulo do widget, valores a selecionar em sequência).
+# Para rádios o valor é o índice da opção; para multiselects, a lista de opções formatadas.
+SCENARIOS = [
+    ('BoxPlot Notas por INSE', 'Selecione o tipo de proficiência:', [1, 2, 0]),
+    ('Violin Notas por INSE', 'Selecione o tipo de proficiência:', [1, 2, 0]),
+    ('Proficiência por Gênero', 'Selecione a Proficiência:', [1, 0]),
+    ('Proficiência Média por Nível Socioeconômico', 'Selecione a Proficiência:', [1, 0]),
+    ('Distribuição de Proficiência', 'Selecione um ou mais Níveis Socioeconômicos (INSE):',
+     [INSE_LABELS[:4], INSE_LABELS[4:], INSE_LABELS[::2], INSE_LABELS]),
+    ('Gráfico de Dispersão', 'Selecione o Nível Socioeconômico (INSE):', [0, 3, 5, 7]),
+]
+
+
+class SessionError(Exception):
+    pass
+
+
+class StreamlitSession:
+    """Uma sessão de navegador simulada sobre o websocket ``/_stcore/stream``."""
+
+    def __init__(self, base_url, fetch_media=True):
+        self.base_url = base_url.rstrip('/')
+        self.fetch_media = fetch_media
+        self.connection = None
+        self.pages = {}
+        self.page_script_hash = ''
+        self.widgets = {}
+        self.media_urls = []
+        self.media_bytes = 0
+        self.http = tornado.httpclient.AsyncHTTPClient()
+
+    async def connect(self):
+        ws_url = self.base_url.replace('http', 'ws', 1) + '/_stcore/stream'
+        self.connection = await tornado.websocket.websocket_connect(ws_url, max_message_size=200 * 1024 * 1024)
+        await self.rerun()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    async def rerun(self, widget_states=()):
+        """Envia um pedido de reexecução e aguarda o fim do script; devolve a latência em segundos."""
+        back_msg = BackMsg()
+        client_state = back_msg.rerun_script
+        client_state.page_script_hash = self.page_script_hash
+        for widget_state in widget_states:
+            client_state.widget_states.widgets.append(widget_state)
+
+        self.widgets = {}
+        self.media_urls = []
+        start = time.perf_counter()
+        await self.connection.write_message(back_msg.SerializeToString(), binary=True)
+        while True:
+            raw = await self.connection.read_message()
+            if raw is None:
+                raise SessionError("Conexão encerrada pelo servidor.")
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            self._handle(msg)
+            if msg.WhichOneof('type') == 'script_finished':
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+        if self.fetch_media:
+            # URLs relativas (cache estático) são resolvidas a partir do endereço do aplicativo
+            responses = await asyncio.gather(*(self.http.fetch(urljoin(self.base_url + '/', url))
+                                               for url in self.media_urls))
+            self.media_bytes += sum(len(response.body) for response in responses)
+        return time.perf_counter() - start
+
+    def _handle(self, msg):
+        msg_type = msg.WhichOneof('type')
+        if msg_type == 'new_session':
+            self.pages = {page.page_name: page.page_script_hash for page in msg.new_session.app_pages}
+            self.page_script_hash = msg.new_session.page_script_hash
+        elif msg_type == 'navigation':
+            # Nas versões recentes a lista de páginas chega na mensagem de navegação
+            self.pages = {page.page_name: page.page_script_hash for page in msg.navigation.app_pages}
+            self.page_script_hash = msg.navigation.page_script_hash
+        elif msg_type == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            element = msg.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type in ('radio', 'multiselect'):
+                widget = getattr(element, element_type)
+                self.widgets[widget.label] = (element_type, widget)
+            elif element_type == 'imgs':
+                self.media_urls.extend(img.url for img in element.imgs.imgs if img.url.startswith('/'))
+            elif element_type == 'markdown':
+                self.media_urls.extend(MARKDOWN_IMAGE.findall(element.markdown.body))
+            elif element_type == 'exception':
+                raise SessionError(element.exception.message)
+
+    async def open_page(self, page_name):
+        if page_name not in self.pages:
+            raise SessionError(f"Página '{page_name}' não encontrada.")
+        self.page_script_hash = self.pages[page_name]
+        return await self.rerun()
+
+    async def set_widget(self, label, value):
+        if label not in self.widgets:
+            raise SessionError(f"Widget '{label}' não encontrado na página.")
+        widget_type, widget = self.widgets[label]
+        state = WidgetState(id=widget.id)
+        if widget_type == 'radio':
+            state.int_value = value
+        else:
+            state.string_array_value.data.extend(value)
+        return await self.rerun([state])
+
+
+def _read_rss_bytes(pid):
+    # Somente Linux: lê VmRSS de /proc (sem dependências extras)
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+async def _session_worker(session_id, args, deadline, latencies, errors, media_bytes):
+    rng = random.Random(args.seed + session_id)
+    session = StreamlitSession(args.url, fetch_media=not args.no_media)
+    try:
+        await session.connect()
+        while time.monotonic() < deadline:
+            page_name, label, values = rng.choice(SCENARIOS)
+            latencies.append(('navegação', await session.open_page(page_name)))
+            for value in values:
+                if time.monotonic() >= deadline:
+                    break
+                latencies.append((page_name, await session.set_widget(label, value)))
+            if args.think_time:
+                await asyncio.sleep(rng.uniform(0, args.think_time))
+    except (OSError, tornado.websocket.WebSocketError, SessionError) as e:
+        errors.append(f"sessão {session_id}: {e}")
+    finally:
+        media_bytes.append(session.media_bytes)
+        session.close()
+
+
+async def _sample_rss(pid, rss_samples, start, stop_event):
+    while not stop_event.is_set():
+        rss = _read_rss_bytes(pid) if pid else None
+        if rss is not None:
+            rss_samples.append((time.monotonic() - start, rss))
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load_test(args, server_pid=None):
+    latencies, errors, rss_samples, media_bytes = [], [], [], []
+    start = time.monotonic()
+    deadline = start + args.duration
+    stop_event = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(server_pid, rss_samples, start, stop_event))
+
+    async def delayed_worker(session_id):
+        # Entrada gradual das sessões para não medir apenas o pico de conexão
+        await asyncio.sleep(session_id * args.ramp_up / max(args.sessions, 1))
+        await _session_worker(session_id, args, deadline, latencies, errors, media_bytes)
+
+    await asyncio.gather(*(delayed_worker(i) for i in range(args.sessions)))
+    elapsed = time.monotonic() - start
+    stop_event.set()
+    await sampler
+    return summarize(latencies, errors, rss_samples, elapsed, sum(media_bytes))
+
+
+def summarize(latencies, errors, rss_samples, elapsed, media_bytes=0):
+    values = np.array([latency for _, latency in latencies]) * 1000
+    report = {
+        'reexecucoes': int(values.size),
+        'erros': len(errors),
+        'duracao_s': round(elapsed, 1),
+        'vazao_reexecucoes_s': round(values.size / elapsed, 2) if elapsed else 0.0,
+        'latencia_ms': {},
+        'latencia_ms_por_pagina': {},
+        'midia_mb': round(media_bytes / 2 ** 20, 1),
+        'rss_mb': [(round(t, 1), round(rss / 2 ** 20, 1)) for t, rss in rss_samples],
+        'exemplos_de_erros': errors[:5],
+    }
+    if values.size:
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        report['latencia_ms'] = {'p50': round(p50, 1), 'p95': round(p95, 1), 'p99': round(p99, 1),
+                                 'max': round(values.max(), 1)}
+        for page in sorted({page for page, _ in latencies}):
+            page_values = np.array([latency for p, latency in latencies if p == page]) * 1000
+            p50, p95, p99 = np.percentile(page_values, [50, 95, 99])
+            report['latencia_ms_por_pagina'][page] = {'n': int(page_values.size), 'p50': round(p50, 1),
+                                                      'p95': round(p95, 1), 'p99': round(p99, 1)}
+    return report
+
+
+def print_report(report):
+    print(f"Reexecuções: {report['reexecucoes']} em {report['duracao_s']} s "
+          f"({report['vazao_reexecucoes_s']} reexecuções/s), erros: {report['erros']}")
+    print(f"Imagens dos gráficos baixadas: {report['midia_mb']} MB")
+    if report['latencia_ms']:
+        lat = report['latencia_ms']
+        print(f"Latência (ms): p50={lat['p50']}  p95={lat['p95']}  p99={lat['p99']}  máx={lat['max']}")
+        for page, lat in report['latencia_ms_por_pagina'].items():
+            print(f"  {page:<45} n={lat['n']:<5} p50={lat['p50']:<8} p95={lat['p95']:<8} p99={lat['p99']}")
+    if report['rss_mb']:
+        rss = [value for _, value in report['rss_mb']]
+        print(f"RSS do servidor (MB): inicial={rss[0]}  máx={max(rss)}  final={rss[-1]}")
+    for error in report['exemplos_de_erros']:
+        print(f"  erro: {error}")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port):
+    """Inicia ``streamlit run`` localmente e aguarda o endpoint de saúde responder."""
+    command = [sys.executable, '-m', 'streamlit', 'run', MAIN_SCRIPT,
+               '--server.headless', 'true', '--server.port', str(port),
+               '--browser.gatherUsageStats', 'false']
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health_url = f'http://127.0.0.1:{port}/_stcore/health'
+    client = tornado.httpclient.HTTPClient()
+    try:
+        for _ in range(120):
+            if process.poll() is not None:
+                raise RuntimeError("O servidor Streamlit terminou durante a inicialização.")
+            try:
+                client.fetch(health_url, request_timeout=1)
+                return process
+            except (OSError, tornado.httpclient.HTTPClientError):
+                time.sleep(0.5)
+    finally:
+        client.close()
+    process.terminate()
+    raise RuntimeError("O servidor Streamlit não respondeu a tempo.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga com sessões Streamlit concorrentes.")
+    parser.add_argument('--url', help="URL de um servidor já em execução (padrão: inicia um servidor local).")
+    parser.add_argument('--sessions', type=int, default=10, help="Número de sessões concorrentes.")
+    parser.add_argument('--duration', type=float, default=30, help="Duração do teste em segundos.")
+    parser.add_argument('--ramp-up', type=float, default=5, help="Tempo (s) para abrir todas as sessões.")
+    parser.add_argument('--think-time', type=float, default=0, help="Pausa máxima (s) entre roteiros.")
+    parser.add_argument('--no-media', action='store_true', help="Não baixar as imagens dos gráficos.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Arquivo para salvar o relatório em JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    if args.url is None:
+        port = _free_port()
+        server = start_server(port)
+        args.url = f'http://127.0.0.1:{port}'
+    try:
+        report = asyncio.run(run_load_test(args, server_pid=server.pid if server else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    return 1 if report['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# Módulos compartilhados entre as páginas do aplicativo (carga de dados, filtros, etc.).
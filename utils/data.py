@@ -0,0 +1,194 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.startup import prewarm_in_background
+from utils.stats import CENTIPOINT_COLUMNS, encode_centipoints, stratified_sample_keys
+
+# Copy-on-write: a tabela validada é compartilhada por todas as sessões (ver load_validated_data), e
+# qualquer alteração feita por uma página sobre a sua visão gera uma cópia apenas da coluna alterada
+pd.set_option('mode.copy_on_write', True)
+
+# Todas as páginas importam este módulo: o pré-aquecimento (Matplotlib com o backend Agg e o cache de
+# fontes) começa no primeiro acesso ao processo, qualquer que seja a página aberta
+prewarm_in_background()
+
+DATA_FILE_PATH = 'data/raw_data/df_es_filtrado.csv'
+
+# Colunas usadas pelas páginas
+REQUIRED_COLUMNS = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01', 'PROFICIENCIA_LP_SAEB', 'PROFICIENCIA_MT_SAEB']
+
+# Pesos amostrais dos estudantes nos microdados do SAEB, por proficiência. A proficiência total
+# (LP + MT) só existe para quem fez as duas provas e usa o peso de LP. Arquivos sem essas
+# colunas recebem pesos unitários na ingestão (as estimativas ponderadas coincidem com as simples).
+WEIGHT_COLUMNS = {
+    'PROFICIENCIA_LP_SAEB': 'PESO_ALUNO_LP',
+    'PROFICIENCIA_MT_SAEB': 'PESO_ALUNO_MT',
+    'PROFICIENCIA_TOTAL': 'PESO_ALUNO_LP',
+}
+
+# Amostra estratificada (proporcional por INSE e gênero, semente fixa) das prévias dos gráficos:
+# a chave de cada linha é calculada na carga e a amostra de fração f são as linhas com chave < f
+SAMPLE_KEY_COLUMN = 'AMOSTRA_CHAVE'
+SAMPLE_STRATA = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01']
+SAMPLE_SEED = 2023
+
+# Regras de domínio aplicadas na ingestão
+PROFICIENCY_BOUNDS = (0.0, 500.0)  # Escala SAEB
+INSE_LEVELS = list(range(1, 9))
+GENDER_DOMAIN = ['Masculino', 'Feminino']
+
+# Rótulos de exibição, materializados como colunas na carga (TX_RESP_Q01_LABEL e NU_TIPO_NIVEL_INSE_LABEL)
+GENDER_LABELS = {'Masculino': 'Masculino', 'Feminino': 'Feminino'}
+INSE_DISPLAY_LABELS = {
+    1: 'Nível I', 2: 'Nível II', 3: 'Nível III', 4: 'Nível IV',
+    5: 'Nível V', 6: 'Nível VI', 7: 'Nível VII', 8: 'Nível VIII'
+}
+
+# Itens do questionário do estudante (TX_RESP_Q01, TX_RESP_Q02, ...), mantidos também como códigos inteiros
+QUESTION_PATTERN = re.compile(r'TX_RESP_Q\d+')
+QUESTION_CODE_SUFFIX = '_COD'
+# Marcações do SAEB que não são respostas: '.' (em branco) e '*' (dupla marcação)
+NON_ANSWERS = ('.', '*')
+MISSING_ANSWER_CODE = -1
+
+
+class DataValidationError(ValueError):
+    pass
+
+
+def validate_data(df):
+    """Valida e limpa os dados de uma só vez, com verificações vetorizadas.
+
+    Devolve a tabela limpa (apenas linhas que passam em todas as regras, com as colunas
+    de proficiência e INSE já numéricas) e um relatório com a contagem de linhas rejeitadas
+    por regra. Uma mesma linha pode violar mais de uma regra.
+    """
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise DataValidationError(
+            f"As seguintes colunas necessárias não foram encontradas no arquivo CSV: {', '.join(missing_columns)}. "
+            "Verifique o dicionário de dados e o arquivo."
+        )
+
+    lp = pd.to_numeric(df['PROFICIENCIA_LP_SAEB'], errors='coerce')
+    mt = pd.to_numeric(df['PROFICIENCIA_MT_SAEB'], errors='coerce')
+    inse = pd.to_numeric(df['NU_TIPO_NIVEL_INSE'], errors='coerce')
+    low, high = PROFICIENCY_BOUNDS
+
+    # Regra -> (descrição, máscara das linhas que a violam)
+    rules = {
+        'lp_ausente': ("Proficiência em LP ausente ou não numérica", lp.isna()),
+        'lp_fora_da_escala': (f"Proficiência em LP fora da escala ({low:g} a {high:g})", lp.notna() & ~lp.between(low, high)),
+        'mt_ausente': ("Proficiência em MT ausente ou não numérica", mt.isna()),
+        'mt_fora_da_escala': (f"Proficiência em MT fora da escala ({low:g} a {high:g})", mt.notna() & ~mt.between(low, high)),
+        'inse_invalido': ("Nível INSE ausente ou fora de 1 a 8", ~inse.isin(INSE_LEVELS)),
+        'genero_invalido': ("Gênero diferente de Masculino/Feminino", ~df['TX_RESP_Q01'].isin(GENDER_DOMAIN)),
+    }
+    # Pesos amostrais: mantidos quando presentes no arquivo, e então obrigatoriamente válidos
+    weights = {}
+    for col in dict.fromkeys(WEIGHT_COLUMNS.values()):
+        if col in df.columns:
+            weights[col] = pd.to_numeric(df[col], errors='coerce')
+            rules[f'{col.lower()}_invalido'] = (f"{col} ausente ou negativo", ~(weights[col] >= 0))
+        else:
+            weights[col] = pd.Series(1.0, index=df.index)
+    rejected = np.logical_or.reduce([mask.to_numpy() for _, mask in rules.values()])
+
+    report = pd.DataFrame(
+        [(name, description, int(mask.sum())) for name, (description, mask) in rules.items()],
+        columns=['Regra', 'Descrição', 'Linhas rejeitadas']
+    )
+    report.loc[len(report)] = ['total', "Linhas rejeitadas (qualquer regra)", int(rejected.sum())]
+    report.loc[len(report)] = ['aceitas', "Linhas aceitas", int((~rejected).sum())]
+
+    clean = df.assign(
+        PROFICIENCIA_LP_SAEB=lp,
+        PROFICIENCIA_MT_SAEB=mt,
+        NU_TIPO_NIVEL_INSE=inse,
+        **weights,
+    ).loc[~rejected].reset_index(drop=True)
+    clean['NU_TIPO_NIVEL_INSE'] = clean['NU_TIPO_NIVEL_INSE'].astype(np.int64)
+    # Colunas derivadas, calculadas uma única vez: as páginas nunca alteram a tabela compartilhada
+    clean['PROFICIENCIA_TOTAL'] = clean['PROFICIENCIA_LP_SAEB'] + clean['PROFICIENCIA_MT_SAEB']
+    clean['TX_RESP_Q01_LABEL'] = clean['TX_RESP_Q01'].map(GENDER_LABELS)
+    clean['NU_TIPO_NIVEL_INSE_LABEL'] = clean['NU_TIPO_NIVEL_INSE'].map(INSE_DISPLAY_LABELS)
+    # Proficiências também em ponto fixo (centésimos de ponto) para contagens exatas de moda e quantis
+    for col, centi_col in CENTIPOINT_COLUMNS.items():
+        clean[centi_col] = encode_centipoints(clean[col])
+    clean[SAMPLE_KEY_COLUMN] = stratified_sample_keys(clean.groupby(SAMPLE_STRATA).ngroup().to_numpy(), SAMPLE_SEED)
+    # Respostas do questionário como códigos inteiros, para tabelas cruzadas por contagem (utils/questionnaire.py)
+    for col in question_columns(clean):
+        clean[col + QUESTION_CODE_SUFFIX] = encode_answers(clean[col], answer_categories(clean[col]))
+    return clean, report
+
+
+def question_columns(df):
+    return sorted((col for col in df.columns if QUESTION_PATTERN.fullmatch(col)), key=lambda col: int(col[9:]))
+
+
+def answer_categories(answers):
+    """Alternativas válidas de um item, em ordem: o código de cada uma é a sua posição na lista."""
+    values = answers.dropna().astype(str)
+    return sorted(set(values.unique()) - set(NON_ANSWERS))
+
+
+def encode_answers(answers, categories):
+    """Códigos inteiros compactos (int8/int16) das respostas; ausências e marcações inválidas viram -1."""
+    codes = pd.Categorical(answers.astype('string'), categories=categories).codes
+    dtype = np.int8 if len(categories) < np.iinfo(np.int8).max else np.int16
+    return codes.astype(dtype)
+
+
+@st.cache_resource(show_spinner="Carregando os dados...")
+def load_validated_data(file_path=DATA_FILE_PATH):
+    # A validação roda uma única vez por arquivo e o resultado é um único objeto em memória,
+    # compartilhado (sem cópias por sessão): quem o recebe não deve alterá-lo, apenas filtrá-lo
+    return validate_data(pd.read_csv(file_path, sep=","))
+
+
+def load_data_or_stop(file_path=DATA_FILE_PATH):
+    """Carrega a tabela validada, exibindo o erro e interrompendo a página em caso de falha.
+
+    Devolve uma visão copy-on-write da tabela compartilhada: criar ou alterar colunas nela
+    não afeta as outras sessões, e nada é copiado enquanto a página apenas lê e filtra.
+    """
+    try:
+        df, _ = load_validated_data(file_path)
+    except FileNotFoundError:
+        st.error(f"Erro: O arquivo '{file_path}' não foi encontrado. Verifique o caminho.")
+        st.stop()
+    except DataValidationError as e:
+        st.error(f"Erro: {e}")
+        st.stop()
+    except Exception as e:
+        st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
+        st.stop()
+    return df.copy(deep=False)
+
+
+def dataset_version(file_path=DATA_FILE_PATH):
+    """Identificador da versão do arquivo de dados (muda quando o arquivo é alterado)."""
+    stat = os.stat(file_path)
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+@st.cache_data(show_spinner=False)
+def sampling_weights_available(file_path=DATA_FILE_PATH):
+    """Se o arquivo traz as colunas de pesos amostrais (caso contrário, a ingestão usa pesos unitários)."""
+    header = pd.read_csv(file_path, sep=",", nrows=0).columns
+    return all(col in header for col in WEIGHT_COLUMNS.values())
+
+
+def stratified_sample(df, max_rows):
+    """Amostra estratificada de até cerca de ``max_rows`` linhas de ``df`` (uma visão da tabela validada)."""
+    if len(df) <= max_rows:
+        return df
+    return df[df[SAMPLE_KEY_COLUMN].to_numpy() < max_rows / len(df)]
+
+
+def load_validation_report(file_path=DATA_FILE_PATH):
+    return load_validated_data(file_path)[1]
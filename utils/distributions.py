@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import WEIGHT_COLUMNS, load_validated_data
+from utils.filters import filter_by_criteria
+from utils.stats import weighted_box_stats
+from utils.store import stored
+
+# Resumos das distribuições por nível de INSE desenhados nos box plots, violinos e histogramas: o
+# Matplotlib recebe apenas os resumos (Axes.bxp, Axes.violin e contagens por faixa), não as notas dos
+# estudantes. São listas e dicionários simples, gravados em JSON no banco de agregados.
+INSE_COLUMN = 'NU_TIPO_NIVEL_INSE'
+HISTOGRAM_BINS = 20
+VIOLIN_POINTS = 100
+
+
+def _plain(value):
+    # Tipos do NumPy para tipos nativos do Python (serializáveis em JSON)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _level_groups(df, column):
+    # Níveis de INSE presentes nos dados, em ordem crescente, e as notas de cada um
+    groups = [(level, values.to_numpy(dtype=np.float64)) for level, values in df.groupby(INSE_COLUMN)[column]]
+    return [level for level, _ in groups], [values for _, values in groups]
+
+
+def box_stats(df, column, weight_column=None):
+    """Estatísticas de box plot de ``column`` por nível de INSE, no formato de ``Axes.bxp``.
+
+    Sem ``weight_column``, são as mesmas de ``Axes.boxplot`` (``matplotlib.cbook.boxplot_stats``); com
+    ela, os quartis são ponderados (``weighted_box_stats``). O rótulo de cada caixa é o nível.
+    """
+    if weight_column is not None:
+        boxes = weighted_box_stats(df, [INSE_COLUMN], column, weight_column)
+    else:
+        from matplotlib import cbook
+        levels, groups = _level_groups(df, column)
+        boxes = cbook.boxplot_stats(groups, labels=levels) if groups else []
+    return [{key: _plain(value) for key, value in box.items()} for box in boxes]
+
+
+def violin_stats(df, column, points=VIOLIN_POINTS):
+    """Estatísticas de violino de ``column`` por nível de INSE, no formato de ``Axes.violin``.
+
+    As mesmas de ``Axes.violinplot``: densidade por kernel gaussiano (largura pela regra de Scott)
+    avaliada em ``points`` pontos entre a menor e a maior nota do nível.
+    """
+    from matplotlib import cbook, mlab
+
+    def kde(values, coords):
+        # Um único valor repetido não tem densidade estimável (como no Axes.violinplot)
+        if np.all(values[0] == values):
+            return (values[0] == coords).astype(float)
+        return mlab.GaussianKDE(values).evaluate(coords)
+
+    levels, groups = _level_groups(df, column)
+    violins = cbook.violin_stats(groups, kde, points=points) if groups else []
+    return [{'label': _plain(level), **{key: _plain(value) for key, value in violin.items()}}
+            for level, violin in zip(levels, violins)]
+
+
+def histogram_counts(df, columns, bins=HISTOGRAM_BINS):
+    """Contagens dos histogramas empilhados de cada coluna de ``columns`` por nível de INSE.
+
+    Como ``Axes.hist`` com ``bins`` faixas: as bordas cobrem as notas de todos os níveis, e cada nível
+    tem as suas contagens por faixa. ``limites`` são a menor e a maior nota entre todas as colunas.
+    """
+    codes, levels = pd.factorize(df[INSE_COLUMN], sort=True)
+    summary = {'niveis': [_plain(level) for level in levels], 'colunas': {}}
+    if df.empty:
+        summary['limites'] = [0.0, 0.0]
+        return summary
+    summary['limites'] = [_plain(df[list(columns)].min().min()), _plain(df[list(columns)].max().max())]
+    for column in columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        edges = np.histogram_bin_edges(values, bins)
+        # Faixa de cada nota pelas bordas (a última faixa inclui a borda direita, como no NumPy)
+        bin_index = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+        counts = np.bincount(codes * bins + bin_index, minlength=len(levels) * bins).reshape(len(levels), bins)
+        summary['colunas'][column] = {'bordas': edges.tolist(), 'contagens': counts.tolist()}
+    return summary
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+@stored('caixas_inse')
+def box_summary(file_path, version, criteria, column, weighted=False):
+    """Box plots de ``column`` por INSE com os filtros ``criteria`` (ponderados se ``weighted``)."""
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    return box_stats(df, column, WEIGHT_COLUMNS[column] if weighted else None)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+@stored('violinos_inse')
+def violin_summary(file_path, version, criteria, column):
+    """Violinos de ``column`` por INSE com os filtros ``criteria``."""
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    return violin_stats(df, column)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+@stored('histogramas_inse')
+def histogram_summary(file_path, version, criteria, columns, levels):
+    """Histogramas de ``columns`` por INSE com os filtros ``criteria``, só dos níveis ``levels``."""
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    return histogram_counts(df[df[INSE_COLUMN].isin(levels)], columns)
@@ -0,0 +1,98 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import DATA_FILE_PATH, dataset_version, load_validated_data
+from utils.filters import filter_by_criteria
+from utils.static_cache import cache_key
+from utils.store import stored
+
+# Edições do SAEB guardadas como partições por ano, com o mesmo esquema do arquivo principal:
+#     data/raw_data/edicoes/ano=2019/df_es_filtrado.csv
+#     data/raw_data/edicoes/ano=2021/df_es_filtrado.csv
+# O arquivo principal (DATA_FILE_PATH) é a edição de 2023, a menos que exista uma partição ano=2023.
+EDITIONS_DIR = 'data/raw_data/edicoes'
+DEFAULT_EDITION = 2023
+_PARTITION_PATTERN = re.compile(r'ano=(\d{4})')
+
+# Chaves dos agregados por edição: todas as comparações entre anos são feitas a partir deles
+AGGREGATE_KEYS = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01']
+SUBJECT_COLUMNS = {'lp': 'PROFICIENCIA_LP_SAEB', 'mt': 'PROFICIENCIA_MT_SAEB'}
+
+
+def edition_files():
+    """Arquivo de dados de cada edição disponível, em ordem de ano."""
+    files = {DEFAULT_EDITION: DATA_FILE_PATH}
+    if os.path.isdir(EDITIONS_DIR):
+        for entry in os.listdir(EDITIONS_DIR):
+            match = _PARTITION_PATTERN.fullmatch(entry)
+            if not match:
+                continue
+            partition_file = os.path.join(EDITIONS_DIR, entry, os.path.basename(DATA_FILE_PATH))
+            if os.path.isfile(partition_file):
+                files[int(match.group(1))] = partition_file
+    return dict(sorted(files.items()))
+
+
+def editions_version():
+    """Versão combinada dos arquivos de todas as edições (data de modificação e tamanho de cada partição).
+
+    Muda quando uma edição é adicionada, removida ou alterada; identifica os gráficos e tabelas da
+    comparação entre edições no cache estático.
+    """
+    return cache_key({str(year): dataset_version(file_path) for year, file_path in edition_files().items()})
+
+
+@st.cache_data(max_entries=64, show_spinner="Calculando os agregados da edição...")
+@stored('agregados_edicao')
+def edition_aggregates(file_path, version, criteria):
+    """Estatísticas suficientes (n, soma e soma dos quadrados) por INSE e gênero de uma edição.
+
+    ``version`` identifica o arquivo (muda quando ele é alterado) e faz parte da chave do cache,
+    assim como ``criteria`` (filtros globais). As linhas dos estudantes só são lidas aqui.
+    """
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    values = {}
+    for subject, col in SUBJECT_COLUMNS.items():
+        values[f'soma_{subject}'] = df[col]
+        values[f'soma2_{subject}'] = df[col] ** 2
+    aggregates = pd.DataFrame(values).groupby([df[key] for key in AGGREGATE_KEYS]).sum()
+    aggregates.insert(0, 'n', df.groupby(AGGREGATE_KEYS).size())
+    return aggregates.reset_index()
+
+
+def all_edition_aggregates(criteria):
+    """Agregados de todas as edições, com a coluna ``ANO``; cada edição vem do seu próprio cache."""
+    frames = [
+        edition_aggregates(file_path, dataset_version(file_path), criteria).assign(ANO=year)
+        for year, file_path in edition_files().items()
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(aggregates, by, subject):
+    """Média, desvio padrão e n da proficiência ``subject`` por ``by`` (+ ANO), somando os agregados."""
+    sums = aggregates.groupby(['ANO'] + by)[['n', f'soma_{subject}', f'soma2_{subject}']].sum()
+    n = sums['n']
+    mean = sums[f'soma_{subject}'] / n
+    variance = (sums[f'soma2_{subject}'] - n * mean ** 2) / (n - 1)
+    return pd.DataFrame({'n': n, 'media': mean, 'desvio': np.sqrt(variance.clip(lower=0))})
+
+
+def edition_deltas(aggregates, by, subject, base_year, compare_year):
+    """Variação da média entre duas edições por ``by``, com o erro padrão da diferença."""
+    summary = summarize(aggregates, by, subject)
+    base = summary.xs(base_year, level='ANO')
+    compare = summary.xs(compare_year, level='ANO')
+    base, compare = base.align(compare, join='outer')
+    return pd.DataFrame({
+        f'Média {base_year}': base['media'],
+        f'Média {compare_year}': compare['media'],
+        'Variação': compare['media'] - base['media'],
+        'Erro padrão': np.sqrt(base['desvio'] ** 2 / base['n'] + compare['desvio'] ** 2 / compare['n']),
+        f'n {base_year}': base['n'],
+        f'n {compare_year}': compare['n'],
+    })
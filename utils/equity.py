@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.rollup import DEPTH_COLUMN, SUBJECT_COLUMNS, hierarchy_levels, rollup_aggregates
+
+INSE_VARIABLE = 'NU_TIPO_NIVEL_INSE'
+
+# Faixas de INSE comparadas na diferença entre alto e baixo nível socioeconômico
+LOW_INSE_LEVELS = [1, 2, 3]
+HIGH_INSE_LEVELS = [6, 7, 8]
+# Mínimo de estudantes em cada faixa para calcular a diferença de um município
+MIN_GAP_GROUP = 10
+
+
+def _inse_blocks(aggregates, unit_column, depth):
+    # Agregados por (unidade, INSE), somando os gêneros, ordenados pela unidade e pelo INSE
+    rows = aggregates[aggregates[DEPTH_COLUMN] == depth]
+    columns = ['n'] + [f'{prefix}_{subject}' for subject in SUBJECT_COLUMNS for prefix in ('soma', 'soma2')]
+    return rows.groupby([unit_column, INSE_VARIABLE], sort=True)[columns].sum()
+
+
+def _unit_indicators(blocks, subject):
+    # Indicadores de todas as unidades de uma vez: somas acumuladas dentro de cada unidade sobre os
+    # blocos ordenados por INSE, sem laço por unidade
+    units = blocks.index.get_level_values(0)
+    n = blocks['n'].to_numpy(dtype=np.float64)
+    sums = blocks[f'soma_{subject}'].to_numpy()
+    squares = blocks[f'soma2_{subject}'].to_numpy()
+    inse = blocks.index.get_level_values(1).to_numpy()
+
+    by_unit = pd.Series(n, index=units).groupby(level=0, sort=False)
+    cumulative = by_unit.cumsum().to_numpy()
+    unit_n = by_unit.transform('sum').to_numpy()
+
+    # Posição relativa (fractional rank) de cada bloco de INSE: estudantes empatados no mesmo nível
+    # recebem a posição média do bloco
+    rank = (2 * cumulative - n) / (2 * unit_n)
+    within = squares - np.divide(sums ** 2, n, out=np.zeros_like(sums), where=n > 0)
+    low = np.isin(inse, LOW_INSE_LEVELS)
+    high = np.isin(inse, HIGH_INSE_LEVELS)
+
+    terms = pd.DataFrame({
+        'n': n, 'soma': sums, 'soma2': squares, 'rank_soma': rank * sums, 'dentro': within,
+        'n_baixo': np.where(low, n, 0), 'soma_baixo': np.where(low, sums, 0),
+        'n_alto': np.where(high, n, 0), 'soma_alto': np.where(high, sums, 0),
+    }, index=units).groupby(level=0, sort=False).sum()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = terms['soma2'] - terms['soma'] ** 2 / terms['n']
+        low_mean = terms['soma_baixo'] / terms['n_baixo']
+        high_mean = terms['soma_alto'] / terms['n_alto']
+        enough = (terms['n_baixo'] >= MIN_GAP_GROUP) & (terms['n_alto'] >= MIN_GAP_GROUP)
+        return pd.DataFrame({
+            'n': terms['n'].astype(np.int64),
+            'media': terms['soma'] / terms['n'],
+            # Índice de concentração: 2 cov(y, R) / média = 2 Σ R·y / Σ y − 1
+            'concentracao': 2 * terms['rank_soma'] / terms['soma'] - 1,
+            # Parcela da variância explicada pelas diferenças entre os níveis de INSE
+            'entre_inse': (total - terms['dentro']) / total,
+            'media_baixo': low_mean,
+            'media_alto': high_mean,
+            'diferenca': (high_mean - low_mean).where(enough),
+        })
+
+
+@st.cache_data(max_entries=16, show_spinner="Calculando os indicadores de equidade...")
+def equity_indicators(file_path, version, criteria):
+    """Indicadores de equidade do estado e de cada município, por proficiência.
+
+    Parte dos agregados da hierarquia (utils/rollup.py): como o INSE é discreto, os agregados por
+    unidade e nível de INSE bastam para o índice de concentração, a decomposição da variância e as
+    diferenças entre faixas de INSE, e as linhas dos estudantes não são lidas de novo.
+    Devolve ``{(nível, proficiência): tabela por unidade}``, com nível ``'ID_UF'`` ou ``'ID_MUNICIPIO'``.
+    """
+    aggregates = rollup_aggregates(file_path, version, criteria)
+    levels = hierarchy_levels(aggregates.columns)
+    indicators = {}
+    if aggregates.empty:
+        return indicators
+    for unit_column in [col for col in ('ID_UF', 'ID_MUNICIPIO') if col in levels]:
+        blocks = _inse_blocks(aggregates, unit_column, levels.index(unit_column) + 1)
+        for subject in SUBJECT_COLUMNS:
+            indicators[(unit_column, subject)] = _unit_indicators(blocks, subject)
+    return indicators
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def concentration_curve(file_path, version, criteria, unit_column, unit, subject):
+    """Curva de concentração da unidade: parcelas acumuladas de estudantes e de pontos, em ordem de INSE."""
+    aggregates = rollup_aggregates(file_path, version, criteria)
+    levels = hierarchy_levels(aggregates.columns)
+    blocks = _inse_blocks(aggregates, unit_column, levels.index(unit_column) + 1).xs(unit, level=0)
+    population = blocks['n'].cumsum() / blocks['n'].sum()
+    scores = blocks[f'soma_{subject}'].cumsum() / blocks[f'soma_{subject}'].sum()
+    # A curva começa na origem
+    curve = pd.DataFrame({'estudantes': population, 'pontos': scores})
+    return pd.concat([pd.DataFrame({'estudantes': [0.0], 'pontos': [0.0]}, index=pd.Index([0], name=INSE_VARIABLE)), curve])
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import INSE_DISPLAY_LABELS, load_validated_data, sampling_weights_available
+from utils.state import persistent_widget_key, query_bound_widget, save_widget_state
+
+# Colunas categóricas que recebem índices de bitmap
+BITMAP_COLUMNS = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01', 'ID_MUNICIPIO', 'IN_PRESENCA_LP', 'IN_PRESENCA_MT']
+
+# Tabela de contagem de bits por byte (popcount) para contar linhas sem desempacotar
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class BitmapIndex:
+    """Índice de bitmaps empacotados (um bit por linha) para cada valor das colunas categóricas.
+
+    Qualquer combinação de filtros vira uma sequência de ORs (valores de uma mesma coluna)
+    e ANDs (entre colunas) sobre arrays de bytes, sem reavaliar máscaras no DataFrame.
+    """
+
+    def __init__(self, df, columns=BITMAP_COLUMNS):
+        self.n_rows = len(df)
+        # Bitmap com todos os bits das linhas existentes ligados (os bits de preenchimento ficam zerados)
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            self.bitmaps[col] = self._build_bitmaps(codes, uniques.tolist())
+
+    def _build_bitmaps(self, codes, values):
+        # Todos os bitmaps da coluna numa única passagem vetorizada: cada linha liga um bit (o mais
+        # significativo primeiro, como no np.packbits) no byte (código, linha // 8) da matriz de bitmaps.
+        # Os bits de um mesmo byte vêm de linhas diferentes, então somá-los (bincount) equivale ao OR.
+        # As linhas sem valor (código -1) ficam de fora.
+        n_bytes = len(self.all_rows)
+        rows = np.flatnonzero(codes >= 0)
+        bits = np.bincount(codes[rows] * n_bytes + (rows >> 3), weights=0x80 >> (rows & 7),
+                           minlength=len(values) * n_bytes)
+        matrix = bits.astype(np.uint8).reshape(len(values), n_bytes)
+        return dict(zip(values, matrix))
+
+    def values(self, column):
+        return list(self.bitmaps.get(column, {}).keys())
+
+    def select(self, column, values):
+        # Seleção vazia (ou coluna sem índice) não restringe as linhas
+        if not values or column not in self.bitmaps:
+            return self.all_rows
+        result = np.zeros_like(self.all_rows)
+        for value in values:
+            bitmap = self.bitmaps[column].get(value)
+            if bitmap is not None:
+                np.bitwise_or(result, bitmap, out=result)
+        return result
+
+    def query(self, criteria):
+        """Combina (AND) as seleções de cada coluna em ``criteria`` ({coluna: valores})."""
+        result = self.all_rows.copy()
+        for column, values in criteria.items():
+            np.bitwise_and(result, self.select(column, values), out=result)
+        return result
+
+    def count(self, bitmap):
+        return int(_POPCOUNT_TABLE[bitmap].sum(dtype=np.int64))
+
+    def to_mask(self, bitmap):
+        return np.unpackbits(bitmap, count=self.n_rows).astype(bool)
+
+
+@st.cache_resource(show_spinner=False)
+def get_bitmap_index(file_path):
+    # O índice é construído uma única vez por arquivo, sobre a tabela validada (mesma ordem de linhas
+    # entregue às páginas), e compartilhado entre sessões (somente leitura)
+    df, _ = load_validated_data(file_path)
+    return BitmapIndex(df)
+
+
+# Coluna -> (chave do estado de sessão onde o valor é guardado entre páginas, parâmetro da URL)
+_FILTER_KEYS = {
+    'NU_TIPO_NIVEL_INSE': ('filtro_global_inse', 'f_inse'),
+    'TX_RESP_Q01': ('filtro_global_genero', 'f_genero'),
+    'ID_MUNICIPIO': ('filtro_global_municipio', 'f_municipio'),
+    'IN_PRESENCA_LP': ('filtro_global_presenca_lp', 'f_presenca_lp'),
+    'IN_PRESENCA_MT': ('filtro_global_presenca_mt', 'f_presenca_mt'),
+}
+
+
+def _filter_widget(column, widget, label, codes, default, multiple=False, **kwargs):
+    # O valor vem (nesta ordem) do estado salvo em outra página, da URL ou do padrão,
+    # e é refletido de volta na URL
+    state_key, param = _FILTER_KEYS[column]
+    value = query_bound_widget(widget, label, param, codes, default, persistent_widget_key(state_key), multiple, **kwargs)
+    return save_widget_state(state_key, value)
+
+
+def _multiselect_filter(column, label, index, **kwargs):
+    options = index.values(column)
+    codes = {value: str(value) for value in options}
+    return _filter_widget(column, st.multiselect, label, codes, [], multiple=True, options=options, **kwargs)
+
+
+def _checkbox_filter(column, label):
+    return _filter_widget(column, st.checkbox, label, {True: '1', False: '0'}, False)
+
+
+def render_global_filters(index):
+    """Renderiza os filtros globais na barra lateral e devolve os critérios selecionados."""
+    with st.sidebar.expander("Filtros Globais", expanded=False):
+        selected_inse = _multiselect_filter(
+            'NU_TIPO_NIVEL_INSE', "Níveis Socioeconômicos (INSE):", index,
+            format_func=lambda x: INSE_DISPLAY_LABELS.get(x, f'INSE {x}')
+        )
+        selected_genders = _multiselect_filter('TX_RESP_Q01', "Gênero:", index)
+        selected_municipalities = _multiselect_filter('ID_MUNICIPIO', "Municípios (código INEP):", index)
+        only_present_lp = _checkbox_filter('IN_PRESENCA_LP', "Somente presentes na prova de LP")
+        only_present_mt = _checkbox_filter('IN_PRESENCA_MT', "Somente presentes na prova de MT")
+
+    # Lista vazia significa "sem restrição" para a coluna
+    criteria = {
+        'NU_TIPO_NIVEL_INSE': selected_inse,
+        'TX_RESP_Q01': selected_genders,
+        'ID_MUNICIPIO': selected_municipalities,
+        'IN_PRESENCA_LP': [1] if only_present_lp else [],
+        'IN_PRESENCA_MT': [1] if only_present_mt else [],
+    }
+    if any(criteria.values()):
+        selected = index.count(index.query(criteria))
+        st.sidebar.caption(f"Filtros globais: {selected} de {index.n_rows} estudantes selecionados.")
+    return criteria
+
+
+def global_filter_criteria(file_path):
+    """Renderiza os filtros globais para os dados de ``file_path`` e devolve os critérios."""
+    return render_global_filters(get_bitmap_index(file_path))
+
+
+def filter_by_criteria(df, file_path, criteria):
+    """Filtra ``df`` (a tabela validada de ``file_path``) pelos critérios, sem renderizar nada."""
+    if not any(criteria.values()):
+        return df
+    index = get_bitmap_index(file_path)
+    return df[index.to_mask(index.query(criteria))]
+
+
+def apply_global_filters(df, file_path):
+    """Aplica os filtros globais da barra lateral a ``df`` (a tabela validada de ``file_path``)."""
+    return filter_by_criteria(df, file_path, global_filter_criteria(file_path))
+
+
+def render_weight_option(file_path):
+    """Opção "Usar pesos amostrais" da barra lateral, compartilhada entre as páginas e refletida em ``?pesos=``.
+
+    Devolve se as estimativas devem ser ponderadas; sem pesos no arquivo, a opção fica desabilitada.
+    """
+    available = sampling_weights_available(file_path)
+    value = query_bound_widget(
+        st.sidebar.checkbox, "Usar pesos amostrais", 'pesos', {True: '1', False: '0'}, False,
+        persistent_widget_key('opcao_pesos_amostrais'),
+        disabled=not available,
+        help="Estimativas populacionais ponderadas pelos pesos dos estudantes (PESO_ALUNO_LP / PESO_ALUNO_MT)."
+        if available else "O arquivo de dados não traz pesos amostrais: as estimativas usam pesos unitários."
+    )
+    return save_widget_state('opcao_pesos_amostrais', value) and available
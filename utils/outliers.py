@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import load_validated_data
+from utils.filters import filter_by_criteria
+from utils.stats import robust_group_scores
+from utils.store import stored
+
+SUBJECT_COLUMNS = {'lp': 'PROFICIENCIA_LP_SAEB', 'mt': 'PROFICIENCIA_MT_SAEB'}
+
+# Estratos de comparação: cada estudante é comparado aos estudantes do mesmo estrato
+STRATA_OPTIONS = {
+    'inse_genero': ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01'],
+    'inse': ['NU_TIPO_NIVEL_INSE'],
+    'municipio': ['ID_MUNICIPIO'],
+}
+
+# Limite usual do z robusto (Iglewicz e Hoaglin) e multiplicador do IQR (o mesmo dos box plots)
+ROBUST_Z_LIMIT = 3.5
+IQR_WHIS = 1.5
+
+# Um município é sinalizado quando a mediana ou a dispersão (MAD) das notas destoa dos demais
+# municípios (z robusto entre municípios acima do limite) ou quando a parcela de notas atípicas
+# é muito maior que a do estado (com um mínimo de notas atípicas, para que uma única nota não baste)
+MUNICIPALITY_SHARE_RATIO = 3.0
+MIN_MUNICIPALITY_ATYPICAL = 3
+MIN_MUNICIPALITY_SIZE = 20
+
+
+@st.cache_data(max_entries=16, show_spinner="Calculando os valores atípicos...")
+def student_outliers(file_path, version, criteria, strata):
+    """Z robusto e sinal de IQR de cada estudante em LP e MT, dentro do estrato ``strata`` (chave de ``STRATA_OPTIONS``).
+
+    Uma passagem vetorizada por proficiência (``robust_group_scores``); as estatísticas dos estratos
+    voltam para as linhas pelos códigos dos grupos. ``version`` e ``criteria`` fazem parte da chave.
+    Devolve ``(estatísticas por estrato e proficiência, tabela por estudante)``; as linhas seguem a
+    ordem da tabela validada filtrada.
+    """
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    by = STRATA_OPTIONS[strata]
+    codes, groups = pd.MultiIndex.from_frame(df[by]).factorize()
+    group_index = groups.set_names(by) if len(by) > 1 else pd.Index(groups.get_level_values(0), name=by[0])
+
+    group_frames = {}
+    rows = df[['ID_MUNICIPIO', 'NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01'] + list(SUBJECT_COLUMNS.values())]
+    for subject, col in SUBJECT_COLUMNS.items():
+        group_stats, row_stats = robust_group_scores(codes, len(groups), df[col].to_numpy(), IQR_WHIS)
+        group_stats.index = group_index
+        group_stats['atipicos_z'] = np.bincount(
+            codes, weights=(np.abs(row_stats['z_robusto'].to_numpy()) > ROBUST_Z_LIMIT), minlength=len(groups)
+        ).astype(np.int64)
+        group_stats['atipicos_iqr'] = np.bincount(codes, weights=row_stats['fora_iqr'].to_numpy(),
+                                                  minlength=len(groups)).astype(np.int64)
+        group_frames[subject] = group_stats.sort_index()
+        rows[f'z_robusto_{subject}'] = row_stats['z_robusto'].to_numpy()
+        rows[f'fora_iqr_{subject}'] = row_stats['fora_iqr'].to_numpy()
+    return pd.concat(group_frames, names=['proficiencia']), rows
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+@stored('municipios_atipicos')
+def municipality_flags(file_path, version, criteria, strata):
+    """Sinais de anomalia por município, a partir das notas atípicas e das medianas e MADs dos municípios.
+
+    Para cada proficiência: parcela de estudantes com z robusto acima do limite (no estrato ``strata``),
+    mediana e MAD do município e o z robusto dessas duas medidas entre os municípios com pelo menos
+    ``MIN_MUNICIPALITY_SIZE`` estudantes.
+    """
+    _, rows = student_outliers(file_path, version, criteria, strata)
+    codes, municipalities = pd.factorize(rows['ID_MUNICIPIO'], sort=True)
+    n_units = len(municipalities)
+    result = pd.DataFrame({'n': np.bincount(codes, minlength=n_units)},
+                          index=pd.Index(municipalities, name='ID_MUNICIPIO'))
+    large = result['n'].to_numpy() >= MIN_MUNICIPALITY_SIZE
+    reasons = []
+    for subject, col in SUBJECT_COLUMNS.items():
+        atypical = np.abs(rows[f'z_robusto_{subject}'].to_numpy()) > ROBUST_Z_LIMIT
+        atypical_counts = np.bincount(codes, weights=atypical, minlength=n_units)
+        share = atypical_counts / result['n'].to_numpy()
+        state_share = atypical.mean()
+        # Mediana e MAD de cada município e, entre os municípios, o z robusto de cada uma delas
+        unit_stats, _ = robust_group_scores(codes, n_units, rows[col].to_numpy())
+        between = {}
+        for measure in ('mediana', 'mad'):
+            measure_values = unit_stats[measure].to_numpy()
+            _, scores = robust_group_scores(np.zeros(large.sum(), dtype=np.int64), 1, measure_values[large])
+            between[measure] = np.full(n_units, np.nan)
+            between[measure][large] = scores['z_robusto'].to_numpy()
+        result[f'mediana_{subject}'] = unit_stats['mediana'].to_numpy()
+        result[f'mad_{subject}'] = unit_stats['mad'].to_numpy()
+        result[f'atipicos_{subject}'] = share
+        result[f'z_mediana_{subject}'] = between['mediana']
+        result[f'z_mad_{subject}'] = between['mad']
+        label = subject.upper()
+        reasons += [
+            (large & (np.abs(np.nan_to_num(between['mediana'])) > ROBUST_Z_LIMIT), f'mediana de {label}'),
+            (large & (np.abs(np.nan_to_num(between['mad'])) > ROBUST_Z_LIMIT), f'dispersão de {label}'),
+            (large & (share > MUNICIPALITY_SHARE_RATIO * state_share) & (atypical_counts >= MIN_MUNICIPALITY_ATYPICAL),
+             f'notas atípicas em {label}'),
+        ]
+    result['sinalizado'] = np.logical_or.reduce([mask for mask, _ in reasons])
+    result['motivos'] = [', '.join(label for mask, label in reasons if mask[i]) for i in range(n_units)]
+    return result
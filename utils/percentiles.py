@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import load_validated_data
+from utils.filters import filter_by_criteria
+
+SUBJECT_COLUMNS = {'lp': 'PROFICIENCIA_LP_SAEB', 'mt': 'PROFICIENCIA_MT_SAEB'}
+STRATUM_COLUMNS = ('NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01')
+
+
+class PercentileIndex:
+    """Notas ordenadas por estrato (INSE, gênero e suas combinações), para consultas de percentil por busca binária.
+
+    Cada combinação de colunas de estrato (incluindo nenhuma, isto é, todos os estudantes) é ordenada
+    uma única vez; as notas de cada grupo ficam contíguas e uma consulta é um ``np.searchsorted``
+    sobre o trecho do grupo, em O(log n) por nota.
+    """
+
+    def __init__(self, df, subjects=SUBJECT_COLUMNS, strata=STRATUM_COLUMNS):
+        self.strata = strata
+        self.sorted_scores = {}
+        self.bounds = {}
+        keysets = [tuple(col for col, use in zip(strata, mask) if use)
+                   for mask in np.ndindex(*(2,) * len(strata))]
+        for keyset in keysets:
+            if keyset:
+                codes, groups = pd.MultiIndex.from_frame(df[list(keyset)]).factorize()
+                groups = [tuple(group) for group in groups]
+            else:
+                codes, groups = np.zeros(len(df), dtype=np.int64), [()]
+            ends = np.cumsum(np.bincount(codes, minlength=len(groups)))
+            starts = ends - np.bincount(codes, minlength=len(groups))
+            self.bounds[keyset] = {group: (start, end) for group, start, end in zip(groups, starts, ends)}
+            for subject, col in subjects.items():
+                values = df[col].to_numpy(dtype=np.float64)
+                # Ordena pelo grupo e, dentro dele, pela nota
+                order = np.lexsort((values, codes))
+                self.sorted_scores[(keyset, subject)] = values[order]
+
+    def stratum(self, subject, **selection):
+        """Notas ordenadas do estrato: ``selection`` mapeia coluna de estrato -> valor (None = todos)."""
+        keyset = tuple(col for col in self.strata if selection.get(col) is not None)
+        group = tuple(selection[col] for col in keyset)
+        start, end = self.bounds[keyset].get(group, (0, 0))
+        return self.sorted_scores[(keyset, subject)][start:end]
+
+    def percentile_rank(self, scores, subject, **selection):
+        """Percentil de cada nota em ``scores`` dentro do estrato (NaN se o estrato estiver vazio).
+
+        Segue a definição usual de posição percentil: a porcentagem de estudantes com nota menor,
+        somada à metade da porcentagem com nota igual.
+        """
+        stratum = self.stratum(subject, **selection)
+        scores = np.asarray(scores, dtype=np.float64)
+        if len(stratum) == 0:
+            return np.full(scores.shape, np.nan)
+        below = np.searchsorted(stratum, scores, side='left')
+        at_or_below = np.searchsorted(stratum, scores, side='right')
+        return 100.0 * (below + at_or_below) / (2 * len(stratum))
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_percentile_index(file_path, version, criteria):
+    """Índice de percentis da tabela validada de ``file_path`` com os filtros globais ``criteria``.
+
+    ``version`` (versão do arquivo) faz parte da chave: um arquivo novo gera um novo índice.
+    """
+    return PercentileIndex(filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria))
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Pipelines por página, mantidos entre reexecuções (o módulo é importado uma única vez por processo)
+_PIPELINES = {}
+_PIPELINES_LOCK = threading.Lock()
+
+
+def _freeze(value):
+    # Converte parâmetros (listas, dicionários, conjuntos) em valores imutáveis e comparáveis
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+    return value
+
+
+def _code_fingerprint(fn):
+    # Uma alteração no código do passo invalida os resultados memorizados
+    code = fn.__code__
+    return hashlib.sha1(code.co_code + repr(code.co_consts).encode()).hexdigest()[:12]
+
+
+class Step:
+    def __init__(self, name, fn, inputs, params):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+        self.params = params
+        self.fingerprint = _code_fingerprint(fn)
+
+
+class Pipeline:
+    """Grafo de passos declarativos com memorização (carregar -> limpar -> derivar -> agrupar -> ...).
+
+    Cada passo declara os passos de que depende (``inputs``) e os parâmetros da página que usa
+    (``params``). A chave de um resultado combina o código do passo, as chaves dos passos de
+    entrada e os valores dos parâmetros; assim, ao mudar um widget, só os passos que dependem
+    daquele parâmetro (direta ou indiretamente) são reexecutados. Os resultados são
+    compartilhados entre sessões e não devem ser modificados por quem os recebe.
+    """
+
+    def __init__(self, name, max_entries=32):
+        self.name = name
+        self.max_entries = max_entries
+        self._steps = {}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def step(self, name, inputs=(), params=()):
+        """Decorador que registra (ou atualiza, a cada reexecução da página) um passo."""
+        def decorator(fn):
+            self._steps[name] = Step(name, fn, tuple(inputs), tuple(params))
+            return fn
+        return decorator
+
+    def run(self, target, **params):
+        """Calcula o passo ``target`` reaproveitando os resultados memorizados."""
+        return self._resolve(target, params, {})[0]
+
+    def _resolve(self, name, params, resolved):
+        if name in resolved:
+            return resolved[name]
+        step = self._steps[name]
+
+        input_values, input_keys = [], []
+        for dependency in step.inputs:
+            value, key = self._resolve(dependency, params, resolved)
+            input_values.append(value)
+            input_keys.append(key)
+        step_params = {param: params[param] for param in step.params}
+        key = (name, step.fingerprint, tuple(input_keys), _freeze(step_params))
+
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                resolved[name] = (self._memo[key], key)
+                return resolved[name]
+
+        value = step.fn(*input_values, **step_params)
+        with self._lock:
+            self._memo[key] = value
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        resolved[name] = (value, key)
+        return resolved[name]
+
+
+def get_pipeline(name):
+    """Devolve o pipeline persistente de ``name`` (normalmente o ``__file__`` da página)."""
+    with _PIPELINES_LOCK:
+        if name not in _PIPELINES:
+            _PIPELINES[name] = Pipeline(name)
+        return _PIPELINES[name]
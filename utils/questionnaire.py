@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import INSE_DISPLAY_LABELS, QUESTION_CODE_SUFFIX, answer_categories, load_validated_data, question_columns
+from utils.filters import filter_by_criteria
+from utils.stats import crosstab_counts
+from utils.store import stored
+
+INSE_VARIABLE = 'NU_TIPO_NIVEL_INSE'
+
+# Enunciados resumidos dos itens conhecidos; os demais aparecem pelo código do item
+QUESTION_LABELS = {
+    'TX_RESP_Q01': 'Q01 · Gênero',
+}
+
+# Medida -> coluna de proficiência cuja média é calculada (None para as contagens)
+MEASURES = {
+    'contagem': None,
+    'percentual_linha': None,
+    'percentual_coluna': None,
+    'media_lp': 'PROFICIENCIA_LP_SAEB',
+    'media_mt': 'PROFICIENCIA_MT_SAEB',
+}
+
+
+def variable_label(variable):
+    if variable == INSE_VARIABLE:
+        return 'Nível Socioeconômico (INSE)'
+    return QUESTION_LABELS.get(variable, variable.replace('TX_RESP_', ''))
+
+
+@st.cache_data(show_spinner=False)
+def question_codebook(file_path):
+    """Alternativas de cada item do questionário, na ordem dos códigos gravados na ingestão."""
+    df = load_validated_data(file_path)[0]
+    return {col: answer_categories(df[col]) for col in question_columns(df)}
+
+
+def crosstab_variables(file_path):
+    """Variáveis disponíveis para as tabelas cruzadas: os itens do questionário e o INSE."""
+    return list(question_codebook(file_path)) + [INSE_VARIABLE]
+
+
+def _variable_codes(df, variable, codebook):
+    # Devolve (códigos, rótulos das categorias)
+    if variable == INSE_VARIABLE:
+        levels = sorted(INSE_DISPLAY_LABELS)
+        return df[INSE_VARIABLE].to_numpy() - levels[0], [INSE_DISPLAY_LABELS[level] for level in levels]
+    return df[variable + QUESTION_CODE_SUFFIX].to_numpy(), codebook[variable]
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+@stored('tabela_cruzada')
+def crosstab(file_path, version, criteria, row_variable, col_variable, measure):
+    """Tabela ``row_variable`` x ``col_variable`` com a medida pedida, em cache por par de variáveis.
+
+    ``version`` (versão do arquivo de dados) e ``criteria`` (filtros globais) fazem parte da chave do cache.
+    """
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    codebook = question_codebook(file_path)
+    row_codes, row_labels = _variable_codes(df, row_variable, codebook)
+    col_codes, col_labels = _variable_codes(df, col_variable, codebook)
+    shape = (len(row_labels), len(col_labels))
+
+    counts = crosstab_counts(row_codes, shape[0], col_codes, shape[1])
+    value_column = MEASURES[measure]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if value_column is not None:
+            sums = crosstab_counts(row_codes, shape[0], col_codes, shape[1], weights=df[value_column].to_numpy())
+            table = np.where(counts > 0, sums / counts, np.nan)
+        elif measure == 'percentual_linha':
+            table = 100 * counts / counts.sum(axis=1, keepdims=True)
+        elif measure == 'percentual_coluna':
+            table = 100 * counts / counts.sum(axis=0, keepdims=True)
+        else:
+            table = counts.astype(np.int64)
+
+    result = pd.DataFrame(table, index=pd.Index(row_labels, name=variable_label(row_variable)),
+                          columns=pd.Index(col_labels, name=variable_label(col_variable)))
+    if measure == 'contagem':
+        # Totais marginais
+        result['Total'] = result.sum(axis=1)
+        result.loc['Total'] = result.sum(axis=0)
+    return result
@@ -0,0 +1,33 @@
+import pandas as pd
+import streamlit as st
+
+from utils.data import load_validated_data
+from utils.filters import filter_by_criteria
+from utils.stats import SUFFICIENT_STATS, linear_fits, sufficient_statistics
+from utils.store import stored
+
+# Estrato mais fino: qualquer recorte (INSE, gênero, município e suas combinações) é uma soma destes
+STRATUM_KEYS = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01', 'ID_MUNICIPIO']
+X_COLUMN = 'PROFICIENCIA_LP_SAEB'
+Y_COLUMN = 'PROFICIENCIA_MT_SAEB'
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+@stored('somas_regressao')
+def stratum_sums(file_path, version, criteria):
+    """Somas suficientes de LP (x) e MT (y) por INSE × gênero × município, numa passagem pelas linhas.
+
+    ``version`` (versão do arquivo) e ``criteria`` (filtros globais) fazem parte da chave do cache.
+    """
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    codes, strata = pd.MultiIndex.from_frame(df[STRATUM_KEYS]).factorize()
+    sums = sufficient_statistics(codes, len(strata), df[X_COLUMN].to_numpy(), df[Y_COLUMN].to_numpy())
+    return pd.DataFrame(sums, index=strata.set_names(STRATUM_KEYS), columns=SUFFICIENT_STATS)
+
+
+def fits_by(sums, by):
+    """Regressão de MT em LP para cada grupo de ``by`` (colunas de ``STRATUM_KEYS``), somando os estratos."""
+    grouped = sums.groupby(level=by).sum()
+    fits = linear_fits(grouped.to_numpy())
+    fits.index = grouped.index
+    return fits
@@ -0,0 +1,437 @@
+import functools
+import hashlib
+import io
+import os
+import sqlite3
+from concurrent.futures import wait
+
+import streamlit as st
+from streamlit.logger import get_logger
+
+from utils.data import DATA_FILE_PATH, dataset_version
+from utils.state import page_inputs, persistent_widget_key, save_widget_state
+from utils.scheduler import get_scheduler, scheduler_metrics
+from utils.static_cache import STATIC_EXTENSIONS, cache_key, static_path, static_url, write_atomic
+from utils.store import store_summary
+
+logger = get_logger(__name__)
+
+# Largura útil (px) da área de conteúdo no layout "centered" do Streamlit, multiplicada por uma
+# densidade de pixels típica de telas de desktop; em celulares a imagem é bem menor
+DESKTOP_TARGET_WIDTH_PX = 1100
+MOBILE_TARGET_WIDTH_PX = 640
+MIN_DPI, MAX_DPI = 50, 150
+
+# Renderização progressiva (show_progressive_figures): gráficos com mais linhas que PREVIEW_ROWS exibem
+# antes uma prévia de uma amostra desse tamanho, se o gráfico completo não ficar pronto em PREVIEW_BUDGET_S
+PREVIEW_ROWS = 2000
+PREVIEW_BUDGET_S = 0.3
+
+# Espera (s) pelo agendador antes de avisar que o gráfico está na fila
+QUEUE_NOTICE_S = 0.5
+
+# Formato padrão: 'auto', 'png', 'webp' ou 'svg' (pode ser sobrescrito pela variável de ambiente)
+DEFAULT_CHART_FORMAT = os.environ.get('SAEB_CHART_FORMAT', 'auto').lower()
+
+_FORMAT_OPTIONS = {
+    'auto': 'Automático',
+    'png': 'PNG otimizado',
+    'webp': 'WebP',
+    'svg': 'SVG',
+}
+_MIME_TYPES = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}
+_WIDTH_OPTIONS = {
+    'auto': 'Automática (pelo navegador)',
+    'desktop': 'Computador',
+    'mobile': 'Celular',
+}
+
+# Destino opcional das figuras e tabelas, usado pelo gerador de relatórios em lote (tools/batch_report.py).
+# Quando definido, as páginas entregam a ele cada figura e tabela em vez de codificá-las para o navegador.
+_export_sink = None
+
+
+def set_export_sink(sink):
+    """Define (ou remove, com ``None``) o objeto com métodos ``figure(page, fig)`` e ``table(page, name, df)``."""
+    global _export_sink
+    _export_sink = sink
+
+
+def _is_mobile_client():
+    # Heurística pelo User-Agent (o servidor não conhece a largura real da tela): navegadores móveis
+    # costumam anunciar "Mobi" ou "Android". A opção "Largura da tela" da barra lateral a substitui
+    try:
+        user_agent = st.context.headers.get('User-Agent', '')
+    except Exception:
+        return False
+    return 'Mobi' in user_agent or 'Android' in user_agent
+
+
+def _target_width_px():
+    width = st.session_state.get('opcao_largura_grafico', 'auto')
+    mobile = _is_mobile_client() if width == 'auto' else width == 'mobile'
+    return MOBILE_TARGET_WIDTH_PX if mobile else DESKTOP_TARGET_WIDTH_PX
+
+
+def choose_dpi(fig, target_width_px=None):
+    """Escolhe o DPI para que a imagem tenha a largura (px) adequada ao layout do cliente."""
+    if target_width_px is None:
+        target_width_px = _target_width_px()
+    fig_width_in = fig.get_size_inches()[0]
+    return int(min(MAX_DPI, max(MIN_DPI, target_width_px / fig_width_in)))
+
+
+def _webp_available():
+    from PIL import features
+    return features.check('webp')
+
+
+def resolve_format(chart_format, simple_chart):
+    if chart_format == 'auto':
+        # Gráficos de barras simples ficam menores como SVG; os demais, como WebP sem perdas
+        if simple_chart:
+            return 'svg'
+        return 'webp' if _webp_available() else 'png'
+    if chart_format == 'webp' and not _webp_available():
+        return 'png'
+    return chart_format
+
+
+def encode_figure(fig, chart_format, dpi):
+    """Codifica a figura no formato pedido e devolve os bytes."""
+    import matplotlib
+
+    buffer = io.BytesIO()
+    if chart_format == 'svg':
+        # Texto como texto (não como caminhos) e sem data nos metadados: SVG menor e estável
+        with matplotlib.rc_context({'svg.fonttype': 'none'}):
+            fig.savefig(buffer, format='svg', bbox_inches='tight', metadata={'Date': None})
+    elif chart_format == 'webp':
+        fig.savefig(buffer, format='webp', dpi=dpi, bbox_inches='tight',
+                    pil_kwargs={'lossless': True, 'method': 4})
+    else:
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight',
+                    pil_kwargs={'optimize': True})
+    return buffer.getvalue()
+
+
+def render_image_options():
+    with st.sidebar.expander("Imagem dos Gráficos", expanded=False):
+        chart_format = save_widget_state('opcao_formato_grafico', st.selectbox(
+            "Formato da imagem:",
+            options=list(_FORMAT_OPTIONS.keys()),
+            index=list(_FORMAT_OPTIONS.keys()).index(DEFAULT_CHART_FORMAT)
+            if DEFAULT_CHART_FORMAT in _FORMAT_OPTIONS else 0,
+            format_func=lambda x: _FORMAT_OPTIONS[x],
+            key=persistent_widget_key('opcao_formato_grafico')
+        ))
+        save_widget_state('opcao_largura_grafico', st.selectbox(
+            "Largura da tela:",
+            options=list(_WIDTH_OPTIONS.keys()),
+            format_func=lambda x: _WIDTH_OPTIONS[x],
+            key=persistent_widget_key('opcao_largura_grafico'),
+            help="No modo automático, a largura é estimada pelo navegador informado (User-Agent)."
+        ))
+        show_size = save_widget_state('opcao_mostrar_tamanho_grafico', st.checkbox(
+            "Mostrar tamanho da imagem",
+            key=persistent_widget_key('opcao_mostrar_tamanho_grafico')
+        ))
+        # Diagnóstico do servidor, independente do tamanho das imagens
+        show_server = save_widget_state('opcao_mostrar_fila_graficos', st.checkbox(
+            "Mostrar fila de gráficos do servidor",
+            key=persistent_widget_key('opcao_mostrar_fila_graficos')
+        ))
+        if show_server:
+            metrics = scheduler_metrics()
+            st.caption(f"Fila de gráficos do servidor: {metrics['em_execucao']} em desenho, {metrics['na_fila']} "
+                       f"aguardando (limite de {metrics['limite']} simultâneos). Desde o início: pico de {metrics['max_na_fila']} "
+                       f"na fila, {metrics['concluidos']} desenhos concluídos e {metrics['compartilhados']} "
+                       f"compartilhados entre sessões.")
+            try:
+                stored_aggregates = store_summary()
+            except sqlite3.Error:
+                stored_aggregates = None
+            if stored_aggregates is not None:
+                st.caption(f"Banco de agregados: {stored_aggregates['Agregados'].sum()} agregados de "
+                           f"{len(stored_aggregates)} tipos ({stored_aggregates['Bytes'].sum() / 1024:.0f} KB).")
+    return chart_format, show_size
+
+
+def _page_name(page_file):
+    return os.path.splitext(os.path.basename(page_file))[0]
+
+
+# Hash do conteúdo de cada arquivo de código, recalculado só quando a data de modificação ou o tamanho mudam
+_source_digests = {}
+
+
+def _source_digest(source):
+    stat = os.stat(source)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _source_digests.get(source)
+    if cached is None or cached[0] != signature:
+        with open(source, 'rb') as f:
+            cached = (signature, hashlib.sha1(f.read()).hexdigest())
+        _source_digests[source] = cached
+    return cached[1]
+
+
+def _code_version(page_file):
+    # Conteúdo do código que desenha o gráfico (a página e o pacote utils): alterar o código gera novas
+    # imagens em vez de reaproveitar as antigas, e o mesmo código dá as mesmas chaves em qualquer contêiner
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+    sources = [page_file] + sorted(os.path.join(utils_dir, name) for name in os.listdir(utils_dir) if name.endswith('.py'))
+    return cache_key([_source_digest(source) for source in sources])
+
+
+def _static_chart_params(page_file, chart_format):
+    # Todo o estado que altera o gráfico vem dos widgets ligados à URL (filtros globais e opções da
+    # página) lidos antes dele: seus valores canônicos identificam a imagem junto com o código, o formato
+    # e a largura-alvo. Outros parâmetros que estiverem na URL não entram na chave
+    return {
+        'entradas': page_inputs(),
+        'codigo': _code_version(page_file),
+        'formato': chart_format,
+        'largura': _target_width_px(),
+    }
+
+
+def _chart_target(page_file, chart_format, panel=None, data_version=None):
+    # (caminho, URL) da imagem no cache estático (None para SVG, que vai embutido na página) e a chave
+    # do cálculo no agendador: a mesma página, opções, código e versão dos dados dão a mesma imagem.
+    # Páginas que leem outros arquivos além do principal informam a versão combinada em ``data_version``
+    version = data_version or dataset_version(DATA_FILE_PATH)
+    params = _static_chart_params(page_file, chart_format)
+    if panel is not None:
+        params['painel'] = panel
+    page = _page_name(page_file)
+    key = (page, version, cache_key(params))
+    if chart_format not in STATIC_EXTENSIONS:
+        return None, None, key
+    path = static_path('graficos', version, page, params, chart_format)
+    return path, static_url(path, version), key
+
+
+def _release_figure(fig):
+    # Figuras do pyplot ficam registradas no seu estado global até serem fechadas; as criadas pela API
+    # orientada a objetos (matplotlib.figure.Figure) não, e liberá-las não exige importar o pyplot
+    if getattr(fig.canvas, 'manager', None) is not None:
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+
+
+def _encode_panel(fig, chart_format, target_width_px):
+    # Desenha (se ``fig`` for uma função) e codifica uma figura; pode rodar fora da thread da página,
+    # pois não chama o Streamlit (a largura-alvo vem da thread da página)
+    if callable(fig):
+        fig = fig()
+    dpi = choose_dpi(fig, target_width_px)
+    data = encode_figure(fig, chart_format, dpi)
+    # A figura não é mais necessária
+    _release_figure(fig)
+    return data, dpi
+
+
+def _submit_panels(panels, keys, chart_format, target_width_px):
+    # Cada painel vai para o agendador do processo (utils/scheduler.py): painéis independentes são
+    # desenhados em paralelo até o limite de concorrência, e um painel igual já em cálculo em outra
+    # sessão é reaproveitado em vez de desenhado de novo
+    scheduler = get_scheduler()
+    return [scheduler.submit(key, _encode_panel, panel, chart_format, target_width_px)
+            for panel, key in zip(panels, keys)]
+
+
+def _wait_for_panels(futures, notice_slot=None):
+    # Aguarda os painéis, avisando quando eles estão na fila por causa de outros acessos
+    _, pending = wait(futures, timeout=QUEUE_NOTICE_S)
+    if pending:
+        metrics = get_scheduler().metrics()
+        if metrics['na_fila'] > 0:
+            notice_slot = notice_slot if notice_slot is not None else st.empty()
+            notice_slot.info(
+                f"Muitos acessos no momento: o gráfico está na fila ({metrics['na_fila']} aguardando, "
+                f"{metrics['em_execucao']} em desenho). Ele aparecerá aqui em instantes."
+            )
+        wait(futures)
+        if notice_slot is not None:
+            notice_slot.empty()
+    return [future.result() for future in futures]
+
+
+def _close_figures(panels):
+    # Figuras já desenhadas pela página e não usadas (imagem em cache ou cálculo compartilhado)
+    for fig in panels:
+        if not callable(fig):
+            _release_figure(fig)
+
+
+def _chart_targets(n_panels, page_file, chart_format, data_version=None):
+    # Um caminho no cache por painel; páginas com um único painel mantêm a chave sem índice
+    single = n_panels == 1
+    return [_chart_target(page_file, chart_format, None if single else i, data_version) for i in range(n_panels)]
+
+
+def _publish_panel(data, dpi, path, url, page):
+    # Grava a imagem no cache estático e devolve (bytes, URL, tamanho, dpi) para exibição;
+    # sem cache (SVG ou falha na gravação), a imagem vai embutida na página
+    # Um cálculo compartilhado entre sessões é gravado só por quem chegar primeiro
+    if path is not None and not path.exists():
+        try:
+            write_atomic(path, data)
+        except OSError as e:
+            logger.warning("[%s] não foi possível gravar %s: %s", page, path, e)
+            url = None
+    return data, url, len(data), dpi
+
+
+def _display_panels(results, chart_format, show_size, page, slots=None):
+    # ``slots``: pares (imagem, legenda) de espaços ``st.empty()`` onde cada painel é exibido,
+    # substituindo o que houver neles (usado na renderização progressiva)
+    for i, (data, url, data_size, dpi) in enumerate(results):
+        image_slot, caption_slot = slots[i] if slots is not None else (st, st)
+        if chart_format == 'svg':
+            image_slot.image(data.decode('utf-8'), use_container_width=True)
+        elif url is not None:
+            image_slot.markdown(f"![Gráfico]({url})")
+        else:
+            image_slot.image(data, use_container_width=True, output_format=chart_format.upper())
+
+        logger.debug("[%s] gráfico %s (%s dpi): %d bytes", page, chart_format, dpi, data_size)
+        if show_size:
+            dpi_text = f", {dpi} dpi" if dpi is not None else ", em cache"
+            caption_slot.caption(f"Imagem {chart_format.upper()} ({_MIME_TYPES[chart_format]}){dpi_text}: {data_size / 1024:.1f} KB")
+        elif slots is not None:
+            caption_slot.empty()
+    st.session_state.setdefault('tamanho_graficos', {})[page] = sum(result[2] for result in results)
+
+
+def _show_panels(panels, targets, chart_format, show_size, page):
+    results = [None] * len(panels)
+    pending = []
+    for i, (path, url, _) in enumerate(targets):
+        if path is not None and path.exists():
+            # Imagem já publicada: o navegador a busca (e revalida via ETag) sem recodificar nada
+            results[i] = (None, url, path.stat().st_size, None)
+        else:
+            pending.append(i)
+
+    futures = _submit_panels([panels[i] for i in pending], [targets[i][2] for i in pending], chart_format,
+                             _target_width_px())
+    for i, (data, dpi) in zip(pending, _wait_for_panels(futures)):
+        results[i] = _publish_panel(data, dpi, *targets[i][:2], page)
+    _close_figures(panels)
+    _display_panels(results, chart_format, show_size, page)
+
+
+def _export_panels(panels, page):
+    for fig in panels:
+        if callable(fig):
+            fig = fig()
+        _export_sink.figure(page, fig)
+        _release_figure(fig)
+
+
+def show_figure(fig, page_file, simple_chart=False, data_version=None):
+    """Substitui ``st.pyplot``: codifica a figura com DPI/formato adequados e informa o tamanho em bytes.
+
+    ``fig`` pode ser uma função sem argumentos que desenha e devolve a figura; nesse caso ela só é
+    chamada se a imagem correspondente aos parâmetros atuais ainda não estiver no cache estático.
+    ``data_version`` substitui a versão do arquivo principal na chave do cache (ver ``show_figures``).
+    """
+    show_figures([fig], page_file, simple_chart=simple_chart, data_version=data_version)
+
+
+def show_figures(panels, page_file, simple_chart=False, data_version=None):
+    """Exibe, em ordem, vários painéis independentes de uma página (cada um é uma figura ou uma função que a desenha).
+
+    Os painéis que não estão no cache estático são desenhados e codificados pelo agendador do processo,
+    em paralelo e sem repetir um cálculo igual em andamento. Para isso, as funções devem criar a figura
+    pela API orientada a objetos (``matplotlib.figure.Figure``), sem usar o estado global do pyplot.
+    Páginas que leem outros arquivos de dados além do principal passam em ``data_version`` uma versão
+    que cubra todos eles, para que a alteração de qualquer um gere novas imagens.
+    """
+    page = _page_name(page_file)
+    if _export_sink is not None:
+        _export_panels(panels, page)
+        return
+
+    chart_format, show_size = render_image_options()
+    chart_format = resolve_format(chart_format, simple_chart)
+    _show_panels(panels, _chart_targets(len(panels), page_file, chart_format, data_version), chart_format, show_size,
+                 page)
+
+
+def show_progressive_figures(panels, data, preview, n_rows, page_file, simple_chart=False):
+    """Exibe os painéis progressivamente: uma prévia de uma amostra e, em seguida, o gráfico completo.
+
+    Cada painel é uma função ``draw(dados)`` que cria a figura pela API orientada a objetos. O gráfico
+    completo (``draw(data)``) é calculado pelo agendador do processo; se não ficar pronto em
+    ``PREVIEW_BUDGET_S`` segundos, a página exibe antes a prévia ``draw(preview())``, com os dados da
+    amostra estratificada, e a substitui pelo gráfico completo quando ele termina. Gráficos já no cache
+    estático ou de até ``PREVIEW_ROWS`` linhas (``n_rows``) são exibidos diretamente.
+    """
+    page = _page_name(page_file)
+    full_panels = [functools.partial(panel, data) for panel in panels]
+    if _export_sink is not None:
+        _export_panels(full_panels, page)
+        return
+
+    chart_format, show_size = render_image_options()
+    chart_format = resolve_format(chart_format, simple_chart)
+    targets = _chart_targets(len(panels), page_file, chart_format)
+    cached = all(path is not None and path.exists() for path, _, _ in targets)
+    if cached or n_rows <= PREVIEW_ROWS:
+        _show_panels(full_panels, targets, chart_format, show_size, page)
+        return
+
+    target_width_px = _target_width_px()
+    futures = _submit_panels(full_panels, [key for _, _, key in targets], chart_format, target_width_px)
+    # Um espaço por elemento: a prévia e o gráfico completo ocupam os mesmos lugares
+    slots = [(st.empty(), st.empty()) for _ in panels]
+    note_slot = st.empty()
+    _, pending = wait(futures, timeout=PREVIEW_BUDGET_S)
+    if pending:
+        # Prévia desenhada na thread da página e embutida nela (não vai para o cache estático)
+        preview_data = preview()
+        preview_encoded = [_encode_panel(functools.partial(panel, preview_data), chart_format, target_width_px)
+                           for panel in panels]
+        _display_panels([(image, None, len(image), dpi) for image, dpi in preview_encoded], chart_format, False, page,
+                        slots)
+        note_slot.caption(f"Prévia com uma amostra estratificada de cerca de {PREVIEW_ROWS} dos {n_rows} estudantes. "
+                          "O gráfico completo está sendo calculado e aparecerá aqui em seguida.")
+    encoded = _wait_for_panels(futures, note_slot)
+
+    results = [_publish_panel(image, dpi, path, url, page) for (image, dpi), (path, url, _) in zip(encoded, targets)]
+    _display_panels(results, chart_format, show_size, page, slots)
+    note_slot.empty()
+
+
+def publish_table(df, page_file, name, data_version=None):
+    """Publica uma tabela agregada como JSON estático e devolve sua URL.
+
+    Como nos gráficos, a tabela é identificada pela página, versão dos dados (``data_version``, se
+    informada), versão do código e valores dos widgets lidos antes dela (``page_inputs``).
+    """
+    version = data_version or dataset_version(DATA_FILE_PATH)
+    params = {
+        'entradas': page_inputs(),
+        'codigo': _code_version(page_file),
+        'tabela': name,
+    }
+    path = static_path('tabelas', version, _page_name(page_file), params, 'json')
+    if not path.exists():
+        try:
+            write_atomic(path, df.to_json(orient='table', force_ascii=False).encode('utf-8'))
+        except OSError as e:
+            logger.warning("não foi possível gravar %s: %s", path, e)
+            return None
+    return static_url(path, version)
+
+
+def table_download_link(df, page_file, name, label="Baixar tabela (JSON)", data_version=None):
+    if _export_sink is not None:
+        _export_sink.table(_page_name(page_file), name, df)
+        return
+    url = publish_table(df, page_file, name, data_version)
+    if url is not None:
+        st.markdown(f"[{label}]({url})")
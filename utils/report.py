@@ -0,0 +1,140 @@
+"""Geração dos relatórios em lote (usada por tools/batch_report.py).
+
+Cada visualização é identificada pela página e pelos seus parâmetros canônicos de URL (os mesmos que
+o aplicativo usa para compartilhar links). As páginas são executadas sem servidor
+(``streamlit.testing``), reaproveitando exatamente o código do aplicativo.
+
+As funções ficam neste módulo (e não no script) porque o ``streamlit.testing`` executa cada página
+como ``__main__``: funções definidas no script deixariam de ser encontradas pelos processos do pool.
+"""
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from utils.render import set_export_sink
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+INSE_CODES = [str(level) for level in range(1, 9)]
+
+# Página -> variações dos parâmetros da URL (cada uma é uma visualização; {} é a visualização padrão)
+PAGE_VIEWS = {
+    '1_Estatísticas_Básicas.py': [{}, {'estatistica': 'central'}],
+    '2_Gráfico_de_Dispersão.py': [{'inse': code} for code in INSE_CODES],
+    '3_BoxPlot_Notas_por_INSE.py': [{}, {'proficiencia': 'lp'}, {'proficiencia': 'mt'}],
+    '4_Violin_Notas_por_INSE.py': [{}, {'proficiencia': 'lp'}, {'proficiencia': 'mt'}],
+    '5_Histograma_dos_Níveis_Socioeconômicos.py': [{}],
+    '6_Distribuição_de_Proficiência.py': [{}] + [{'inse': code} for code in INSE_CODES],
+    '7_Gênero_por_Nível_Socioeconômico.py': [{}],
+    '8_Proficiência_por_Gênero.py': [{}, {'proficiencia': 'mt'}],
+    '9_Proficiência_Média_por_Nível_Socioeconômico.py': [{}, {'proficiencia': 'mt'}],
+}
+
+STATE_UNIT = 'ES'
+PAGE_TIMEOUT = 120
+
+
+class ReportSink:
+    """Recebe as figuras e tabelas entregues por ``utils.render`` durante a execução de uma página."""
+
+    def __init__(self):
+        self.figures = []
+        self.tables = []
+
+    def figure(self, page, fig):
+        self.figures.append(fig)
+
+    def table(self, page, name, df):
+        self.tables.append((name, df))
+
+    def reset(self):
+        self.figures, self.tables = [], []
+
+
+def _view_name(page_file, params):
+    page = Path(page_file).stem
+    suffix = '_'.join(f'{key}-{value}' for key, value in sorted(params.items()))
+    return f'{page}__{suffix}' if suffix else page
+
+
+def _file_name(name):
+    return re.sub(r'[^\w.-]+', '-', name)
+
+
+def init_worker():
+    """Prepara um processo do pool: as páginas usam caminhos relativos à raiz do repositório."""
+    os.chdir(REPO_ROOT)
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+def render_unit(unit, out_dir, formats, dpi):
+    """Executa todas as visualizações de uma unidade (estado ou código de município) e grava o pacote.
+
+    Devolve ``(unidade, gráficos, tabelas, visualizações sem dados, erros, segundos)``; ``erros`` lista
+    ``(visualização, mensagem)`` das páginas que levantaram uma exceção.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    unit_dir = Path(out_dir) / unit
+    unit_dir.mkdir(parents=True, exist_ok=True)
+    unit_params = {} if unit == STATE_UNIT else {'f_municipio': unit}
+
+    sink = ReportSink()
+    set_export_sink(sink)
+    pdf = PdfPages(unit_dir / f'relatorio_{unit}.pdf') if 'pdf' in formats else None
+    n_figures = n_tables = 0
+    skipped = []
+    errors = []
+    generated = set()
+    try:
+        for page_file, views in PAGE_VIEWS.items():
+            for view_params in views:
+                params = {**unit_params, **view_params}
+                sink.reset()
+                at = AppTest.from_file(str(REPO_ROOT / 'pages' / page_file), default_timeout=PAGE_TIMEOUT)
+                for key, value in params.items():
+                    at.query_params[key] = value
+                at.run()
+
+                # A URL canônica após a execução diz qual visualização foi de fato gerada: um valor
+                # igual ao padrão é omitido e um valor indisponível nesta unidade (por exemplo, um nível
+                # INSE sem estudantes no município) é trocado pelo padrão. Visualizações repetidas são descartadas.
+                effective = {key: at.query_params[key][0] for key in at.query_params}
+                view_key = (page_file, tuple(sorted(effective.items())))
+                redundant = view_key in generated or any(effective.get(k) != v for k, v in unit_params.items())
+                if at.exception or redundant:
+                    if at.exception:
+                        # Página com erro: é uma falha do relatório, não uma visualização sem dados
+                        errors.append((_view_name(page_file, view_params), at.exception[0].message))
+                    else:
+                        skipped.append(_view_name(page_file, view_params))
+                    for fig in sink.figures:
+                        plt.close(fig)
+                    continue
+                generated.add(view_key)
+
+                view_params = {key: value for key, value in effective.items() if key not in unit_params}
+                name = _file_name(_view_name(page_file, view_params))
+                for i, fig in enumerate(sink.figures):
+                    fig_name = name if len(sink.figures) == 1 else f'{name}_{i + 1}'
+                    if 'png' in formats:
+                        fig.savefig(unit_dir / f'{fig_name}.png', dpi=dpi, bbox_inches='tight')
+                    if pdf is not None:
+                        pdf.savefig(fig, bbox_inches='tight')
+                    plt.close(fig)
+                    n_figures += 1
+                for table_name, df in sink.tables:
+                    df.to_csv(unit_dir / f'{name}__{_file_name(table_name)}.csv')
+                    n_tables += 1
+    finally:
+        set_export_sink(None)
+        if pdf is not None:
+            pdf.close()
+    return unit, n_figures, n_tables, skipped, errors, time.perf_counter() - started
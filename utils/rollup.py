@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import PROFICIENCY_BOUNDS, load_validated_data
+from utils.filters import filter_by_criteria
+from utils.stats import crosstab_counts
+from utils.store import stored
+
+# Níveis da hierarquia, do mais amplo ao mais detalhado. Os microdados do SAEB trazem o código da
+# escola (ID_ESCOLA); o arquivo filtrado do ES só tem estado e município, e a hierarquia usa os
+# níveis cujas colunas existirem no arquivo.
+HIERARCHY = ['ID_UF', 'ID_MUNICIPIO', 'ID_ESCOLA']
+LEVEL_LABELS = {'ID_UF': 'Estado', 'ID_MUNICIPIO': 'Município', 'ID_ESCOLA': 'Escola'}
+
+# Estratos guardados em cada nó: os gráficos de INSE e gênero de um nó são consultas a essas linhas
+STRATA = ['NU_TIPO_NIVEL_INSE', 'TX_RESP_Q01']
+SUBJECT_COLUMNS = {'lp': 'PROFICIENCIA_LP_SAEB', 'mt': 'PROFICIENCIA_MT_SAEB'}
+
+# Faixas fixas de 10 pontos na escala SAEB para os histogramas: somar os histogramas dos filhos dá o do pai
+HISTOGRAM_EDGES = np.arange(PROFICIENCY_BOUNDS[0], PROFICIENCY_BOUNDS[1] + 10, 10)
+N_BINS = len(HISTOGRAM_EDGES) - 1
+
+# Coluna com a profundidade do nó (1 = estado, 2 = município, 3 = escola); nos níveis acima da
+# profundidade, as colunas da hierarquia ficam com 0
+DEPTH_COLUMN = 'NIVEL'
+
+
+def hierarchy_levels(columns):
+    """Níveis da hierarquia disponíveis entre ``columns``, do mais amplo ao mais detalhado."""
+    return [col for col in HIERARCHY if col in columns]
+
+
+def _histogram_columns(subject):
+    return [f'hist_{subject}_{i:02d}' for i in range(N_BINS)]
+
+
+@st.cache_data(max_entries=16, show_spinner="Calculando os agregados por município...")
+@stored('agregados_hierarquia')
+def rollup_aggregates(file_path, version, criteria):
+    """Agregados de todos os nós da hierarquia (estado → município → escola) por INSE e gênero.
+
+    Cada nó tem n, soma e soma dos quadrados das notas e o histograma em faixas fixas de cada
+    proficiência. As linhas dos estudantes são lidas uma única vez, no nível mais detalhado; cada
+    nível acima é a soma dos agregados do nível abaixo. ``version`` e ``criteria`` fazem parte da chave.
+    """
+    df = filter_by_criteria(load_validated_data(file_path)[0], file_path, criteria)
+    levels = hierarchy_levels(df.columns)
+    keys = levels + STRATA
+
+    # Folhas: uma única passagem pelas linhas, com np.bincount sobre o código de cada grupo
+    codes, groups = pd.MultiIndex.from_frame(df[keys]).factorize()
+    n_groups = len(groups)
+    values = {'n': np.bincount(codes, minlength=n_groups)}
+    for subject, col in SUBJECT_COLUMNS.items():
+        scores = df[col].to_numpy(dtype=np.float64)
+        values[f'soma_{subject}'] = np.bincount(codes, weights=scores, minlength=n_groups)
+        values[f'soma2_{subject}'] = np.bincount(codes, weights=scores ** 2, minlength=n_groups)
+        bins = np.clip(np.searchsorted(HISTOGRAM_EDGES, scores, side='right') - 1, 0, N_BINS - 1)
+        histogram = crosstab_counts(codes, n_groups, bins, N_BINS)
+        values.update(zip(_histogram_columns(subject), histogram.T))
+    leaves = pd.DataFrame(values, index=pd.MultiIndex.from_tuples(list(groups), names=keys))
+
+    # Agregação em cascata: cada nível soma o nível imediatamente abaixo
+    frames = []
+    current = leaves
+    for depth in range(len(levels), 0, -1):
+        if depth < len(levels):
+            current = current.groupby(level=levels[:depth] + STRATA).sum()
+        frame = current.reset_index()
+        for col in levels[depth:]:
+            frame[col] = 0
+        frame.insert(0, DEPTH_COLUMN, depth)
+        frames.append(frame[[DEPTH_COLUMN] + keys + list(values)])
+    return pd.concat(frames[::-1], ignore_index=True)
+
+
+class Rollup:
+    """Agregados da hierarquia organizados por nó, para que detalhar um estado ou município seja uma consulta.
+
+    Um nó é identificado pelo caminho de códigos desde o estado, por exemplo ``(32,)`` ou ``(32, 3205309)``.
+    """
+
+    def __init__(self, aggregates, levels):
+        self.levels = levels
+        self.nodes = {}
+        self.children = {}
+        for depth in range(1, len(levels) + 1):
+            rows = aggregates[aggregates[DEPTH_COLUMN] == depth]
+            for path, group in rows.groupby(levels[:depth], sort=True):
+                self.nodes[path] = group.set_index(STRATA).drop(columns=[DEPTH_COLUMN] + levels)
+                self.children.setdefault(path[:-1], []).append(path[-1])
+
+    def node(self, path):
+        """Agregados do nó por INSE e gênero (tabela vazia se o nó não existir com os filtros atuais)."""
+        return self.nodes.get(tuple(path), pd.DataFrame())
+
+    def summary(self, path, by, subject):
+        """n, média e desvio padrão da proficiência ``subject`` no nó, por ``by`` (lista de estratos ou vazia)."""
+        aggregates = self.node(path)
+        columns = ['n', f'soma_{subject}', f'soma2_{subject}']
+        sums = aggregates.groupby(level=by)[columns].sum() if by else aggregates[columns].sum().to_frame().T
+        return _moments(sums, subject)
+
+    def histogram(self, path, subject, by=None):
+        """Contagens por faixa de ``HISTOGRAM_EDGES`` no nó (uma linha por grupo de ``by``, se informado)."""
+        aggregates = self.node(path)[_histogram_columns(subject)]
+        if by:
+            return aggregates.groupby(level=by).sum()
+        return aggregates.sum().to_numpy()
+
+    def child_summary(self, path, subject):
+        """n, média e desvio padrão de cada filho do nó (municípios de um estado, escolas de um município)."""
+        path = tuple(path)
+        columns = ['n', f'soma_{subject}', f'soma2_{subject}']
+        children = self.children.get(path, [])
+        sums = pd.DataFrame([self.nodes[path + (child,)][columns].sum() for child in children],
+                            index=pd.Index(children, name=self.levels[len(path)]), columns=columns)
+        return _moments(sums, subject)
+
+
+def _moments(sums, subject):
+    n = sums['n']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums[f'soma_{subject}'] / n
+        variance = (sums[f'soma2_{subject}'] - n * mean ** 2) / (n - 1)
+    return pd.DataFrame({'n': n.astype(np.int64), 'media': mean, 'desvio': np.sqrt(variance.clip(lower=0))})
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_rollup(file_path, version, criteria):
+    """Hierarquia de agregados de ``file_path`` com os filtros globais ``criteria``, compartilhada entre sessões."""
+    aggregates = rollup_aggregates(file_path, version, criteria)
+    return Rollup(aggregates, hierarchy_levels(aggregates.columns))
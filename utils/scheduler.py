@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Limite de desenhos pesados (Matplotlib) simultâneos no processo: uma thread por núcleo disponível,
+# a menos que a variável de ambiente defina outro valor. Acima disso, os pedidos esperam na fila.
+_CORES = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+MAX_CONCURRENT_RENDERS = int(os.environ.get('SAEB_MAX_RENDERS', _CORES))
+
+
+class RenderScheduler:
+    """Fila única dos cálculos pesados do processo, com deduplicação e limite de concorrência.
+
+    Pedidos com a mesma chave (página, opções e versão dos dados) enquanto um cálculo igual está em
+    andamento recebem o mesmo ``Future`` (single-flight); os demais entram numa fila atendida por
+    ``max_workers`` threads. Os contadores de ``metrics()`` descrevem a fila naquele instante.
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_RENDERS):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='saeb-grafico')
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._queued = 0
+        self._running = 0
+        self._shared = 0
+        self._completed = 0
+        self._max_queued = 0
+
+    def submit(self, key, fn, *args):
+        """Agenda ``fn(*args)`` sob ``key`` e devolve o ``Future``; reaproveita um cálculo igual em andamento."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._shared += 1
+                return future
+            future = Future()
+            self._in_flight[key] = future
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+            queued = self._queued
+        if queued > self.max_workers:
+            logger.info("fila de gráficos: %d pedidos para %d threads", queued, self.max_workers)
+        self._executor.submit(self._run, key, future, fn, args)
+        return future
+
+    def _run(self, key, future, fn, args):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                del self._in_flight[key]
+            logger.debug("gráfico %s calculado em %.1f ms", key[0] if isinstance(key, tuple) else key,
+                         (time.perf_counter() - start) * 1000)
+
+    def metrics(self):
+        """Profundidade da fila e contadores acumulados desde o início do processo."""
+        with self._lock:
+            return {
+                'em_execucao': self._running,
+                'na_fila': self._queued,
+                'max_na_fila': self._max_queued,
+                'limite': self.max_workers,
+                'compartilhados': self._shared,
+                'concluidos': self._completed,
+            }
+
+
+# Agendador compartilhado por todas as sessões do processo
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RenderScheduler()
+        return _scheduler
+
+
+def scheduler_metrics():
+    return get_scheduler().metrics()
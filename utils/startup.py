@@ -0,0 +1,88 @@
+import importlib
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Módulos pesados pré-carregados no início do processo e durante a construção da imagem
+HEAVY_MODULES = ['numpy', 'pandas', 'matplotlib.figure', 'matplotlib.backends.backend_agg', 'matplotlib.pyplot']
+
+_prewarm_lock = threading.Lock()
+_prewarm_started = False
+
+
+def configure_matplotlib():
+    """Força o backend não interativo Agg antes de qualquer import do pyplot."""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    import matplotlib
+    if matplotlib.get_backend().lower() != 'agg':
+        matplotlib.use('Agg')
+
+
+def build_font_cache():
+    # Importar o font_manager constrói (ou carrega) o cache de fontes do Matplotlib;
+    # a busca pela fonte padrão garante que a lista de fontes já foi processada
+    configure_matplotlib()
+    from matplotlib import font_manager
+    font_manager.findfont(font_manager.FontProperties(family='DejaVu Sans'))
+
+
+def _timed_import(module_name, page):
+    if module_name == 'matplotlib.pyplot':
+        configure_matplotlib()
+    # O tempo vai para o log só no primeiro import do módulo no processo (nos demais, ele já está
+    # carregado). O import passa sempre pelo importlib, que aguarda um import em andamento em outra thread
+    already_loaded = module_name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    if not already_loaded:
+        logger.info("[%s] import de %s: %.1f ms", page, module_name, elapsed * 1000)
+    return module
+
+
+class _LazyModule:
+    """Substituto de um módulo que só é importado no primeiro acesso a um atributo."""
+
+    def __init__(self, module_name, page):
+        self._module_name = module_name
+        self._page = page
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = _timed_import(self._module_name, self._page)
+        return getattr(self._module, name)
+
+
+def lazy_import(module_name, page_file):
+    """Devolve ``module_name`` com import adiado até o primeiro uso, registrando o tempo para ``page_file``."""
+    return _LazyModule(module_name, Path(page_file).stem)
+
+
+def _prewarm():
+    for module_name in HEAVY_MODULES:
+        _timed_import(module_name, 'pre-aquecimento')
+    build_font_cache()
+
+
+def prewarm_in_background():
+    """Importa os módulos pesados em uma thread de fundo, uma única vez por processo."""
+    global _prewarm_started
+    with _prewarm_lock:
+        if _prewarm_started:
+            return
+        _prewarm_started = True
+    configure_matplotlib()
+    threading.Thread(target=_prewarm, name='saeb-prewarm', daemon=True).start()
+
+
+if __name__ == '__main__':
+    # Executado na construção da imagem/contêiner: gera o cache de fontes e os bytecodes dos módulos pesados
+    _prewarm()
+    print("Cache de fontes do Matplotlib pronto.")
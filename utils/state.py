@@ -0,0 +1,91 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner_utils.script_run_context import get_script_run_ctx
+
+# Os valores das opções globais ficam em chaves próprias do estado de sessão para sobreviverem
+# à troca de página (o Streamlit descarta o estado de widgets que não são renderizados na página).
+
+
+def persistent_widget_key(state_key):
+    """Devolve a chave do widget associado a ``state_key``, restaurando o último valor salvo."""
+    widget_key = f'_{state_key}'
+    if widget_key not in st.session_state and state_key in st.session_state:
+        st.session_state[widget_key] = st.session_state[state_key]
+    return widget_key
+
+
+def save_widget_state(state_key, value):
+    st.session_state[state_key] = value
+    return value
+
+
+# --- Estado refletido na URL ---
+# O estado de cada página (nível INSE, proficiência, seleções) também fica nos parâmetros da URL,
+# em forma canônica (códigos curtos, listas ordenadas e valores padrão omitidos), para que a mesma
+# visualização tenha sempre o mesmo endereço e possa ser compartilhada e armazenada em cache.
+
+def _encode_query_value(value, codes, multiple):
+    if multiple:
+        return ','.join(sorted(codes[item] for item in value if item in codes))
+    return codes.get(value, '')
+
+
+def _decode_query_value(raw, codes, multiple, default):
+    decode = {code: option for option, code in codes.items()}
+    if multiple:
+        values = [decode[code] for code in raw.split(',') if code in decode]
+        # Mantém a ordem das opções, como o widget exibiria
+        return [option for option in codes if option in values]
+    return decode.get(raw, default)
+
+
+def init_widget_from_query(widget_key, param, codes, default, multiple=False):
+    """Inicializa o widget ``widget_key`` a partir de ``?param=`` (ou do padrão) na primeira renderização.
+
+    ``codes`` mapeia cada opção do widget para o seu código na URL.
+    """
+    if widget_key not in st.session_state:
+        raw = st.query_params.get(param)
+        st.session_state[widget_key] = default if raw is None else _decode_query_value(raw, codes, multiple, default)
+    return widget_key
+
+
+def reflect_in_query(param, value, codes, default, multiple=False):
+    """Atualiza ``?param=`` com o valor atual do widget, mantendo a URL em forma canônica."""
+    params = {key: st.query_params[key] for key in st.query_params}
+    encoded = _encode_query_value(value, codes, multiple)
+    if encoded == _encode_query_value(default, codes, multiple):
+        params.pop(param, None)
+    else:
+        params[param] = encoded
+    canonical = dict(sorted(params.items()))
+    if list(canonical.items()) != [(key, st.query_params[key]) for key in st.query_params]:
+        st.query_params.from_dict(canonical)
+    return value
+
+
+def _run_inputs():
+    # Parâmetros lidos pelos widgets na execução atual da página. O ScriptRunContext cria um novo
+    # conjunto de widgets a cada execução: a referência a ele (mantida viva aqui) identifica a execução
+    ctx = get_script_run_ctx()
+    run = ctx.widget_ids_this_run if ctx is not None else None
+    inputs = st.session_state.get('_entradas_da_execucao')
+    if inputs is None or inputs[0] is not run:
+        inputs = (run, {})
+        st.session_state['_entradas_da_execucao'] = inputs
+    return inputs[1]
+
+
+def page_inputs():
+    """Parâmetros canônicos (``param`` -> código) dos widgets renderizados até aqui na execução atual.
+
+    Só os widgets já lidos podem ter alterado o que a página calculou até este ponto: eles identificam
+    um gráfico ou tabela, sem os demais parâmetros que estiverem na URL.
+    """
+    return dict(sorted(_run_inputs().items()))
+
+
+def query_bound_widget(widget, label, param, codes, default, key, multiple=False, **kwargs):
+    """Renderiza ``widget`` inicializado por ``?param=`` e reflete o valor escolhido de volta na URL."""
+    value = widget(label, key=init_widget_from_query(key, param, codes, default, multiple), **kwargs)
+    _run_inputs()[param] = _encode_query_value(value, codes, multiple)
+    return reflect_in_query(param, value, codes, default, multiple)
@@ -0,0 +1,52 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from urllib.parse import quote
+
+import streamlit as st
+
+# Diretório servido pelo Streamlit em "app/static/" (opção server.enableStaticServing em .streamlit/config.toml).
+# Os arquivos gerados ficam em static/cache/<tipo>/<versão dos dados>/<página>/<chave>.<extensão>
+STATIC_DIR = Path(__file__).resolve().parent.parent / 'static'
+CACHE_DIR = STATIC_DIR / 'cache'
+
+# Extensões que o Streamlit serve com o Content-Type correto. O SVG não está entre elas: o servidor o
+# entregaria como text/plain (com X-Content-Type-Options: nosniff) e o navegador não o exibiria como
+# imagem, por isso os gráficos SVG nunca são publicados aqui e vão sempre embutidos na página
+STATIC_EXTENSIONS = ('png', 'webp', 'json')
+
+
+def cache_key(params):
+    """Chave estável para um conjunto de parâmetros (por exemplo, os parâmetros canônicos da URL)."""
+    payload = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def static_path(kind, version, page, params, extension):
+    return CACHE_DIR / kind / version / page / f'{cache_key(params)}.{extension}'
+
+
+def static_url(path, version):
+    # O parâmetro "v" faz o servidor de arquivos estáticos enviar um Cache-Control de longa duração;
+    # o ETag (hash do conteúdo) e o If-None-Match são tratados pelo próprio servidor
+    # O caminho é absoluto e inclui o prefixo configurado em server.baseUrlPath (aplicação servida
+    # sob um subcaminho, atrás de um proxy), pois não depende da página em que o link aparece
+    relative = path.relative_to(STATIC_DIR).as_posix()
+    base_path = (st.get_option('server.baseUrlPath') or '').strip('/')
+    prefix = f'/{base_path}/' if base_path else '/'
+    return f'{prefix}app/static/{quote(relative)}?v={version}'
+
+
+def write_atomic(path, data):
+    """Grava ``data`` em ``path`` por meio de um arquivo temporário, para que leitores nunca vejam um arquivo parcial."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+
+# Proficiências do SAEB têm duas casas decimais: codificadas como inteiros em centésimos de ponto
+CENTIPOINT_SCALE = 100
+CENTIPOINT_COLUMNS = {
+    'PROFICIENCIA_LP_SAEB': 'PROFICIENCIA_LP_CENTI',
+    'PROFICIENCIA_MT_SAEB': 'PROFICIENCIA_MT_CENTI',
+}
+
+# Limite de células da matriz de contagens (grupos x valores) processada por vez
+_MAX_COUNT_CELLS = 1 << 24
+
+
+def encode_centipoints(values):
+    """Converte proficiências (float) para inteiros em centésimos de ponto (ponto fixo)."""
+    return np.rint(np.asarray(values, dtype=np.float64) * CENTIPOINT_SCALE).astype(np.int32)
+
+
+def _count_blocks(group_codes, value_codes, n_groups, n_values):
+    """Gera (primeiro grupo, matriz de contagens) por blocos de grupos, via ``np.bincount``.
+
+    As linhas são ordenadas por grupo uma única vez; cada bloco contém grupos consecutivos
+    e a matriz do bloco tem no máximo ``_MAX_COUNT_CELLS`` células.
+    """
+    order = np.argsort(group_codes, kind='stable')
+    group_ends = np.cumsum(np.bincount(group_codes, minlength=n_groups))
+    groups_per_block = max(1, _MAX_COUNT_CELLS // n_values)
+    for g0 in range(0, n_groups, groups_per_block):
+        g1 = min(n_groups, g0 + groups_per_block)
+        start = group_ends[g0 - 1] if g0 else 0
+        rows = order[start:group_ends[g1 - 1]]
+        combined = (group_codes[rows] - g0).astype(np.int64) * n_values + value_codes[rows]
+        counts = np.bincount(combined, minlength=(g1 - g0) * n_values)
+        yield g0, counts.reshape(g1 - g0, n_values)
+
+
+def _values_at_ranks(cumulative, ranks):
+    # Valor (índice da coluna) da observação de posição ``ranks`` (0-based) em cada linha
+    return (cumulative <= ranks[:, None]).sum(axis=1)
+
+
+def grouped_counting_stats(groups, centi_values, quantiles=(0.5,)):
+    """Moda e quantis exatos por grupo, em tempo linear, contando valores em ponto fixo.
+
+    ``centi_values`` são inteiros (centésimos de ponto). Os quantis seguem a interpolação
+    linear do pandas (a mediana de um grupo par é a média dos dois valores centrais) e a moda,
+    como ``Series.mode()[0]``, é o menor dos valores mais frequentes. O resultado (em pontos)
+    tem uma linha por grupo, ordenada, e as colunas ``'moda'`` e cada quantil pedido.
+    """
+    group_codes, group_labels = pd.factorize(pd.Series(groups), sort=True)
+    centi_values = np.asarray(centi_values, dtype=np.int64)
+    n_groups = len(group_labels)
+    columns = ['moda'] + list(quantiles)
+    if n_groups == 0:
+        return pd.DataFrame(columns=columns, dtype=np.float64)
+
+    # Códigos densos dos valores presentes: o número de colunas não depende da amplitude da escala
+    distinct_values, value_codes = np.unique(centi_values, return_inverse=True)
+    n_values = len(distinct_values)
+
+    result = np.empty((n_groups, len(columns)), dtype=np.float64)
+    for g0, counts in _count_blocks(group_codes, value_codes, n_groups, n_values):
+        rows = slice(g0, g0 + counts.shape[0])
+        result[rows, 0] = distinct_values[counts.argmax(axis=1)]
+        cumulative = np.cumsum(counts, axis=1)
+        sizes = cumulative[:, -1]
+        for i, q in enumerate(quantiles, start=1):
+            position = (sizes - 1) * q
+            lower_rank = np.floor(position).astype(np.int64)
+            upper_rank = np.ceil(position).astype(np.int64)
+            lower = distinct_values[_values_at_ranks(cumulative, lower_rank)]
+            upper = distinct_values[_values_at_ranks(cumulative, upper_rank)]
+            result[rows, i] = lower + (position - lower_rank) * (upper - lower)
+
+    return pd.DataFrame(result / CENTIPOINT_SCALE, index=pd.Index(group_labels, name=getattr(groups, 'name', None)),
+                        columns=columns)
+
+
+def stratified_sample_keys(group_codes, seed):
+    """Chave de amostragem estratificada proporcional, calculada uma vez para todas as linhas.
+
+    Em cada estrato, as linhas recebem posições numa permutação aleatória (semente ``seed``) e a chave
+    ``(posição + u) / tamanho do estrato``, com ``u`` uniforme por estrato. As linhas com chave menor
+    que ``f`` formam uma amostra aleatória com ``f`` vezes o tamanho de cada estrato (arredondado para
+    baixo ou para cima), para qualquer fração ``f``.
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    sizes = np.bincount(group_codes)
+    starts = np.cumsum(sizes) - sizes
+    order = np.lexsort((rng.random(len(group_codes)), group_codes))
+    positions = np.empty(len(group_codes), dtype=np.float64)
+    positions[order] = np.arange(len(group_codes)) - starts[group_codes[order]]
+    offsets = rng.random(len(sizes))
+    return ((positions + offsets[group_codes]) / sizes[group_codes]).astype(np.float32)
+
+
+def crosstab_counts(row_codes, n_rows, col_codes, n_cols, weights=None):
+    """Tabela de contingência (ou de somas de ``weights``) por ``np.bincount`` sobre o código combinado.
+
+    Códigos negativos (resposta ausente) são ignorados.
+    """
+    row_codes = np.asarray(row_codes, dtype=np.int64)
+    col_codes = np.asarray(col_codes, dtype=np.int64)
+    valid = (row_codes >= 0) & (col_codes >= 0)
+    combined = row_codes[valid] * n_cols + col_codes[valid]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[valid]
+    return np.bincount(combined, weights=weights, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+
+
+# Estatísticas suficientes de uma regressão linear simples de y em x
+SUFFICIENT_STATS = ['n', 'soma_x', 'soma_y', 'soma_xy', 'soma_xx', 'soma_yy']
+
+
+def sufficient_statistics(group_codes, n_groups, x, y):
+    """Somas (n, Σx, Σy, Σxy, Σx², Σy²) por grupo, cada uma com um único ``np.bincount``."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    sums = np.empty((n_groups, len(SUFFICIENT_STATS)), dtype=np.float64)
+    sums[:, 0] = np.bincount(group_codes, minlength=n_groups)
+    for i, weights in enumerate((x, y, x * y, x * x, y * y), start=1):
+        sums[:, i] = np.bincount(group_codes, weights=weights, minlength=n_groups)
+    return sums
+
+
+def linear_fits(sums):
+    """Ajustes de mínimos quadrados y = intercepto + inclinação·x de todos os grupos de uma vez.
+
+    ``sums`` tem uma linha por grupo e as colunas de ``SUFFICIENT_STATS``. Devolve, por grupo,
+    n, inclinação, intercepto, correlação de Pearson e desvio padrão dos resíduos (NaN quando
+    o grupo não tem observações suficientes).
+    """
+    n, sx, sy, sxy, sxx, syy = np.asarray(sums, dtype=np.float64).T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Somas centradas (covariância e variâncias multiplicadas por n)
+        cxy = sxy - sx * sy / n
+        cxx = sxx - sx * sx / n
+        cyy = syy - sy * sy / n
+        slope = cxy / cxx
+        intercept = (sy - slope * sx) / n
+        r = cxy / np.sqrt(cxx * cyy)
+        residual_ss = np.clip(cyy - slope * cxy, 0, None)
+        residual_sd = np.where(n > 2, np.sqrt(residual_ss / (n - 2)), np.nan)
+    return pd.DataFrame({
+        'n': n.astype(np.int64),
+        'inclinacao': slope,
+        'intercepto': intercept,
+        'r': r,
+        'desvio_residuos': residual_sd,
+    })
+
+
+def weighted_group_stats(group_codes, n_groups, values, weights, quantiles=(0.5,)):
+    """Contagem, soma dos pesos, média e quantis ponderados de todos os grupos de uma vez.
+
+    As linhas são ordenadas uma única vez (por grupo e, dentro dele, por valor) e os pesos acumulados
+    num só vetor; o quantil ``q`` de cada grupo é o primeiro valor cujo peso acumulado no grupo atinge
+    ``q`` vezes o peso total, e a média com o valor seguinte quando o atinge exatamente. Com pesos
+    unitários, a mediana coincide com a mediana usual. Grupos sem peso ficam com NaN.
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    columns = ['n', 'peso', 'media'] + list(quantiles)
+    result = np.full((n_groups, len(columns)), np.nan)
+    counts = np.bincount(group_codes, minlength=n_groups)
+    totals = np.bincount(group_codes, weights=weights, minlength=n_groups)
+    result[:, 0] = counts
+    result[:, 1] = totals
+    if len(values) == 0:
+        return pd.DataFrame(result, columns=columns)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[:, 2] = np.bincount(group_codes, weights=weights * values, minlength=n_groups) / totals
+
+    order = np.lexsort((values, group_codes))
+    sorted_values = values[order]
+    cumulative = np.cumsum(weights[order])
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    weight_before = np.concatenate(([0.0], cumulative))[starts]
+    # Tolerância para comparar pesos acumulados (somas de ponto flutuante)
+    tolerance = 1e-10 * cumulative[-1]
+    has_weight = (counts > 0) & (totals > 0)
+    last = np.maximum(ends - 1, 0)
+    for i, q in enumerate(quantiles, start=3):
+        target = weight_before + q * totals
+        # Primeiro valor que atinge o alvo e primeiro que o ultrapassa (iguais, salvo empate exato)
+        lower = np.clip(np.searchsorted(cumulative, target - tolerance, side='left'), starts, last)
+        upper = np.clip(np.searchsorted(cumulative, target + tolerance, side='right'), starts, last)
+        result[:, i] = np.where(has_weight, (sorted_values[lower] + sorted_values[upper]) / 2, np.nan)
+    return pd.DataFrame(result, columns=columns)
+
+
+def weighted_stats(df, by, value_column, weight_column, quantiles=(0.5,)):
+    """``weighted_group_stats`` de ``value_column`` por ``by`` (lista de colunas), indexado pelos grupos."""
+    codes, groups = pd.MultiIndex.from_frame(df[by]).factorize()
+    stats = weighted_group_stats(codes, len(groups), df[value_column].to_numpy(), df[weight_column].to_numpy(),
+                                 quantiles)
+    stats.index = groups.set_names(by) if len(by) > 1 else pd.Index(groups.get_level_values(0), name=by[0])
+    stats['n'] = stats['n'].astype(np.int64)
+    return stats.sort_index()
+
+
+def weighted_box_stats(df, by, value_column, weight_column, whis=1.5):
+    """Estatísticas de box plot ponderadas por grupo de ``by``, no formato de ``Axes.bxp``.
+
+    Quartis ponderados (``weighted_group_stats``); as hastes vão até o valor mais extremo dentro
+    de ``whis`` vezes o intervalo interquartil e os demais valores são *outliers*.
+    """
+    stats = weighted_stats(df, by, value_column, weight_column, quantiles=(0.25, 0.5, 0.75))
+    codes = stats.index.get_indexer(pd.MultiIndex.from_frame(df[by]) if len(by) > 1 else df[by[0]])
+    values = df[value_column].to_numpy(dtype=np.float64)
+    q1, median, q3 = (stats[q].to_numpy() for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    inside = (values >= (q1 - whis * iqr)[codes]) & (values <= (q3 + whis * iqr)[codes])
+    low = np.full(len(stats), np.inf)
+    high = np.full(len(stats), -np.inf)
+    np.minimum.at(low, codes[inside], values[inside])
+    np.maximum.at(high, codes[inside], values[inside])
+    outside = np.flatnonzero(~inside)
+    fliers = np.split(values[outside[np.argsort(codes[outside], kind='stable')]],
+                      np.cumsum(np.bincount(codes[outside], minlength=len(stats)))[:-1])
+    return [
+        {'label': group, 'med': median[i], 'q1': q1[i], 'q3': q3[i],
+         'whislo': low[i], 'whishi': high[i], 'fliers': fliers[i]}
+        for i, group in enumerate(stats.index)
+    ]
+
+
+def grouped_quantiles(group_codes, n_groups, values, quantiles=(0.25, 0.5, 0.75)):
+    """Quantis de todos os grupos de uma vez, com a interpolação linear do pandas/NumPy.
+
+    As linhas são ordenadas uma única vez (por grupo e, dentro dele, por valor); o quantil ``q`` de um
+    grupo de tamanho ``n`` interpola os valores nas posições vizinhas de ``(n - 1) q`` no trecho do
+    grupo. Devolve uma matriz (grupos x quantis), com NaN nos grupos vazios.
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.bincount(group_codes, minlength=n_groups)
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    if len(values) == 0:
+        return result
+    sorted_values = values[np.lexsort((values, group_codes))]
+    starts = np.cumsum(counts) - counts
+    filled = counts > 0
+    for i, q in enumerate(quantiles):
+        position = (counts[filled] - 1) * q
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low_values = sorted_values[starts[filled] + lower]
+        high_values = sorted_values[starts[filled] + upper]
+        result[filled, i] = low_values + (position - lower) * (high_values - low_values)
+    return result
+
+
+# Constante que torna o MAD comparável ao desvio padrão numa distribuição normal (z robusto de Iglewicz e Hoaglin)
+MAD_Z_SCALE = 0.6745
+
+
+def robust_group_scores(group_codes, n_groups, values, whis=1.5):
+    """Mediana, MAD, quartis e limites de IQR por grupo e, para cada linha, o z robusto e se está fora dos limites.
+
+    Duas ordenações no total (valores e desvios absolutos à mediana), sem laço por grupo: as
+    estatísticas de cada grupo voltam para as linhas pelos códigos dos grupos. O z robusto é
+    ``0,6745 (x − mediana) / MAD``; em grupos com MAD zero, fica NaN.
+    Devolve ``(estatísticas por grupo, estatísticas por linha)``.
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    q1, median, q3 = grouped_quantiles(group_codes, n_groups, values, (0.25, 0.5, 0.75)).T
+    deviations = np.abs(values - median[group_codes])
+    mad = grouped_quantiles(group_codes, n_groups, deviations, (0.5,))[:, 0]
+    iqr = q3 - q1
+    lower_fence = q1 - whis * iqr
+    upper_fence = q3 + whis * iqr
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(mad[group_codes] > 0, MAD_Z_SCALE * (values - median[group_codes]) / mad[group_codes], np.nan)
+    outside = (values < lower_fence[group_codes]) | (values > upper_fence[group_codes])
+
+    groups = pd.DataFrame({
+        'n': np.bincount(group_codes, minlength=n_groups),
+        'mediana': median, 'mad': mad, 'q1': q1, 'q3': q3,
+        'limite_inferior': lower_fence, 'limite_superior': upper_fence,
+    })
+    rows = pd.DataFrame({'z_robusto': z, 'fora_iqr': outside})
+    return groups, rows
@@ -0,0 +1,220 @@
+import functools
+import hashlib
+import inspect
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+from streamlit.logger import get_logger
+
+from utils.static_cache import cache_key
+
+logger = get_logger(__name__)
+
+# Banco SQLite local com os agregados calculados pelas páginas (estatísticas por grupo, somas para
+# regressões, tabelas cruzadas, ...). Sobrevive a reinícios e é lido por todos os processos que
+# usam o mesmo diretório; o modo WAL permite leituras simultâneas durante uma gravação.
+STORE_PATH = os.environ.get('SAEB_STORE_PATH', 'data/cache/agregados.sqlite')
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agregados (
+    versao TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    formato TEXT NOT NULL,
+    conteudo BLOB NOT NULL,
+    criado REAL NOT NULL,
+    PRIMARY KEY (versao, tipo, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS agregados_tipo ON agregados (tipo, versao);
+CREATE INDEX IF NOT EXISTS agregados_arquivo ON agregados (arquivo, versao);
+"""
+
+# Uma conexão por thread (as conexões do sqlite3 não devem ser compartilhadas entre threads)
+_local = threading.local()
+
+# Versões de arquivo cujos agregados antigos já foram removidos neste processo
+_pruned = set()
+_pruned_lock = threading.Lock()
+
+
+def _connect():
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        os.makedirs(os.path.dirname(STORE_PATH) or '.', exist_ok=True)
+        connection = sqlite3.connect(STORE_PATH, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(agregados)')}
+        if columns and 'arquivo' not in columns:
+            # Banco de uma versão anterior, sem as colunas do código e do arquivo: como é só um cache,
+            # a tabela é recriada vazia
+            connection.execute('DROP TABLE agregados')
+        connection.executescript(_SCHEMA)
+        _local.connection = connection
+    return connection
+
+
+def _serialize(value):
+    # Tabelas em Parquet (preserva tipos e índices); demais valores (listas, dicionários) em JSON
+    if isinstance(value, pd.DataFrame):
+        buffer = io.BytesIO()
+        value.to_parquet(buffer)
+        return 'parquet', buffer.getvalue()
+    return 'json', json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def _deserialize(data_format, content):
+    if data_format == 'parquet':
+        return pd.read_parquet(io.BytesIO(content))
+    return json.loads(content.decode('utf-8'))
+
+
+def _canonical_const(const):
+    # Forma estável de uma constante: conjuntos (frozenset de ``x in {...}``) têm repr em ordem de hash,
+    # que muda a cada processo com o PYTHONHASHSEED; seus membros são ordenados
+    if isinstance(const, (set, frozenset)):
+        return f"{type(const).__name__}({sorted(_canonical_const(item) for item in const)})"
+    if isinstance(const, tuple):
+        return f"({', '.join(_canonical_const(item) for item in const)})"
+    return repr(const)
+
+
+def _code_digest(code, digest):
+    # Bytecode e constantes, incluindo as funções internas (cujo repr traz o endereço de memória,
+    # diferente a cada processo)
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _code_digest(const, digest)
+        else:
+            digest.update(_canonical_const(const).encode())
+    return digest
+
+
+def _global_names(code):
+    # Nomes globais usados pelo código, incluindo os das funções internas
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            names |= _global_names(const)
+    return names
+
+
+def code_version(fn):
+    """Versão do código de ``fn``: digest do bytecode dela e das funções que ela chama no mesmo módulo ou no pacote utils.
+
+    Grava-se junto com cada agregado: alterar o cálculo não reaproveita resultados antigos gravados no
+    banco. Não depende de datas de arquivos, e é a mesma em todos os processos e contêineres com o mesmo código.
+    """
+    module = fn.__module__
+    digest = hashlib.sha1()
+    pending, seen = [fn], set()
+    while pending:
+        # Funções decoradas (st.cache_data, stored) são seguidas até a função original
+        current = inspect.unwrap(pending.pop())
+        if id(current) in seen or not inspect.isfunction(current):
+            continue
+        seen.add(id(current))
+        _code_digest(current.__code__, digest)
+        for name in sorted(_global_names(current.__code__), reverse=True):
+            target = current.__globals__.get(name)
+            target_module = getattr(inspect.unwrap(target), '__module__', None) if callable(target) else None
+            if target_module == module or (target_module or '').startswith('utils.'):
+                pending.append(target)
+    return digest.hexdigest()[:16]
+
+
+def _prune_stale(file_path, version):
+    # Uma vez por processo e versão do arquivo: remove os agregados de versões anteriores dele e os de
+    # arquivos que não existem mais, para que o banco não cresça a cada atualização dos dados
+    with _pruned_lock:
+        if (file_path, version) in _pruned:
+            return
+        _pruned.add((file_path, version))
+    connection = _connect()
+    removed = connection.execute(
+        'DELETE FROM agregados WHERE arquivo = ? AND versao <> ?', (file_path, version)
+    ).rowcount
+    for (name,) in connection.execute('SELECT DISTINCT arquivo FROM agregados').fetchall():
+        if name and not os.path.exists(name):
+            removed += connection.execute('DELETE FROM agregados WHERE arquivo = ?', (name,)).rowcount
+    if removed:
+        logger.info("%d agregados de versões antigas removidos do banco", removed)
+
+
+def read_through(kind, version, params, compute, file_path=''):
+    """Devolve o agregado ``kind`` de ``params`` gravado no banco ou o calcula com ``compute()`` e o grava.
+
+    ``version`` é a versão do arquivo de dados ``file_path``; ao gravar a primeira vez uma nova versão,
+    os agregados das anteriores são removidos. Um agregado gravado por outra versão do código é
+    recalculado e substituído. Sem acesso ao banco (por exemplo, disco somente leitura), o agregado
+    é apenas calculado.
+    """
+    key = cache_key(params)
+    # ``compute`` pode ser um functools.partial (decorador stored): a versão é a da função original
+    code = code_version(getattr(compute, 'func', compute))
+    try:
+        row = _connect().execute(
+            'SELECT codigo, formato, conteudo FROM agregados WHERE versao = ? AND tipo = ? AND chave = ?',
+            (version, kind, key)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("banco de agregados indisponível (%s): %s", STORE_PATH, e)
+        return compute()
+    if row is not None and row[0] == code:
+        return _deserialize(*row[1:])
+
+    start = time.perf_counter()
+    value = compute()
+    elapsed = time.perf_counter() - start
+    try:
+        data_format, content = _serialize(value)
+        if file_path:
+            _prune_stale(file_path, version)
+        # Outro processo pode ter gravado o mesmo agregado nesse meio tempo: fica o último
+        _connect().execute(
+            'INSERT OR REPLACE INTO agregados (versao, tipo, chave, codigo, arquivo, formato, conteudo, criado) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (version, kind, key, code, file_path, data_format, content, time.time())
+        )
+    except (sqlite3.Error, ValueError, TypeError) as e:
+        logger.warning("não foi possível gravar o agregado %s: %s", kind, e)
+    logger.debug("agregado %s calculado em %.1f ms", kind, elapsed * 1000)
+    return value
+
+
+def stored(kind):
+    """Decorador de funções ``f(file_path, version, ...)``: os resultados passam por ``read_through``.
+
+    Todos os argumentos (exceto ``version``, que identifica a versão do arquivo ``file_path``) formam a chave.
+    Usado abaixo de ``@st.cache_data``: a memória do processo é consultada primeiro, depois o banco.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            version = params.pop('version')
+            return read_through(kind, version, params, functools.partial(fn, *args, **kwargs), params['file_path'])
+
+        return wrapper
+    return decorator
+
+
+def store_summary():
+    """Número de agregados e tamanho (bytes) por tipo gravados no banco."""
+    rows = _connect().execute(
+        'SELECT tipo, COUNT(*), SUM(LENGTH(conteudo)) FROM agregados GROUP BY tipo ORDER BY tipo'
+    ).fetchall()
+    return pd.DataFrame(rows, columns=['Tipo', 'Agregados', 'Bytes'])